@@ -10,55 +10,2077 @@ sensitive information.
 
 from __future__ import annotations
 
+import base64
+import contextlib
+import gzip
+import hashlib
+import io
+import itertools
 import json
+import math
+import mmap
 import os
+import queue
+import random
+import resource
+import struct
 import subprocess
+import sys
 import tempfile
+import threading
+import time
 import zipfile
-from typing import Any, Dict, List
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 
 from flame.star import StarModel, StarAnalyzer, StarAggregator
 
+from qc_common import (
+    ByteBudget,
+    FileTimings,
+    Prefetcher,
+    bgzf_block_header,
+    body_size,
+    encode_columnar,
+    inflate_bgzf_block,
+    iter_chunks,
+    object_pairs,
+    throughput_summary,
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - only required by the native engine
+    np = None  # type: ignore[assignment]
+
 __author__ = "Jules Kreuer, jules.kreuer@uni-tuebingen.de"
-__version__ = "0.1.0"
+__version__ = "0.2.0"
 
 # Set of S3 object keys to analyze; None means all objects in the configured bucket/prefix.
 # The same keys are used on all node.
 FASTQ_S3_KEYS: List[str] | None = None
 
+# Number of FASTQ files staged and QC'd concurrently; None uses one worker per CPU core.
+FASTQ_MAX_WORKERS: int | None = None
+
+# Upper bound (bytes) on the combined size of FASTQ files staged at the same time.
+# A single file larger than the budget, or a streamed body of unknown size, is still processed,
+# but on its own. None disables the cap.
+FASTQ_MEMORY_BUDGET_BYTES: int | None = 8 * 1024**3
+
+# Number of FASTQ files passed to a single FastQC invocation. Values above 1 amortize JVM
+# startup across many small files; 1 runs one FastQC process per file.
+FASTQ_BATCH_SIZE: int = 1
+
+# Value for FastQC's ``--threads`` option in batched mode; None derives it from the CPU count
+# left per worker.
+FASTQ_BATCH_THREADS: int | None = None
+
+# Per-file FastQC timeout in seconds. Batches get this budget per file and FastQC thread round.
+FASTQ_TIMEOUT_SECONDS: int = 300
+
+# QC engine: "fastqc" runs the FastQC CLI, "native" computes the same basic statistics and a
+# subset of its module verdicts in-process with NumPy (no Java required).
+FASTQ_ENGINE: str = "fastqc"
+
+# Read size used by the native engine when streaming a (decompressed) FASTQ file.
+FASTQ_NATIVE_CHUNK_BYTES: int = 8 * 1024**2
+
+# Read positions covered by the native engine's per-base modules; later bases are ignored there.
+FASTQ_NATIVE_MAX_POSITIONS: int = 500
+
+# How object bodies reach the QC engine: "file" writes them to a temp file in bounded chunks,
+# "stream" pipes them into FastQC's stdin (or straight into the native engine) without
+# touching disk. Batching (FASTQ_BATCH_SIZE) only applies to "file".
+FASTQ_STAGING: str = "file"
+
+# Chunk size used when copying object bodies to a temp file or pipe.
+FASTQ_STAGING_CHUNK_BYTES: int = 4 * 1024**2
+
+# Objects read ahead from lazy object sources (``data`` entries that are iterables of
+# (key, body) or (key, body, size) entries instead of dicts) while earlier ones are QC'd; 0
+# hands the streamed bodies to the QC engine as they are. Overlaps the network fetch with QC.
+FASTQ_PREFETCH_DEPTH: int = 2
+
+# Upper bound (bytes) on prefetched bodies waiting to be QC'd. Sizes are reserved before a
+# body is read; objects of unknown or larger size are streamed to QC instead of read ahead.
+# None disables the cap.
+FASTQ_PREFETCH_BYTES: int | None = 1024**3
+
+# Directory of the persistent per-file result cache; None disables caching. Entries are keyed
+# by object content hash, QC engine version and result parser version.
+FASTQ_CACHE_DIR: str | None = None
+
+# Size cap (bytes) of the result cache; least recently used entries are evicted beyond it.
+FASTQ_CACHE_MAX_BYTES: int = 64 * 1024**2
+
+# Quick QC: QC only a sample of this many reads per file instead of the whole file. None (the
+# default) computes exact statistics over all reads.
+FASTQ_SAMPLE_READS: int | None = None
+
+# Sampling strategy for quick QC: "head" takes the first reads and stops reading early,
+# "reservoir" draws a uniform random sample (reads the whole file, memory bounded by the sample).
+FASTQ_SAMPLE_METHOD: str = "head"
+
+# Seed of the reservoir sampler so repeated runs pick the same reads.
+FASTQ_SAMPLE_SEED: int = 0
+
+# Quick QC: module FAILs of a sample with fewer reads than this are reported as warnings
+# ("small sample"), since FastQC's thresholds assume whole runs. Files with fewer reads than
+# FASTQ_SAMPLE_READS are read completely and keep their verdicts.
+FASTQ_SAMPLE_MIN_READS: int = 10_000
+
+# Verify gzip input (member CRC32/ISIZE trailers, BGZF blocks in parallel) before FastQC
+# starts, so truncated or corrupt uploads fail fast with a precise reason.
+FASTQ_GZIP_PRECHECK: bool = True
+
+# Threads inflating gzip input in-process (native engine, quick QC and "stream" staging).
+# BGZF (bgzip) blocks are inflated in parallel on this many threads; other gzip input is
+# inflated by one background thread so that it overlaps with parsing. None derives the count
+# from the CPU count left per worker, 0 disables background decompression.
+FASTQ_DECOMPRESS_THREADS: int | None = None
+
+# Read positions (cycles) covered by the mergeable per-node histograms; the read-length
+# histogram has one more bin collecting longer reads. None disables the histograms.
+FASTQ_HISTOGRAM_POSITIONS: int | None = 300
+
+# Estimate duplication and over-represented sequences with fixed-size, mergeable sketches
+# (HyperLogLog, count-min). Requires NumPy; with FastQC this adds one pass over each file.
+FASTQ_SKETCH_READS: bool = False
+
+# Node-local file holding the secret that keys the read hashes of the sketches. It must be the
+# same on all nodes and never be given to the aggregator; rotate it per run. Only with a key
+# are sketches sent for the cohort-wide merge; without one, nodes report their own complexity
+# summary without sequence hashes.
+FASTQ_SKETCH_KEY_PATH: str | None = None
+
+# Adapter sequences (name -> sequence) reported as per-position adapter content curves and
+# judged like FastQC's Adapter Content module. The native engine scans reads for them
+# in-process; FastQC receives them via ``--adapters``. None disables the curves (FastQC then
+# uses its built-in list).
+FASTQ_ADAPTERS: Dict[str, str] | None = {
+    "Illumina Universal Adapter": "AGATCGGAAGAG",
+    "Illumina Small RNA 3' Adapter": "TGGAATTCTCGG",
+    "Illumina Small RNA 5' Adapter": "GATCGTCGGACT",
+    "Nextera Transposase Sequence": "CTGTCTCTTATA",
+    "PolyA": "AAAAAAAAAAAA",
+    "PolyG": "GGGGGGGGGGGG",
+}
+
+# Add per-file phase timings, throughput and peak memory ("timing") to the results. The
+# aggregator rolls them up into per-node throughput summaries.
+FASTQ_INSTRUMENT: bool = False
+
+# Aggregated output format: "json" returns the result as a JSON string, "columnar" as compact
+# compressed bytes (per-node file columns, shared reason table) for output_type="bytes".
+# Decode the latter with qc_columnar_decode.py.
+FASTQ_OUTPUT_FORMAT: str = "json"
+
+FASTQ_EXTENSIONS = (".fastq", ".fq", ".fastq.gz", ".fq.gz")
+
+# Version of the report parsing and pass/warn/fail rules. Bump it whenever they change so
+# cached results computed by older rules are not reused.
+_RESULT_PARSER_VERSION = "5"
+
+# Phases of the per-file timings (FASTQ_INSTRUMENT)
+_TIMING_PHASES = ("staging", "check", "tool", "parse")
+
+# Read sketches: bases hashed per read, HyperLogLog precision (2**p registers), count-min
+# depth x width, over-represented candidates kept, entries reported and reporting threshold
+# (FastQC's 0.1%).
+_SKETCH_PREFIX = 50
+_HLL_PRECISION = 14
+_CMS_DEPTH = 4
+_CMS_WIDTH = 1 << 13
+_SKETCH_CANDIDATES = 256
+_SKETCH_TOP = 20
+_OVERREPRESENTED_FRACTION = 0.001
+
+# Adapter scanner: bases of the prefix lookup table selecting candidate positions, and
+# FastQC's warn/fail limits on the percentage of reads containing an adapter.
+_ADAPTER_PREFIX = 5
+_ADAPTER_WARN_PERCENT = 5.0
+_ADAPTER_FAIL_PERCENT = 10.0
+
+# FastQC modules evaluated by the native engine (plus adapter_content with FASTQ_ADAPTERS).
+# per_sequence_gc_content, sequence_duplication_levels, overrepresented_sequences and
+# per_tile_sequence_quality are not.
+_NATIVE_MODULES = (
+    "basic_statistics",
+    "per_base_sequence_quality",
+    "per_sequence_quality_scores",
+    "per_base_sequence_content",
+    "per_base_n_content",
+    "sequence_length_distribution",
+)
+
+# Per-file result entries that analysis_method merges into node-level aggregates
+_NODE_LEVEL_KEYS = ("histograms", "sketch")
+
+# Per-file result entries kept with the file, also when one of its modules fails
+_FILE_DETAIL_KEYS = ("adapter_curves",)
+
+# Failure reasons caused by the environment rather than the file content; never cached.
+_TRANSIENT_REASON_PREFIXES = (
+    "FastQC timeout",
+    "FastQC executable not found",
+    "FastQC failed",
+    "Unexpected error",
+    "Staging error",
+    "NumPy not available",
+)
+
+# Suffixes FastQC strips (in this order) from an input filename to name its report.
+_FASTQC_STRIPPED_SUFFIXES = (
+    (".gz", ".bz2"),
+    (".txt",),
+    (".fastq", ".fq", ".csfastq", ".sam", ".bam"),
+)
+
+
+def _failed_file_result(fname: str, size_bytes: int, reason: str) -> Dict[str, Any]:
+    """Return the per-file result dict used for any failed FASTQ file."""
+    return {
+        "file": fname,
+        "size_bytes": size_bytes,
+        "pass": False,
+        "warnings": False,
+        "reason": reason,
+        "total_sequences": 0,
+        "sequence_length": 0,
+        "gc_content": 0.0,
+    }
+
+
+def _empty_histograms(positions: int) -> Dict[str, List[float]]:
+    """Return all-zero histograms with the fixed layout for ``positions`` read positions.
+
+    ``quality_sums[i]``/``quality_counts[i]``: sum of Phred scores and number of bases at
+    position i + 1; ``length_counts[n]``: reads of length n (last bin: ``positions`` or
+    longer); ``gc_counts[g]``: reads with g % GC.
+    """
+    return {
+        "quality_sums": [0] * positions,
+        "quality_counts": [0] * positions,
+        "length_counts": [0] * (positions + 1),
+        "gc_counts": [0] * 101,
+    }
+
+
+def _compact_number(value: float) -> float:
+    return int(value) if float(value).is_integer() else round(float(value), 2)
+
+
+def _merge_histograms(histograms: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum histograms element-wise; shorter arrays are zero-padded to the longest.
+
+    ``sampled_files`` (files whose histograms describe a quick QC read sample) is summed too,
+    so a merge containing sampled files stays marked as partial.
+    """
+    merged: Dict[str, Any] = {}
+    for key in ("quality_sums", "quality_counts", "length_counts", "gc_counts"):
+        arrays = [h[key] for h in histograms if key in h]
+        width = max((len(a) for a in arrays), default=0)
+        if np is not None:
+            total = np.zeros(width, dtype=np.float64)
+            for array in arrays:
+                total[: len(array)] += np.asarray(array, dtype=np.float64)
+            values = total.tolist()
+        else:
+            values = [0.0] * width
+            for array in arrays:
+                for idx, value in enumerate(array):
+                    values[idx] += value
+        merged[key] = [_compact_number(v) for v in values]
+    sampled_files = sum(h.get("sampled_files", 0) for h in histograms)
+    if sampled_files:
+        merged["sampled_files"] = sampled_files
+    return merged
+
+
+def _histograms_from_fastqc(
+    quality_rows: List[List[str]],
+    length_rows: List[List[str]],
+    gc_rows: List[List[str]],
+    positions: int,
+) -> Dict[str, List[float]]:
+    """Build histograms from the FastQC module tables.
+
+    FastQC groups positions and lengths into ranges such as ``10-14``. Length counts are
+    spread evenly over their range, and a position's base count is the number of reads
+    reaching it. Quality sums are the range's mean quality times that count.
+    """
+
+    def bounds(label: str) -> Tuple[int, int]:
+        lo, _, hi = label.partition("-")
+        return int(lo), int(hi or lo)
+
+    lengths: Dict[int, float] = {}
+    for row in length_rows:
+        lo, hi = bounds(row[0])
+        share = float(row[1]) / (hi - lo + 1)
+        for length in range(lo, hi + 1):
+            lengths[length] = lengths.get(length, 0.0) + share
+
+    histograms = _empty_histograms(positions)
+    for length, count in lengths.items():
+        histograms["length_counts"][min(length, positions)] += count
+    # Reads reaching position p: all reads of length >= p
+    reaching = [0.0] * (positions + 2)
+    for length, count in lengths.items():
+        reaching[min(length, positions + 1)] += count
+    for pos in range(positions, 0, -1):
+        reaching[pos] += reaching[pos + 1]
+
+    for row in quality_rows:
+        lo, hi = bounds(row[0])
+        for pos in range(lo, min(hi, positions) + 1):
+            histograms["quality_counts"][pos - 1] = reaching[pos]
+            histograms["quality_sums"][pos - 1] = float(row[1]) * reaching[pos]
+    for row in gc_rows:
+        gc = int(float(row[0]))
+        if 0 <= gc <= 100:
+            histograms["gc_counts"][gc] += float(row[1])
+    return _merge_histograms([histograms])
+
+
+def _adapter_curves_from_fastqc(rows: List[List[str]]) -> Dict[str, List[float]]:
+    """Expand FastQC's Adapter Content table (header row first) into per-position curves.
+
+    Grouped positions such as ``10-14`` repeat the group's value. Adapters never seen are
+    left out, as in the native scanner.
+    """
+    if not rows or not rows[0][0].startswith("#"):
+        return {}
+    names = rows[0][1:]
+    curves: Dict[str, List[float]] = {name: [] for name in names}
+    for row in rows[1:]:
+        lo, _, hi = row[0].partition("-")
+        span = int(hi or lo) - int(lo) + 1
+        for name, value in zip(names, row[1:]):
+            curves[name].extend([round(float(value), 2)] * span)
+    return {name: curve for name, curve in curves.items() if any(curve)}
+
+
+def _fastqc_zip_name(path: str) -> str:
+    """Return the name of the ``_fastqc.zip`` report FastQC writes for an input path."""
+    name = os.path.basename(path)
+    for suffixes in _FASTQC_STRIPPED_SUFFIXES:
+        for suffix in suffixes:
+            if name.endswith(suffix):
+                name = name[: -len(suffix)]
+                break
+    return f"{name}_fastqc.zip"
+
+
+class _BodyReader(io.RawIOBase):
+    """Binary, read-only file-like view over an object body.
+
+    Accepts ``bytes``-like values, ``str``, file-like objects with ``read`` and iterables of
+    chunks. The body is consumed in chunks of at most ``chunk_bytes`` (see ``iter_chunks``),
+    so no second full copy of the body is ever built.
+    """
+
+    def __init__(self, content: Any, chunk_bytes: int, hash_content: bool = False):
+        super().__init__()
+        self.bytes_read = 0
+        # Running SHA-256 of everything read so far, if requested
+        self.sha256 = hashlib.sha256() if hash_content else None
+        self._chunks = iter_chunks(content, chunk_bytes)
+        self._pending: Any = b""
+
+    def peek(self, size: int) -> bytes:
+        """Return up to ``size`` upcoming bytes without consuming them."""
+        while len(self._pending) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._pending = bytes(self._pending) + bytes(chunk)
+        return bytes(self._pending[:size])
+
+    def chunks(self):  # type: ignore[no-untyped-def]
+        """Yield the remaining body as chunks (possibly ``memoryview`` slices)."""
+        if len(self._pending):
+            pending, self._pending = self._pending, b""
+            self._consumed(pending)
+            yield pending
+        for chunk in self._chunks:
+            self._consumed(chunk)
+            yield chunk
+
+    def _consumed(self, chunk: Any) -> None:
+        self.bytes_read += len(chunk)
+        if self.sha256 is not None:
+            self.sha256.update(chunk)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            return b"".join(bytes(chunk) for chunk in self.chunks())
+        if not len(self._pending):
+            self._pending = next(self._chunks, b"")
+        out = bytes(self._pending[:size])
+        self._pending = self._pending[size:]
+        self._consumed(out)
+        return out
+
+
+def _feed_stdin(pipe: Any, reader: _BodyReader, errors: List[BaseException]) -> None:
+    """Copy an object body into a subprocess' stdin, recording read errors in ``errors``."""
+    try:
+        for chunk in reader.chunks():
+            pipe.write(chunk)
+    except BrokenPipeError:
+        pass  # The tool exited early; its exit status tells why
+    except BaseException as exc:
+        errors.append(exc)
+    finally:
+        try:
+            pipe.close()
+        except OSError:
+            pass
+
+
+def _check_gzip_members(chunks: Any, first_member: int = 1) -> str | None:
+    """Inflate a gzip stream given as chunks and verify every member's CRC32/ISIZE trailer.
+
+    Returns None if all members are intact, else the failure reason naming the member by
+    its number, counted from ``first_member``. Bytes after the last member that do not
+    start another member are ignored, as most gzip readers do.
+    """
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    member = first_member
+    carry = b""
+    in_member = True
+    for chunk in chunks:
+        data = carry + bytes(chunk) if carry else chunk
+        carry = b""
+        while len(data):
+            if not in_member:
+                if len(data) < 2:
+                    carry = bytes(data)
+                    break
+                if bytes(data[:2]) != b"\x1f\x8b":
+                    return None  # Trailing data after the last member
+                member += 1
+                inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                in_member = True
+            try:
+                inflater.decompress(data)
+            except zlib.error as exc:
+                message = str(exc)
+                if "incorrect data check" in message:
+                    return f"Corrupt gzip: CRC32 mismatch in member {member}"
+                if "incorrect length check" in message:
+                    return f"Corrupt gzip: ISIZE mismatch in member {member}"
+                return f"Corrupt gzip: invalid data in member {member} ({message})"
+            if not inflater.eof:
+                break
+            in_member = False
+            data = inflater.unused_data
+    if in_member:
+        return f"Truncated gzip: member {member} ends before its trailer"
+    return None
+
+
+def _check_bgzf_blocks(buf: Any, threads: int, group_bytes: int) -> str | None:
+    """Verify the BGZF blocks in ``buf`` on ``threads`` threads; reason or None if intact.
+
+    Block boundaries come from the BSIZE of each header, so blocks are checked in parallel.
+    A non-BGZF member following the blocks is checked sequentially.
+    """
+    size = len(buf)
+    groups: List[List[Tuple[int, int, int]]] = [[]]
+    group_size = 0
+    pos = 0
+    rest = None
+    while pos < size:
+        sizes = bgzf_block_header(buf, pos)
+        if sizes is None:
+            rest = pos
+            break
+        header_size, block_size = sizes
+        if pos + block_size > size:
+            return f"Truncated gzip: BGZF block at offset {pos} extends past end of file"
+        groups[-1].append((pos, header_size, block_size))
+        group_size += block_size
+        if group_size >= group_bytes:
+            groups.append([])
+            group_size = 0
+        pos += block_size
+
+    def check(group: List[Tuple[int, int, int]]) -> str | None:
+        for offset, header_size, block_size in group:
+            try:
+                inflate_bgzf_block(buf[offset : offset + block_size], header_size)
+            except gzip.BadGzipFile as exc:
+                return f"Corrupt gzip: {exc} at offset {offset}"
+        return None
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(check, group) for group in groups if group]
+        for future in futures:
+            reason = future.result()
+            if reason is not None:
+                for pending in futures:
+                    pending.cancel()
+                return reason
+
+    if rest is not None:
+        return _check_gzip_members(
+            (buf[start : start + group_bytes] for start in range(rest, size, group_bytes)),
+            first_member=sum(len(group) for group in groups) + 1,
+        )
+    return None
+
+
+def _check_gzip_integrity(path: str, threads: int, chunk_bytes: int) -> str | None:
+    """Fail-fast integrity check of a gzip file; None if intact or not gzip at all.
+
+    BGZF files are verified block by block in parallel; other gzip files are inflated once,
+    sequentially, with every member checked against its CRC32/ISIZE trailer.
+    """
+    with open(path, "rb") as fh:
+        header = fh.read(12)
+        if header[:2] != b"\x1f\x8b":
+            return None
+        xlen = struct.unpack_from("<H", header, 10)[0] if len(header) == 12 else 0
+        if bgzf_block_header(header + fh.read(xlen)) is not None:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                return _check_bgzf_blocks(buf, threads, chunk_bytes)
+        fh.seek(0)
+        return _check_gzip_members(iter(lambda: fh.read(chunk_bytes), b""))
+
+
+class _InflateReader(io.RawIOBase):
+    """Read-only view of the decompressed content of a gzip source, inflated ahead of use.
+
+    BGZF input (the blocked gzip written by ``bgzip``) is split at its block boundaries and
+    up to ``threads`` blocks are inflated in parallel, while the output is still returned in
+    order. Any other gzip input, or a non-BGZF member following BGZF blocks, is inflated by
+    a single background thread so decompression at least overlaps with the consumer. The
+    source is closed together with the reader.
+    """
+
+    def __init__(self, source: Any, threads: int, chunk_bytes: int):
+        super().__init__()
+        self._source = source
+        self._chunk_bytes = chunk_bytes
+        self._raw = b""
+        self._raw_pos = 0
+        self._pending: Any = b""
+        self._stop = threading.Event()
+        self._pool: ThreadPoolExecutor | None = None
+        self._inflight: deque = deque()
+        self._max_inflight = 4 * threads
+        self._queue: queue.Queue | None = None
+        self._pump: threading.Thread | None = None
+        try:
+            if threads > 1 and self._next_bgzf_header() is not None:
+                self._pool = ThreadPoolExecutor(max_workers=threads)
+            else:
+                self._start_pump()
+        except BaseException:
+            self.close()
+            raise
+
+    def _peek_raw(self, size: int) -> bytes:
+        while len(self._raw) - self._raw_pos < size:
+            chunk = self._source.read(self._chunk_bytes)
+            if not chunk:
+                break
+            # Only the unread remainder is copied
+            self._raw = self._raw[self._raw_pos :] + bytes(chunk)
+            self._raw_pos = 0
+        return self._raw[self._raw_pos : self._raw_pos + size]
+
+    def _read_raw(self, size: int = -1) -> bytes:
+        """Consume up to ``size`` raw bytes (the whole remainder for -1)."""
+        if size is None or size < 0:
+            rest = self._raw[self._raw_pos :] + self._source.read()
+            self._raw, self._raw_pos = b"", 0
+            return rest
+        data = self._peek_raw(size)
+        self._raw_pos += len(data)
+        return data
+
+    def _next_bgzf_header(self) -> Tuple[int, int] | None:
+        header = self._peek_raw(12)
+        if len(header) < 12:
+            return None
+        xlen = struct.unpack_from("<H", header, 10)[0]
+        return bgzf_block_header(self._peek_raw(12 + xlen))
+
+    def _fill(self) -> None:
+        """Submit blocks until ``threads * 4`` are in flight or the BGZF input ends."""
+        while self._pool is not None and len(self._inflight) < self._max_inflight:
+            if not self._peek_raw(1):
+                self._pool.shutdown(wait=False)
+                self._pool = None
+                return
+            sizes = self._next_bgzf_header()
+            if sizes is None:
+                # Not (or no longer) BGZF: inflate the rest sequentially in the background
+                self._pool.shutdown(wait=False)
+                self._pool = None
+                self._start_pump()
+                return
+            header_size, block_size = sizes
+            block = self._read_raw(block_size)
+            if len(block) < block_size:
+                raise EOFError(
+                    "Compressed file ended before the end-of-stream marker was reached"
+                )
+            self._inflight.append(self._pool.submit(inflate_bgzf_block, block, header_size))
+
+    def _start_pump(self) -> None:
+        self._queue = queue.Queue(maxsize=4)
+        self._pump = threading.Thread(target=self._run_pump, daemon=True)
+        self._pump.start()
+
+    def _put(self, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)  # type: ignore[union-attr]
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run_pump(self) -> None:
+        try:
+            source = io.BufferedReader(_RawSourceAdapter(self._read_raw))
+            with gzip.GzipFile(fileobj=source, mode="rb") as stream:
+                while not self._stop.is_set():
+                    chunk = stream.read(self._chunk_bytes)
+                    if not chunk or not self._put(chunk):
+                        break
+        except BaseException as exc:
+            self._put(exc)
+        self._put(None)
+
+    def _next_output(self) -> bytes | None:
+        self._fill()
+        if self._inflight:
+            return self._inflight.popleft().result()
+        if self._queue is not None:
+            item = self._queue.get()
+            if isinstance(item, BaseException):
+                raise item
+            if item is None:
+                self._queue = None
+            return item
+        return None
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        while not len(self._pending):
+            data = self._next_output()
+            if data is None:
+                return 0
+            self._pending = memoryview(data)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self) -> None:
+        if not self.closed:
+            self._stop.set()
+            for future in self._inflight:
+                future.cancel()
+            self._inflight.clear()
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+            if self._pump is not None:
+                self._pump.join()
+            self._source.close()
+        super().close()
+
+
+class _RawSourceAdapter(io.RawIOBase):
+    """Minimal raw stream over a ``read(size)`` callable."""
+
+    def __init__(self, read: Any):
+        super().__init__()
+        self._read = read
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        data = self._read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def _open_fastq_stream(  # type: ignore[no-untyped-def]
+    path: str, threads: int = 0, chunk_bytes: int = FASTQ_STAGING_CHUNK_BYTES
+):
+    """Open a plain or gzip FASTQ file for binary reading, detecting gzip by its magic bytes.
+
+    With ``threads`` > 0, gzip content is inflated ahead of use by ``_InflateReader``.
+    """
+    with open(path, "rb") as fh:
+        magic = fh.read(2)
+    if magic == b"\x1f\x8b":
+        if threads > 0:
+            return io.BufferedReader(_InflateReader(open(path, "rb"), threads, chunk_bytes))
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _open_body_stream(  # type: ignore[no-untyped-def]
+    reader: _BodyReader, threads: int = 0, chunk_bytes: int = FASTQ_STAGING_CHUNK_BYTES
+):
+    """Wrap a body reader so it yields decompressed FASTQ bytes, detecting gzip by magic bytes.
+
+    With ``threads`` > 0, gzip content is inflated ahead of use by ``_InflateReader``.
+    """
+    if reader.peek(2) == b"\x1f\x8b":
+        if threads > 0:
+            return io.BufferedReader(_InflateReader(reader, threads, chunk_bytes))
+        return gzip.GzipFile(fileobj=reader, mode="rb")  # type: ignore[arg-type]
+    return io.BufferedReader(reader)
+
+
+def _iter_fastq_records(stream: Any):  # type: ignore[no-untyped-def]
+    """Yield FASTQ records as (header, sequence, plus, quality) lines without terminators.
+
+    Raises:
+        ValueError: If the stream is not well-formed 4-line FASTQ.
+    """
+    while True:
+        header = stream.readline()
+        if not header:
+            return
+        if not header.strip():
+            continue  # Tolerate trailing blank lines
+        lines = [header] + [stream.readline() for _ in range(3)]
+        header, seq, plus, qual = (line.rstrip(b"\r\n") for line in lines)
+        if not lines[3] or not header.startswith(b"@") or not plus.startswith(b"+"):
+            raise ValueError("Malformed FASTQ record")
+        if len(seq) != len(qual):
+            raise ValueError("Sequence and quality lengths differ")
+        yield header, seq, plus, qual
+
+
+def _sample_fastq_records(records: Any, n_reads: int, method: str, seed: int) -> List[Any]:
+    """Draw up to ``n_reads`` records: the first ones ("head") or a uniform reservoir sample."""
+    sample: List[Any] = []
+    if method == "head":
+        for record in records:
+            sample.append(record)
+            if len(sample) >= n_reads:
+                break  # Stop reading the body early
+        return sample
+    if method != "reservoir":
+        raise ValueError(f"Unknown sample method '{method}'")
+    rng = random.Random(seed)
+    for seen, record in enumerate(records):
+        if seen < n_reads:
+            sample.append(record)
+        else:
+            slot = rng.randrange(seen + 1)
+            if slot < n_reads:
+                sample[slot] = record
+    return sample
+
+
+def _mean_ci(values: List[float], z: float) -> Tuple[float, float]:
+    """Return the mean of ``values`` and the half-width of its normal confidence interval."""
+    n = len(values)
+    mean = sum(values) / n
+    sd = math.sqrt(sum((x - mean) ** 2 for x in values) / (n - 1)) if n > 1 else 0.0
+    return mean, z * sd / math.sqrt(n)
+
+
+def _read_metrics(text: bytes) -> Tuple[List[int], List[int], List[int], List[int], int]:
+    """Per-read length, GC and called base counts and quality character sums of FASTQ text.
+
+    Also returns the lowest quality character (255 without any).
+    """
+    if np is None:
+        lengths, gc, called, quality_sums, lowest = [], [], [], [], 255
+        for _, seq, _, qual in _iter_fastq_records(io.BytesIO(text)):
+            seq = seq.upper()
+            lengths.append(len(seq))
+            gc.append(seq.count(b"G") + seq.count(b"C"))
+            called.append(gc[-1] + seq.count(b"A") + seq.count(b"T"))
+            quality_sums.append(sum(qual))
+            lowest = min(lowest, min(qual, default=255))
+        return lengths, gc, called, quality_sums, lowest
+
+    def range_sums(values, starts, ends):  # type: ignore[no-untyped-def]
+        cumulative = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+        return (cumulative[ends] - cumulative[starts]).tolist()
+
+    # The sample is small, so it is parsed as one block
+    blocks = list(_iter_fastq_blocks(io.BytesIO(text), max(len(text), 1)))
+    if not blocks:
+        return [], [], [], [], 255
+    ((buf, seq_starts, seq_ends, qual_starts),) = blocks
+    qual_ends = qual_starts + (seq_ends - seq_starts)
+    # Quality characters: the bytes from each quality start up to its end
+    inside = np.zeros(len(buf) + 1, dtype=np.int8)
+    inside[qual_starts] += 1
+    inside[qual_ends] -= 1
+    qualities = buf[np.cumsum(inside[:-1]) > 0]
+    return (
+        (seq_ends - seq_starts).tolist(),
+        range_sums(_CALLED_GC_BYTES[buf] >> 16, seq_starts, seq_ends),
+        range_sums(_CALLED_GC_BYTES[buf] & 0xFFFF, seq_starts, seq_ends),
+        range_sums(buf, qual_starts, qual_ends),
+        int(qualities.min()) if qualities.size else 255,
+    )
+
+
+def _sample_confidence(
+    lengths: List[int],
+    gc: List[int],
+    called: List[int],
+    quality_sums: List[int],
+    lowest_quality: int,
+) -> Dict[str, Any]:
+    """Return 95% confidence bounds for the estimates derived from a read sample.
+
+    Takes the per-read values of ``_read_metrics``.
+
+    %GC is a ratio estimate over all called bases, so its bounds use the linearized
+    (delta method) variance of the per-read GC counts. Mean read length and mean read
+    quality use the normal approximation, the median read length the binomial order
+    statistic bounds. ``distribution_margin`` is the Dvoretzky-Kiefer-Wolfowitz bound: any
+    fraction of reads read off the sample's length or GC distribution is within this many
+    percentage points of the file's.
+    """
+    z = 1.96
+    n = len(lengths)
+
+    mean_len, half_len = _mean_ci(lengths, z)
+
+    # FastQC's encoding guess: Phred+64 only if no quality character is below '@'
+    offset = 64 if lowest_quality >= 64 else 33
+    read_quality = [q / length - offset for q, length in zip(quality_sums, lengths) if length]
+    mean_quality, quality_ci = None, None
+    if read_quality:
+        mean_quality, half_quality = _mean_ci(read_quality, z)
+        quality_ci = [round(mean_quality - half_quality, 2), round(mean_quality + half_quality, 2)]
+        mean_quality = round(mean_quality, 2)
+
+    ordered = sorted(lengths)
+    spread = z * math.sqrt(n) / 2
+    median_ci = [
+        ordered[max(math.floor(n / 2 - spread), 0)],
+        ordered[min(math.ceil(n / 2 + spread), n - 1)],
+    ]
+
+    gc_ci = [0.0, 0.0]
+    mean_called = sum(called) / n
+    if mean_called > 0:
+        ratio = sum(gc) / sum(called)
+        residual_var = (
+            sum((g - ratio * c) ** 2 for g, c in zip(gc, called)) / (n - 1) if n > 1 else 0.0
+        )
+        half_gc = z * math.sqrt(residual_var / n) / mean_called
+        gc_ci = [
+            round(100.0 * max(ratio - half_gc, 0.0), 2),
+            round(100.0 * min(ratio + half_gc, 1.0), 2),
+        ]
+
+    return {
+        "gc_content_ci": gc_ci,
+        "sequence_length_mean": round(mean_len, 2),
+        "sequence_length_mean_ci": [round(mean_len - half_len, 2), round(mean_len + half_len, 2)],
+        "sequence_length_median": ordered[n // 2],
+        "sequence_length_median_ci": median_ci,
+        "sequence_length_range": [ordered[0], ordered[-1]],
+        "read_quality_mean": mean_quality,
+        "read_quality_mean_ci": quality_ci,
+        "distribution_margin": round(100.0 * math.sqrt(math.log(2 / 0.05) / (2 * n)), 2),
+    }
+
+
+def _iter_fastq_blocks(stream: Any, chunk_bytes: int):  # type: ignore[no-untyped-def]
+    """Yield ``(buf, seq_starts, seq_ends, qual_starts)`` for blocks of complete FASTQ records.
+
+    ``buf`` is a uint8 view of the block; the offset arrays locate each record's sequence and
+    quality line (line terminators excluded). Records spanning a chunk boundary are carried
+    over to the next block.
+
+    Raises:
+        ValueError: If the stream is not well-formed 4-line FASTQ.
+    """
+    carry = b""
+    while True:
+        chunk = stream.read(chunk_bytes)
+        final = not chunk
+        data = carry + chunk if carry else chunk
+        if final:
+            if not data.strip():
+                return
+            if not data.endswith(b"\n"):
+                data += b"\n"
+        buf = np.frombuffer(data, dtype=np.uint8)
+        newlines = np.flatnonzero(buf == 10)
+        n_records = len(newlines) // 4
+        if n_records == 0:
+            if final:
+                raise ValueError("Truncated FASTQ record")
+            carry = data
+            continue
+
+        ends = newlines[: n_records * 4].reshape(n_records, 4)
+        record_starts = np.empty(n_records, dtype=np.int64)
+        record_starts[0] = 0
+        record_starts[1:] = ends[:-1, 3] + 1
+        if np.any(buf[record_starts] != ord("@")) or np.any(buf[ends[:, 1] + 1] != ord("+")):
+            raise ValueError("Malformed FASTQ record")
+
+        seq_starts = ends[:, 0] + 1
+        seq_ends = ends[:, 1] - (buf[ends[:, 1] - 1] == 13)
+        qual_starts = ends[:, 2] + 1
+        qual_ends = ends[:, 3] - (buf[ends[:, 3] - 1] == 13)
+        if np.any(seq_ends - seq_starts != qual_ends - qual_starts):
+            raise ValueError("Sequence and quality lengths differ")
+
+        yield buf, seq_starts, seq_ends, qual_starts
+
+        carry = data[ends[-1, 3] + 1 :]
+        if final:
+            if carry.strip():
+                raise ValueError("Truncated FASTQ record")
+            return
+
+
+def _sample_fastq_blocks(blocks: Any, n_reads: int, method: str, seed: int) -> Tuple[bytes, int]:
+    """Draw up to ``n_reads`` records from ``_iter_fastq_blocks`` output.
+
+    "head" takes the first records and stops reading. "reservoir" gives every record a random
+    key and keeps those with the smallest keys, a uniform sample; since fewer and fewer
+    records beat the kept keys, the candidates are only cut back to ``n_reads`` once they
+    double. Returns the sampled records as FASTQ text, in file order, and their count.
+    """
+    if method not in ("head", "reservoir"):
+        raise ValueError(f"Unknown sample method '{method}'")
+    rng = np.random.default_rng(seed)
+    keys = np.empty(0)
+    order = np.empty(0, dtype=np.int64)
+    records: List[bytes] = []
+    threshold = 1.0
+    seen = 0
+
+    def keep_smallest() -> float:
+        nonlocal keys, order, records
+        kept = np.argpartition(keys, n_reads - 1)[:n_reads]
+        keys, order = keys[kept], order[kept]
+        records = [records[idx] for idx in kept.tolist()]
+        return float(keys.max())
+
+    for buf, seq_starts, seq_ends, qual_starts in blocks:
+        # A record ends after the terminator (LF or CR LF) of its quality line
+        qual_ends = qual_starts + (seq_ends - seq_starts)
+        ends = qual_ends + 1 + (buf[qual_ends] == 13)
+        if method == "head":
+            take = min(n_reads - seen, len(ends))
+            records.append(buf[: ends[take - 1]].tobytes())
+            seen += take
+            if seen >= n_reads:
+                break  # Stop reading the body early
+            continue
+        starts = np.concatenate(([0], ends[:-1]))
+        block_keys = rng.random(len(ends))
+        picked = np.flatnonzero(block_keys < threshold)
+        keys = np.concatenate((keys, block_keys[picked]))
+        order = np.concatenate((order, seen + picked))
+        records.extend(
+            buf[start:end].tobytes()
+            for start, end in zip(starts[picked].tolist(), ends[picked].tolist())
+        )
+        seen += len(ends)
+        if len(records) >= 2 * n_reads:
+            threshold = keep_smallest()
+    if method == "head":
+        return b"".join(records), seen
+    if len(records) > n_reads:
+        keep_smallest()
+    in_file_order = np.argsort(order, kind="stable").tolist()
+    return b"".join(records[idx] for idx in in_file_order), len(records)
+
+
+if np is not None:
+    # Byte lookup table packing per-read called-base (low 16 bits) and GC counts (high 16
+    # bits) into one sum; block widths are far below 2**16
+    _CALLED_GC_BYTES = np.zeros(256, dtype=np.uint32)
+    _CALLED_GC_BYTES[list(b"ATat")] = 1
+    _CALLED_GC_BYTES[list(b"GCgc")] = 1 | (1 << 16)
+
+    # Base codes of the adapter scanner; anything else (N, padding) is 4
+    _ADAPTER_BASE_CODES = np.full(256, 4, dtype=np.uint8)
+    _ADAPTER_BASE_CODES[list(b"ACGT")] = np.arange(4)
+    _ADAPTER_BASE_CODES[list(b"acgt")] = np.arange(4)
+
+_CALLED_CODES = list(b"ACGTacgt")
+_GC_CODES = list(b"GCgc")
+
+
+class _AdapterScanner:
+    """Multi-pattern adapter matcher over padded (positions x reads) base matrices.
+
+    Each read position gets a 3-bit-per-base key of the next ``_ADAPTER_PREFIX`` bases, and
+    one lookup in a table of all adapter prefixes selects candidate positions for every
+    adapter at once. N and padding have their own code, so they never become candidates.
+    The few candidates are then verified against the full sequences. As in FastQC, a read
+    counts towards an adapter from its first occurrence onwards.
+    """
+
+    def __init__(self, adapters: Dict[str, str], max_positions: int):
+        self.names = [name for name, sequence in adapters.items() if sequence]
+        # Adapter bases other than ACGT get code 5, which no read base has
+        self.codes = [
+            np.array(["ACGT".find(base) % 6 for base in adapters[name].upper()], dtype=np.uint8)
+            for name in self.names
+        ]
+        self.prefix = min([_ADAPTER_PREFIX] + [len(code) for code in self.codes])
+        weights = 8 ** np.arange(self.prefix - 1, -1, -1)
+        self.prefix_codes = [int(code[: self.prefix] @ weights) for code in self.codes]
+        self.prefix_table = np.zeros(8**self.prefix, dtype=bool)
+        self.prefix_table[self.prefix_codes] = True
+        # first_hits[a, p]: reads whose first occurrence of adapter a starts at position p + 1
+        self.first_hits = np.zeros((len(self.names), max_positions), dtype=np.int64)
+
+    def add_block(self, seq_mat) -> None:  # type: ignore[no-untyped-def]
+        width = seq_mat.shape[0]
+        windows = width - self.prefix + 1
+        if not self.names or windows <= 0:
+            return
+        codes = _ADAPTER_BASE_CODES[seq_mat]
+        keys = codes[:windows].astype(np.uint16)
+        for offset in range(1, self.prefix):
+            keys <<= 3
+            keys |= codes[offset : offset + windows]
+        positions, reads = np.nonzero(self.prefix_table[keys])
+        if positions.size == 0:
+            return
+        candidate_keys = keys[positions, reads]
+        for idx, (code, prefix_code) in enumerate(zip(self.codes, self.prefix_codes)):
+            selected = (candidate_keys == prefix_code) & (positions + len(code) <= width)
+            pos, read = positions[selected], reads[selected]
+            for offset, base in enumerate(code[self.prefix :], self.prefix):
+                if pos.size == 0:
+                    break
+                matches = codes[pos + offset, read] == base
+                pos, read = pos[matches], read[matches]
+            if pos.size == 0:
+                continue
+            # Candidates are in position order, so a read's first index is its first hit
+            _, first = np.unique(read, return_index=True)
+            self.first_hits[idx] += np.bincount(pos[first], minlength=self.first_hits.shape[1])
+
+    def curves(self, positions: int, total_reads: int) -> Dict[str, List[float]]:
+        """Percentage of reads with an adapter starting at or before positions 1..positions.
+
+        Adapters never seen are left out.
+        """
+        if not total_reads or not positions:
+            return {}
+        cumulative = np.cumsum(self.first_hits[:, :positions], axis=1) * (100.0 / total_reads)
+        return {
+            name: np.round(curve, 2).tolist()
+            for name, curve in zip(self.names, cumulative)
+            if curve[-1] > 0
+        }
+
+    def status(self, total_reads: int) -> str:
+        if not total_reads or not self.names:
+            return "PASS"
+        peak = float(self.first_hits.sum(axis=1).max()) * 100.0 / total_reads
+        if peak > _ADAPTER_FAIL_PERCENT:
+            return "FAIL"
+        if peak > _ADAPTER_WARN_PERCENT:
+            return "WARN"
+        return "PASS"
+
+
+class _FastqStats:
+    """Streaming accumulator for FASTQ basic statistics and FastQC-style module verdicts.
+
+    Per-position counts are kept as raw byte histograms and classified only when the summary
+    is built. Per-base modules use the same default thresholds as FastQC's ``limits.txt``.
+    """
+
+    def __init__(
+        self,
+        max_positions: int,
+        histogram_positions: int | None = None,
+        sketch_key: bytes | None = None,
+        adapters: Dict[str, str] | None = None,
+    ):
+        self.max_positions = max_positions
+        self.histogram_positions = histogram_positions
+        self.sketch = _ReadSketch(sketch_key) if sketch_key is not None else None
+        self.adapters = _AdapterScanner(adapters, max_positions) if adapters else None
+        self.total_sequences = 0
+        self.min_length: int | None = None
+        self.max_length = 0
+        self.zero_length = 0
+        self.positions = 0
+        # Byte value 0 marks padding of reads shorter than the block width and is ignored
+        self.base_counts = np.zeros((0, 256), dtype=np.int64)
+        self.quality_counts = np.zeros((0, 256), dtype=np.int64)
+        # Bases/qualities beyond ``max_positions`` only feed the whole-read statistics
+        self.tail_base_counts = np.zeros(256, dtype=np.int64)
+        self.tail_quality_counts = np.zeros(256, dtype=np.int64)
+        self.mean_quality_counts = np.zeros(256, dtype=np.int64)
+        if histogram_positions:
+            self.length_counts = np.zeros(histogram_positions + 1, dtype=np.int64)
+            self.gc_counts = np.zeros(101, dtype=np.int64)
+
+    def _grow(self, positions: int) -> None:
+        if positions <= self.positions:
+            return
+        extra = np.zeros((positions - self.positions, 256), dtype=np.int64)
+        self.base_counts = np.vstack([self.base_counts, extra])
+        self.quality_counts = np.vstack([self.quality_counts, extra])
+        self.positions = positions
+
+    def add_block(self, buf, seq_starts, seq_ends, qual_starts):  # type: ignore[no-untyped-def]
+        lengths = seq_ends - seq_starts
+        n_reads = len(lengths)
+        if n_reads == 0:
+            return
+        block_min = int(lengths.min())
+        block_max = int(lengths.max())
+        self.total_sequences += n_reads
+        self.min_length = block_min if self.min_length is None else min(self.min_length, block_min)
+        self.max_length = max(self.max_length, block_max)
+        self.zero_length += int(np.count_nonzero(lengths == 0))
+        if self.sketch is not None:
+            self.sketch.add_block(buf, seq_starts, seq_ends)
+        if self.histogram_positions:
+            clipped = np.minimum(lengths, self.histogram_positions)
+            self.length_counts += np.bincount(clipped, minlength=self.histogram_positions + 1)
+
+        width = min(block_max, self.max_positions)
+        if width == 0:
+            return
+        self._grow(width)
+
+        # Padded (positions x reads) matrices; transposed so every position is contiguous
+        offsets = np.arange(width)
+        last = len(buf) - 1
+        seq_mat = buf[np.minimum(seq_starts[None, :] + offsets[:, None], last)]
+        qual_mat = buf[np.minimum(qual_starts[None, :] + offsets[:, None], last)]
+        if block_min < width:
+            pad = offsets[:, None] >= lengths[None, :]
+            seq_mat[pad] = 0
+            qual_mat[pad] = 0
+        if self.adapters is not None:
+            self.adapters.add_block(seq_mat)
+
+        for pos in range(width):
+            self.base_counts[pos] += np.bincount(seq_mat[pos], minlength=256)
+            self.quality_counts[pos] += np.bincount(qual_mat[pos], minlength=256)
+
+        q_sums = qual_mat.sum(axis=0, dtype=np.int64)
+        if self.histogram_positions:
+            packed = _CALLED_GC_BYTES[seq_mat].sum(axis=0, dtype=np.uint32)
+            called = (packed & 0xFFFF).astype(np.int64)
+            gc = (packed >> 16).astype(np.int64)
+        if block_max > width:
+            for idx in np.flatnonzero(lengths > width):
+                tail = slice(int(seq_starts[idx]) + width, int(seq_ends[idx]))
+                tail_counts = np.bincount(buf[tail], minlength=256)
+                self.tail_base_counts += tail_counts
+                if self.histogram_positions:
+                    called[idx] += int(tail_counts[_CALLED_CODES].sum())
+                    gc[idx] += int(tail_counts[_GC_CODES].sum())
+                tail_q = buf[int(qual_starts[idx]) + width : int(qual_starts[idx] + lengths[idx])]
+                self.tail_quality_counts += np.bincount(tail_q, minlength=256)
+                q_sums[idx] += int(tail_q.sum(dtype=np.int64))
+
+        nonempty = lengths > 0
+        # FastQC truncates the mean quality character of a read
+        mean_chars = q_sums[nonempty] // lengths[nonempty]
+        self.mean_quality_counts += np.bincount(mean_chars, minlength=256)
+        if self.histogram_positions:
+            has_calls = called > 0
+            gc_pct = np.rint(100.0 * gc[has_calls] / called[has_calls]).astype(np.int64)
+            self.gc_counts += np.bincount(gc_pct, minlength=101)
+
+    def histograms(self) -> Dict[str, List[float]]:
+        """Return the mergeable histograms (see ``_empty_histograms``)."""
+        positions = self.histogram_positions
+        covered = min(positions, self.positions)  # type: ignore[type-var]
+        counts = self.quality_counts[:covered, 1:]
+        scores = np.arange(1, 256, dtype=np.int64) - self._phred_offset()
+        quality_counts = np.zeros(positions, dtype=np.int64)  # type: ignore[arg-type]
+        quality_sums = np.zeros(positions, dtype=np.int64)  # type: ignore[arg-type]
+        quality_counts[:covered] = counts.sum(axis=1)
+        quality_sums[:covered] = counts @ scores
+        return {
+            "quality_sums": quality_sums.tolist(),
+            "quality_counts": quality_counts.tolist(),
+            "length_counts": self.length_counts.tolist(),
+            "gc_counts": self.gc_counts.tolist(),
+        }
+
+    def _class_counts(self, counts):  # type: ignore[no-untyped-def]
+        """Collapse raw byte histograms (..., 256) into (..., 5) counts of A, C, G, T, N."""
+        return np.stack(
+            [counts[..., ord(u)] + counts[..., ord(u.lower())] for u in "ACGTN"], axis=-1
+        )
+
+    def _phred_offset(self) -> int:
+        # Same heuristic as FastQC: any character below '@' implies Sanger/Illumina 1.8+
+        seen = self.quality_counts[:, 1:].sum(axis=0) + self.tail_quality_counts[1:]
+        used = np.flatnonzero(seen)
+        min_quality_char = int(used[0]) + 1 if used.size else 255
+        return 33 if min_quality_char < 64 else 64
+
+    def _per_base_quality_status(self) -> str:
+        offset = self._phred_offset()
+        totals = self.quality_counts[:, 1:].sum(axis=1)
+        used = totals > 0
+        if not np.any(used):
+            return "PASS"
+        cumulative = np.cumsum(self.quality_counts[used, 1:], axis=1)
+        # Column 0 (padding) was dropped, so histogram index i is quality character i + 1
+        lower_quartile = np.argmax(cumulative >= (totals[used] * 0.25)[:, None], axis=1)
+        lower_quartile = lower_quartile + 1 - offset
+        median = np.argmax(cumulative >= (totals[used] * 0.5)[:, None], axis=1) + 1 - offset
+        if np.any(lower_quartile < 5) or np.any(median < 20):
+            return "FAIL"
+        if np.any(lower_quartile < 10) or np.any(median < 25):
+            return "WARN"
+        return "PASS"
+
+    def _per_sequence_quality_status(self) -> str:
+        if not self.mean_quality_counts.any():
+            return "PASS"
+        mode = int(np.argmax(self.mean_quality_counts)) - self._phred_offset()
+        if mode < 20:
+            return "FAIL"
+        if mode < 27:
+            return "WARN"
+        return "PASS"
+
+    def _per_base_content_status(self) -> str:
+        acgt = self._class_counts(self.base_counts)[:, :4].astype(np.float64)
+        totals = acgt.sum(axis=1)
+        used = totals > 0
+        if not np.any(used):
+            return "PASS"
+        pct = acgt[used] / totals[used, None] * 100.0
+        deviation = np.maximum(np.abs(pct[:, 0] - pct[:, 3]), np.abs(pct[:, 1] - pct[:, 2]))
+        if np.any(deviation > 20):
+            return "FAIL"
+        if np.any(deviation > 10):
+            return "WARN"
+        return "PASS"
+
+    def _per_base_n_status(self) -> str:
+        totals = self.base_counts[:, 1:].sum(axis=1)
+        used = totals > 0
+        if not np.any(used):
+            return "PASS"
+        n_pct = self._class_counts(self.base_counts)[used, 4] / totals[used] * 100.0
+        if np.any(n_pct > 20):
+            return "FAIL"
+        if np.any(n_pct > 5):
+            return "WARN"
+        return "PASS"
+
+    def _length_distribution_status(self) -> str:
+        if self.zero_length:
+            return "FAIL"
+        if self.min_length != self.max_length:
+            return "WARN"
+        return "PASS"
+
+    def summary(self) -> Dict[str, Any]:
+        """Return basic statistics and module statuses keyed like the parsed FastQC report."""
+        acgt = self._class_counts(self.base_counts.sum(axis=0) + self.tail_base_counts)
+        gc_bases = int(acgt[1] + acgt[2])
+        called = int(acgt[:4].sum())
+        min_length = self.min_length or 0
+        extras: Dict[str, Any] = {}
+        if self.histogram_positions:
+            extras["histograms"] = self.histograms()
+        if self.sketch is not None:
+            extras["sketch"] = self.sketch.to_payload()
+        if self.adapters is not None:
+            extras["adapter_curves"] = self.adapters.curves(self.positions, self.total_sequences)
+            extras["adapter_content"] = self.adapters.status(self.total_sequences)
+        return {
+            **extras,
+            "total_sequences": self.total_sequences,
+            "sequence_length": (
+                min_length if min_length == self.max_length else f"{min_length}-{self.max_length}"
+            ),
+            # FastQC reports %GC as an integer, rounded down
+            "gc_content": float(100 * gc_bases // called) if called else 0.0,
+            "basic_statistics": "PASS",
+            "per_base_sequence_quality": self._per_base_quality_status(),
+            "per_sequence_quality_scores": self._per_sequence_quality_status(),
+            "per_base_sequence_content": self._per_base_content_status(),
+            "per_base_n_content": self._per_base_n_status(),
+            "sequence_length_distribution": self._length_distribution_status(),
+        }
+
+
+def _pack_array(array: Any) -> str:
+    """Encode a fixed-size NumPy array compactly for JSON (zlib-compressed, base64)."""
+    return base64.b64encode(zlib.compress(array.tobytes(), 6)).decode("ascii")
+
+
+def _unpack_array(text: str, dtype: Any, shape: Tuple[int, ...]) -> Any:
+    """Decode ``_pack_array`` output.
+
+    Raises:
+        ValueError: If the payload does not match ``dtype`` and ``shape``.
+    """
+    data = zlib.decompress(base64.b64decode(text))
+    return np.frombuffer(data, dtype=dtype).reshape(shape).copy()
+
+
+def _mix64(values: Any) -> Any:
+    """SplitMix64 finalizer over a uint64 array (bijective, well-spread bits)."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def _rotl64(values: Any, bits: int) -> Any:
+    return (values << np.uint64(bits)) | (values >> np.uint64(64 - bits))
+
+
+def _siphash24(words: Any, key: bytes) -> Any:
+    """SipHash-2-4 of every row of a (messages x words) uint64 array under a 16-byte key.
+
+    Rows are complete messages in little-endian words, the last word already holding the
+    message length in its top byte as the algorithm requires.
+    """
+    k0, k1 = (np.uint64(k) for k in struct.unpack("<2Q", key))
+    n = words.shape[0]
+    v0 = np.full(n, k0 ^ np.uint64(0x736F6D6570736575), dtype=np.uint64)
+    v1 = np.full(n, k1 ^ np.uint64(0x646F72616E646F6D), dtype=np.uint64)
+    v2 = np.full(n, k0 ^ np.uint64(0x6C7967656E657261), dtype=np.uint64)
+    v3 = np.full(n, k1 ^ np.uint64(0x7465646279746573), dtype=np.uint64)
+
+    def rounds(count: int) -> None:
+        nonlocal v0, v1, v2, v3
+        for _ in range(count):
+            v0 += v1
+            v1 = _rotl64(v1, 13) ^ v0
+            v0 = _rotl64(v0, 32)
+            v2 += v3
+            v3 = _rotl64(v3, 16) ^ v2
+            v0 += v3
+            v3 = _rotl64(v3, 21) ^ v0
+            v2 += v1
+            v1 = _rotl64(v1, 17) ^ v2
+            v2 = _rotl64(v2, 32)
+
+    for idx in range(words.shape[1]):
+        word = words[:, idx]
+        v3 ^= word
+        rounds(2)
+        v0 ^= word
+    v2 ^= np.uint64(0xFF)
+    rounds(4)
+    return v0 ^ v1 ^ v2 ^ v3
+
+
+def _load_sketch_key(path: str | None) -> bytes | None:
+    """Derive the 16-byte read hash key from a node-local secret file; None if unavailable."""
+    if path is None:
+        return None
+    try:
+        with open(path, "rb") as fh:
+            secret = fh.read()
+    except OSError:
+        return None
+    return hashlib.sha256(secret).digest()[:16] if secret.strip() else None
+
+
+class _ReadSketch:
+    """Fixed-size, mergeable sketches of the reads' first ``_SKETCH_PREFIX`` bases.
+
+    A HyperLogLog counts distinct reads (duplication rate, library complexity) and a
+    count-min sketch with a bounded candidate list tracks over-represented sequences. Like
+    FastQC, reads sharing their first 50 bases count as duplicates. Memory does not grow
+    with the number or diversity of reads, and merging two sketches gives the sketch of
+    the combined reads, provided both were built with the same ``key``.
+
+    Reads are hashed with SipHash under ``key``, so sketches and reported hashes cannot be
+    matched against candidate sequences without it.
+    """
+
+    def __init__(self, key: bytes = bytes(16)) -> None:
+        self.key = key
+        # Tells sketches of different keys apart without revealing the key
+        self.key_id = hashlib.sha256(b"qc-sketch-key:" + key).hexdigest()[:16]
+        self.reads = 0
+        self.registers = np.zeros(1 << _HLL_PRECISION, dtype=np.uint8)
+        self.counts = np.zeros((_CMS_DEPTH, _CMS_WIDTH), dtype=np.uint32)
+        self.candidates = np.zeros(0, dtype=np.uint64)
+
+    def _hash_reads(self, buf, seq_starts, seq_ends):  # type: ignore[no-untyped-def]
+        """Keyed 64-bit hash of every read's prefix, zero-padded to ``_SKETCH_PREFIX`` bytes."""
+        n_words = _SKETCH_PREFIX // 8 + 1
+        offsets = np.arange(_SKETCH_PREFIX)
+        message = np.zeros((len(seq_starts), n_words * 8), dtype=np.uint8)
+        prefix = buf[np.minimum(seq_starts[:, None] + offsets, len(buf) - 1)]
+        # Positions past the read end are byte 0, so prefixes of reads stay distinct
+        message[:, :_SKETCH_PREFIX] = np.where(
+            offsets < (seq_ends - seq_starts)[:, None], prefix, 0
+        )
+        message[:, -1] = _SKETCH_PREFIX  # Message length byte
+        return _siphash24(message.view("<u8").astype(np.uint64, copy=False), self.key)
+
+    def _cms_columns(self, hashes):  # type: ignore[no-untyped-def]
+        spread = _mix64(hashes ^ np.uint64(0x9E3779B97F4A7C15))
+        mask = np.uint64(_CMS_WIDTH - 1)
+        return [
+            ((spread >> np.uint64(16 * row)) & mask).astype(np.intp) for row in range(_CMS_DEPTH)
+        ]
+
+    def estimate_counts(self, hashes):  # type: ignore[no-untyped-def]
+        columns = self._cms_columns(hashes)
+        return np.min([self.counts[row, col] for row, col in enumerate(columns)], axis=0)
+
+    def _update_candidates(self, hashes) -> None:  # type: ignore[no-untyped-def]
+        pool = np.union1d(self.candidates, hashes)
+        if len(pool) > _SKETCH_CANDIDATES:
+            estimates = self.estimate_counts(pool)
+            pool = pool[np.argsort(estimates, kind="stable")[::-1][:_SKETCH_CANDIDATES]]
+        self.candidates = pool
+
+    def add_block(  # type: ignore[no-untyped-def]
+        self, buf, seq_starts, seq_ends, qual_starts=None
+    ):
+        """Add a block from ``_iter_fastq_blocks`` (qualities are not used)."""
+        n_reads = len(seq_starts)
+        if n_reads == 0:
+            return
+        self.reads += n_reads
+        hashes = self._hash_reads(buf, seq_starts, seq_ends)
+
+        # HyperLogLog: top bits pick the register, the rank is the position of the highest
+        # set bit of the remaining bits (< 2**53, so float64 frexp is exact)
+        rest_bits = 64 - _HLL_PRECISION
+        index = (hashes >> np.uint64(rest_bits)).astype(np.intp)
+        rest = (hashes & np.uint64((1 << rest_bits) - 1)).astype(np.float64)
+        rank = (rest_bits + 1 - np.frexp(rest)[1]).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+        for row, col in enumerate(self._cms_columns(hashes)):
+            self.counts[row] += np.bincount(col, minlength=_CMS_WIDTH).astype(np.uint32)
+        self._update_candidates(np.unique(hashes))
+
+    def merge(self, other: "_ReadSketch") -> None:
+        """Add another sketch.
+
+        Raises:
+            ValueError: If the sketches hash reads under different keys.
+        """
+        if other.key_id != self.key_id:
+            raise ValueError("Sketches built with different keys")
+        self.reads += other.reads
+        np.maximum(self.registers, other.registers, out=self.registers)
+        self.counts += other.counts
+        self._update_candidates(other.candidates)
+
+    def distinct_reads(self) -> int:
+        m = float(len(self.registers))
+        alpha = 0.7213 / (1.0 + 1.079 / m)
+        estimate = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # Linear counting for small cardinalities
+        return int(round(min(estimate, self.reads)))
+
+    def summary(self, hashes: bool = True) -> Dict[str, Any]:
+        """Return the duplication estimate and over-represented sequences, with their hashes."""
+        distinct = self.distinct_reads()
+        overrepresented = []
+        if len(self.candidates) and self.reads:
+            estimates = self.estimate_counts(self.candidates)
+            order = np.argsort(estimates, kind="stable")[::-1]
+            for idx in order[:_SKETCH_TOP]:
+                count = int(estimates[idx])
+                if count < self.reads * _OVERREPRESENTED_FRACTION or count < 2:
+                    break
+                entry = {
+                    "hash": f"{int(self.candidates[idx]):016x}",
+                    "count": count,
+                    "percent": round(100.0 * count / self.reads, 3),
+                }
+                if not hashes:
+                    del entry["hash"]
+                overrepresented.append(entry)
+        return {
+            "reads": self.reads,
+            "distinct_reads_estimate": distinct,
+            "duplication_rate": round(1.0 - distinct / self.reads, 4) if self.reads else 0.0,
+            "overrepresented": overrepresented,
+        }
+
+    def to_payload(self) -> Dict[str, Any]:
+        return {
+            "key_id": self.key_id,
+            "reads": self.reads,
+            "hll": _pack_array(self.registers),
+            "cms": _pack_array(self.counts),
+            "candidates": _pack_array(self.candidates),
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "_ReadSketch":
+        """Rebuild a sketch from ``to_payload`` output.
+
+        Raises:
+            ValueError: If the payload does not have the expected layout.
+        """
+        sketch = cls()
+        sketch.key_id = str(payload["key_id"])
+        sketch.reads = int(payload["reads"])
+        sketch.registers = _unpack_array(payload["hll"], np.uint8, (1 << _HLL_PRECISION,))
+        sketch.counts = _unpack_array(payload["cms"], np.uint32, (_CMS_DEPTH, _CMS_WIDTH))
+        candidates = zlib.decompress(base64.b64decode(payload["candidates"]))
+        sketch.candidates = np.frombuffer(candidates, dtype=np.uint64).copy()
+        return sketch
+
+
+def _merge_sketches(payloads: List[Dict[str, Any]]) -> Dict[str, Any] | None:
+    """Merge sketch payloads into one payload; None without NumPy or payloads.
+
+    Raises:
+        ValueError: If the payloads have another layout or were built under different keys.
+    """
+    if np is None or not payloads:
+        return None
+    merged = _ReadSketch.from_payload(payloads[0])
+    for payload in payloads[1:]:
+        merged.merge(_ReadSketch.from_payload(payload))
+    return merged.to_payload()
+
+
+def _wait_with_rusage(proc: subprocess.Popen, timeout: float) -> int:
+    """Wait for ``proc`` to exit and return its peak resident set size (kB on Linux).
+
+    Uses ``os.wait4`` so the resource usage of exactly this child is reported.
+
+    Raises:
+        subprocess.TimeoutExpired: If the process had to be killed after ``timeout`` seconds.
+    """
+    if not hasattr(os, "wait4"):  # pragma: no cover - non-POSIX fallback
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            raise
+        return 0
+
+    timed_out = threading.Event()
+
+    def kill() -> None:
+        timed_out.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    try:
+        _, status, usage = os.wait4(proc.pid, 0)
+    finally:
+        timer.cancel()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(proc.args, timeout)
+    return usage.ru_maxrss
+
+
+class _ResultCache:
+    """Size-bounded on-disk LRU cache of per-file QC results, one JSON file per key.
+
+    Recency is tracked through file modification times, so the LRU order survives restarts.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._entries())
+
+    def _entries(self) -> List[Tuple[float, str, int]]:
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, path, st.st_size))
+        return entries
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str, fname: str) -> Dict[str, Any] | None:
+        """Return the cached result for ``key`` relabelled to ``fname``, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                result = json.load(fh)
+            os.utime(path)  # Mark as recently used
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        result["file"] = fname
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a result and evict least recently used entries beyond the size cap."""
+        payload = json.dumps({k: v for k, v in result.items() if k != "file"}).encode("utf-8")
+        path = self._path(key)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(payload)
+            os.replace(tmp_path, path)  # Atomic, so readers never see partial entries
+        except OSError:
+            return
+        with self._lock:
+            self._total_bytes += len(payload)
+            if self._total_bytes <= self.max_bytes:
+                return
+            entries = sorted(self._entries())
+            self._total_bytes = sum(size for _, _, size in entries)
+            for _, old_path, size in entries:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(old_path)
+                except OSError:
+                    continue
+                self._total_bytes -= size
+
 
 class FastqAnalyzer(StarAnalyzer):
     """Analyzer that performs QC across all FASTQ files in a provided folder dataset.
 
     Expected data layout provided to ``analysis_method`` for S3 data_type:
         data[0] -> dict mapping each queried object key to its object body (bytes/str).
+    Entries may also be lazy object sources: iterables of (key, body) pairs, or of
+    (key, body, size) with the object size from the bucket listing, whose bodies are bytes,
+    str, file-like streams or iterables of chunks (see ``FASTQ_PREFETCH_DEPTH``).
     """
 
     def __init__(self, flame):  # type: ignore[no-untyped-def]
         super().__init__(flame)
+        self.max_workers = max(1, FASTQ_MAX_WORKERS or os.cpu_count() or 1)
+        self.memory_budget_bytes = FASTQ_MEMORY_BUDGET_BYTES
+        self.batch_size = max(1, FASTQ_BATCH_SIZE)
+        self.batch_threads = FASTQ_BATCH_THREADS
+        self.timeout_seconds = FASTQ_TIMEOUT_SECONDS
+        self.engine = FASTQ_ENGINE
+        self.native_chunk_bytes = FASTQ_NATIVE_CHUNK_BYTES
+        self.native_max_positions = FASTQ_NATIVE_MAX_POSITIONS
+        self.staging = FASTQ_STAGING
+        self.staging_chunk_bytes = FASTQ_STAGING_CHUNK_BYTES
+        self.prefetch_depth = FASTQ_PREFETCH_DEPTH
+        self.prefetch_bytes = FASTQ_PREFETCH_BYTES
+        self.decompress_threads = FASTQ_DECOMPRESS_THREADS
+        self.gzip_precheck = FASTQ_GZIP_PRECHECK
+        self.instrument = FASTQ_INSTRUMENT
+        self.histogram_positions = FASTQ_HISTOGRAM_POSITIONS
+        self.sketch_reads = FASTQ_SKETCH_READS and np is not None
+        self.sketch_key_path = FASTQ_SKETCH_KEY_PATH
+        # Loaded by analysis_method; the all-zero key stands for "no secret"
+        self._sketch_key = bytes(16)
+        self.adapters = FASTQ_ADAPTERS
+        self._local = threading.local()
+        self.sample_reads = FASTQ_SAMPLE_READS
+        self.sample_method = FASTQ_SAMPLE_METHOD
+        self.sample_seed = FASTQ_SAMPLE_SEED
+        self.sample_min_reads = FASTQ_SAMPLE_MIN_READS
+        self.cache = (
+            _ResultCache(FASTQ_CACHE_DIR, FASTQ_CACHE_MAX_BYTES) if FASTQ_CACHE_DIR else None
+        )
+        self._fastqc_version: str | None = None
+        self._fastqc_version_lock = threading.Lock()
 
-    def _process_fastq_file(self, fname: str, path: str, size_bytes: int) -> Dict[str, Any]:
-        """Run FastQC; never raises. Returns a result dict with pass False on any failure."""
+    @contextlib.contextmanager
+    def _timings_scope(self, timings: FileTimings | None):  # type: ignore[no-untyped-def]
+        """Route phase measurements of the current thread into ``timings``."""
+        previous = getattr(self._local, "timings", None)
+        self._local.timings = timings
+        try:
+            yield
+        finally:
+            self._local.timings = previous
 
-        def fail(reason: str) -> Dict[str, Any]:
-            return {
-                "file": fname,
-                "size_bytes": size_bytes,
-                "pass": False,
-                "warnings": False,
-                "reason": reason,
-                "total_sequences": 0,
-                "sequence_length": 0,
-                "gc_content": 0.0,
-            }
+    def _phase(self, name: str):  # type: ignore[no-untyped-def]
+        """Context manager timing one phase of the file currently processed by this thread."""
+        timings = getattr(self._local, "timings", None)
+        return timings.phase(name) if timings is not None else contextlib.nullcontext()
+
+    def _record_peak_rss(self, peak_rss_kb: int) -> None:
+        timings = getattr(self._local, "timings", None)
+        if timings is not None:
+            timings.peak_rss_kb = max(timings.peak_rss_kb, peak_rss_kb)
+
+    def _inflate_threads(self) -> int:
+        """Threads used to inflate one gzip input in-process; 0 disables background inflation."""
+        if self.decompress_threads is not None:
+            return max(0, self.decompress_threads)
+        return max(1, (os.cpu_count() or 1) // self.max_workers)
+
+    def _open_file(self, path: str):  # type: ignore[no-untyped-def]
+        return _open_fastq_stream(path, self._inflate_threads(), self.staging_chunk_bytes)
+
+    def _open_body(self, reader: _BodyReader):  # type: ignore[no-untyped-def]
+        return _open_body_stream(reader, self._inflate_threads(), self.staging_chunk_bytes)
+
+    def _check_gzip(self, path: str) -> str | None:
+        """Run the gzip integrity pre-check on a staged file; failure reason or None."""
+        if not self.gzip_precheck:
+            return None
+        with self._phase("check"):
+            try:
+                return _check_gzip_integrity(
+                    path, max(1, self._inflate_threads()), self.staging_chunk_bytes
+                )
+            except (OSError, ValueError):
+                return None  # Unreadable here; leave the verdict to FastQC
+
+    def _attach_sketch(self, result: Dict[str, Any], path: str) -> None:
+        """Add read sketches to a FastQC-based result with one extra pass over the file."""
+        if not self.sketch_reads:
+            return
+        if not (result["pass"] or result["reason"].startswith("FAIL modules")):
+            return  # FastQC could not read the file either
+        sketch = _ReadSketch(self._sketch_key)
+        try:
+            with self._phase("tool"), self._open_file(path) as stream:
+                for block in _iter_fastq_blocks(stream, self.native_chunk_bytes):
+                    sketch.add_block(*block)
+        except Exception:
+            return  # The FastQC verdict stands; the node estimate just lacks this file
+        result["sketch"] = sketch.to_payload()
+
+    def _engine_id(self) -> str | None:
+        """Identify the QC engine and its version for cache keys; None if it cannot be told."""
+        if self.engine == "native":
+            return f"native:{__version__}:{self.native_max_positions}"
+        with self._fastqc_version_lock:
+            if self._fastqc_version is None:
+                try:
+                    out = subprocess.run(
+                        ["fastqc", "--version"], capture_output=True, text=True, timeout=60
+                    )
+                    self._fastqc_version = out.stdout.strip() if out.returncode == 0 else ""
+                except Exception:
+                    self._fastqc_version = ""
+        return f"fastqc:{self._fastqc_version}" if self._fastqc_version else None
+
+    def _cache_key(self, content_hash: str | None) -> str | None:
+        if self.cache is None or content_hash is None:
+            return None
+        engine_id = self._engine_id()
+        if engine_id is None:
+            return None
+        sketch = hashlib.sha256(self._sketch_key).hexdigest() if self.sketch_reads else ""
+        key = (
+            f"{content_hash}|{engine_id}|{_RESULT_PARSER_VERSION}|{self.histogram_positions}"
+            f"|{sketch}|{json.dumps(self.adapters, sort_keys=True)}"
+        )
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _cached_result(self, content_hash: str | None, fname: str) -> Dict[str, Any] | None:
+        key = self._cache_key(content_hash)
+        return self.cache.get(key, fname) if key is not None else None  # type: ignore[union-attr]
+
+    def _store_result(self, content_hash: str | None, result: Dict[str, Any]) -> None:
+        if result["reason"].startswith(_TRANSIENT_REASON_PREFIXES):
+            return
+        key = self._cache_key(content_hash)
+        if key is not None:
+            self.cache.put(key, result)  # type: ignore[union-attr]
+
+    def _run_fastqc(
+        self,
+        paths: List[str],
+        outdir: str,
+        timeout: float,
+        threads: int = 1,
+        stdin: _BodyReader | None = None,
+    ) -> subprocess.CompletedProcess:
+        """Invoke FastQC once for all ``paths``, writing reports into ``outdir``.
+
+        With ``stdin`` the body is streamed into FastQC's standard input by a feeder thread;
+        ``paths`` must then name a single ``stdin:<name>`` input. The configured adapter set
+        is written to ``outdir`` and passed via ``--adapters``. The run time and the peak
+        RSS of the FastQC process are recorded for instrumentation.
+
+        Raises:
+            subprocess.TimeoutExpired: If FastQC does not finish within ``timeout`` seconds.
+            FileNotFoundError: If the FastQC executable is missing.
+        """
+        cmd = ["fastqc", "--quiet", "--outdir", outdir]
+        if threads > 1:
+            cmd += ["--threads", str(threads)]
+        if self.adapters:
+            adapters_path = os.path.join(outdir, "adapters.txt")
+            with open(adapters_path, "w", encoding="utf-8") as fh:
+                for name, sequence in self.adapters.items():
+                    fh.write(f"{name}\t{sequence}\n")
+            cmd += ["--adapters", adapters_path]
+        cmd += paths
+
+        with tempfile.TemporaryFile() as stderr_file:
+            proc = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE if stdin is not None else subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=stderr_file,
+            )
+            feed_errors: List[BaseException] = []
+            feeder = None
+            if stdin is not None:
+                feeder = threading.Thread(
+                    target=_feed_stdin, args=(proc.stdin, stdin, feed_errors), daemon=True
+                )
+                feeder.start()
+            try:
+                with self._phase("tool"):
+                    peak_rss_kb = _wait_with_rusage(proc, timeout)
+            finally:
+                if feeder is not None:
+                    feeder.join()
+            self._record_peak_rss(peak_rss_kb)
+            if feed_errors:
+                # A partially read body must not pass QC
+                raise feed_errors[0]
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode("utf-8", errors="replace")
+        return subprocess.CompletedProcess(cmd, proc.returncode, "", stderr)
+
+    def _read_fastqc_zip(self, zip_path: str) -> Tuple[str, str]:
+        """Return the (fastqc_data.txt, summary.txt) contents of a FastQC report zip.
+
+        Raises:
+            KeyError: If one of the report files is missing from the archive.
+        """
+        with zipfile.ZipFile(zip_path, "r") as zf:
+            folder = os.path.basename(zip_path)[:-4]
+            data_content = zf.read(f"{folder}/fastqc_data.txt").decode("utf-8")
+            summary_content = zf.read(f"{folder}/summary.txt").decode("utf-8")
+        return data_content, summary_content
+
+    def _process_fastq_file(
+        self,
+        fname: str,
+        path: str,
+        size_bytes: int,
+        content_hash: str | None = None,
+        gzip_checked: bool = False,
+    ) -> Dict[str, Any]:
+        """Run FastQC (or the native engine); never raises.
+
+        Returns a result dict with pass False on any failure. With a ``content_hash`` and an
+        enabled cache, a previously computed result for the same content is returned as is.
+        Gzip input is pre-checked before FastQC starts unless ``gzip_checked`` says that
+        has already happened.
+        """
+        cached = self._cached_result(content_hash, fname)
+        if cached is not None:
+            return cached
 
         if size_bytes == 0:
-            return fail("Empty file")
+            result = _failed_file_result(fname, size_bytes, "Empty file")
+        elif self.engine == "native":
+            result = self._process_fastq_native(fname, lambda: self._open_file(path), size_bytes)
+        else:
+            reason = None if gzip_checked else self._check_gzip(path)
+            if reason is not None:
+                result = _failed_file_result(fname, size_bytes, reason)
+            else:
+                result = self._process_with_fastqc(fname, path, size_bytes)
+                self._attach_sketch(result, path)
+
+        self._store_result(content_hash, result)
+        return result
+
+    def _process_fastq_stream(self, fname: str, content: Any) -> Dict[str, Any]:
+        """QC an object body without staging it on disk; never raises.
+
+        The body is read once, in bounded chunks, so memory use does not depend on its size.
+        """
+        # Only in-memory bodies can be hashed before they are consumed
+        content_hash = None
+        if self.cache is not None and isinstance(content, (bytes, bytearray, memoryview, str)):
+            hasher = _BodyReader(content, self.staging_chunk_bytes, hash_content=True)
+            for _ in hasher.chunks():
+                pass
+            content_hash = hasher.sha256.hexdigest()  # type: ignore[union-attr]
+            cached = self._cached_result(content_hash, fname)
+            if cached is not None:
+                return cached
+
+        reader = _BodyReader(content, self.staging_chunk_bytes)
+        try:
+            is_empty = not reader.peek(1)
+        except Exception as exc:
+            return _failed_file_result(fname, 0, f"Staging error: {exc}")
+
+        if is_empty:
+            result = _failed_file_result(fname, 0, "Empty file")
+        elif self.engine == "native":
+            result = self._process_fastq_native(fname, lambda: self._open_body(reader), reader)
+        elif self._inflate_threads() > 0 and reader.peek(2) == b"\x1f\x8b":
+            # Inflate in-process (in parallel for BGZF) and pipe plain FASTQ into FastQC
+            with self._open_body(reader) as stream:
+                plain = _BodyReader(stream, self.staging_chunk_bytes)
+                result = self._process_with_fastqc(fname, "stdin:object.fastq", reader, plain)
+        else:
+            # FastQC picks the decompression from the name given after "stdin:"
+            if fname.endswith((".fastq.gz", ".fq.gz")):
+                stdin_name = "object.fastq.gz"
+            else:
+                stdin_name = "object.fastq"
+            result = self._process_with_fastqc(fname, f"stdin:{stdin_name}", reader)
+
+        self._store_result(content_hash, result)
+        return result
+
+    def _process_fastq_sample(self, fname: str, content: Any) -> Dict[str, Any]:
+        """Quick QC: run the configured engine on a read sample only; never raises.
+
+        The sample is drawn from the same vectorized blocks as the native engine parses (record
+        by record without NumPy). The native engine QCs it in memory, FastQC from a temp file.
+        The result is tagged with the sample size and 95% confidence bounds for the sampled
+        estimates (see ``_sample_confidence``). ``size_bytes`` is the object size if the body
+        or its source reports it or the body was read to the end; otherwise it is the bytes
+        read so far and ``size_known`` is False. ``sampled_bytes`` is what was read. Sampled
+        results are never cached.
+        """
+        reader = _BodyReader(content, self.staging_chunk_bytes)
+        try:
+            with self._phase("staging"), self._open_body(reader) as stream:
+                if np is not None:
+                    blocks = _iter_fastq_blocks(stream, self.native_chunk_bytes)
+                    sample, sample_size = _sample_fastq_blocks(
+                        blocks,
+                        self.sample_reads,  # type: ignore[arg-type]
+                        self.sample_method,
+                        self.sample_seed,
+                    )
+                else:
+                    records = _sample_fastq_records(
+                        _iter_fastq_records(stream),
+                        self.sample_reads,  # type: ignore[arg-type]
+                        self.sample_method,
+                        self.sample_seed,
+                    )
+                    sample = b"".join(b"\n".join(record) + b"\n" for record in records)
+                    sample_size = len(records)
+        except (ValueError, EOFError, OSError) as exc:
+            return _failed_file_result(fname, reader.bytes_read, f"Parsing error: {exc}")
+        except Exception as exc:  # last-resort catch -> mark file failed
+            return _failed_file_result(fname, reader.bytes_read, f"Unexpected error: {exc}")
+
+        # With "head" sampling the body is usually not read to the end
+        size_bytes = body_size(content)
+        if size_bytes is None:
+            try:
+                if not reader.peek(1):
+                    size_bytes = reader.bytes_read
+            except Exception:
+                pass
+        size = {"size_known": False} if size_bytes is None else {}
+        if size_bytes is None:
+            size_bytes = reader.bytes_read
+        if not sample_size:
+            return {**_failed_file_result(fname, size_bytes, "Empty file"), **size}
+
+        if self.engine == "native":
+            result = self._process_fastq_native(fname, lambda: io.BytesIO(sample), len(sample))
+        else:
+            with tempfile.NamedTemporaryFile(mode="wb", delete=False, suffix=".fastq") as tmp:
+                tmp.write(sample)
+            try:
+                result = self._process_fastq_file(fname, tmp.name, len(sample))
+            finally:
+                os.unlink(tmp.name)
+
+        result["size_bytes"] = size_bytes
+        result.update(size)
+        # Duplication within a sample says little about the file
+        result.pop("sketch", None)
+        if "histograms" in result:
+            # Marks the node's merged histograms as partly sampled
+            result["histograms"]["sampled_files"] = 1
+        result.update(
+            {
+                "sampled": True,
+                "sample_method": self.sample_method,
+                "sample_size": sample_size,
+                "sampled_bytes": reader.bytes_read,
+                **_sample_confidence(*_read_metrics(sample)),
+            }
+        )
+        return result
+
+    def _process_with_fastqc(
+        self,
+        fname: str,
+        fastqc_input: str,
+        size: int | _BodyReader,
+        stdin: _BodyReader | None = None,
+    ) -> Dict[str, Any]:
+        """Run FastQC on one input and build its result; never raises.
+
+        ``size`` is either the known size in bytes or the reader streaming the body to stdin,
+        whose byte count is only final once FastQC has consumed it. ``stdin`` overrides what
+        is streamed, e.g. the body after in-process decompression.
+        """
+        reader = size if isinstance(size, _BodyReader) else None
+        stdin = stdin if stdin is not None else reader
+
+        def size_bytes() -> int:
+            return reader.bytes_read if reader is not None else size  # type: ignore[return-value]
+
+        def fail(reason: str) -> Dict[str, Any]:
+            return _failed_file_result(fname, size_bytes(), reason)
 
         try:
             with tempfile.TemporaryDirectory() as temp_dir:
-                cmd = ["fastqc", "--quiet", "--outdir", temp_dir, path]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+                result = self._run_fastqc(
+                    [fastqc_input], temp_dir, self.timeout_seconds, stdin=stdin
+                )
                 if result.returncode != 0:
                     return fail(
                         f"FastQC failed (exit {result.returncode}): {result.stderr.strip()}"
@@ -67,30 +2089,88 @@ class FastqAnalyzer(StarAnalyzer):
                 produced = [f for f in os.listdir(temp_dir) if f.endswith("_fastqc.zip")]
                 if len(produced) != 1:
                     return fail(f"Unexpected FastQC zip count {len(produced)}: {produced}")
-                zip_path = os.path.join(temp_dir, produced[0])
-                with zipfile.ZipFile(zip_path, "r") as zf:
-                    folder = produced[0][:-4]
-                    data_entry = f"{folder}/fastqc_data.txt"
-                    summary_entry = f"{folder}/summary.txt"
-                    try:
-                        data_content = zf.read(data_entry).decode("utf-8")
-                        summary_content = zf.read(summary_entry).decode("utf-8")
-                    except KeyError as exc:
-                        return fail(f"Missing FastQC file: {exc}")
+                try:
+                    with self._phase("parse"):
+                        data_content, summary_content = self._read_fastqc_zip(
+                            os.path.join(temp_dir, produced[0])
+                        )
+                except KeyError as exc:
+                    return fail(f"Missing FastQC file: {exc}")
         except subprocess.TimeoutExpired:
             return fail("FastQC timeout")
         except FileNotFoundError:
             return fail("FastQC executable not found in PATH")
+        except (EOFError, gzip.BadGzipFile) as exc:
+            return fail(f"Parsing error: {exc}")
         except Exception as exc:  # last-resort catch -> mark file failed
             return fail(f"Unexpected error: {exc}")
 
+        with self._phase("parse"):
+            return self._build_result(fname, size_bytes(), data_content, summary_content)
+
+    def _process_fastq_native(
+        self, fname: str, open_stream: Any, size: int | _BodyReader
+    ) -> Dict[str, Any]:
+        """Compute basic statistics and module verdicts in a single streaming pass; never raises.
+
+        ``open_stream`` returns the decompressed FASTQ stream; ``size`` is as in
+        ``_process_with_fastqc``.
+        """
+        reader = size if isinstance(size, _BodyReader) else None
+
+        def size_bytes() -> int:
+            return reader.bytes_read if reader is not None else size  # type: ignore[return-value]
+
+        def fail(reason: str) -> Dict[str, Any]:
+            return _failed_file_result(fname, size_bytes(), reason)
+
+        if np is None:
+            return fail("NumPy not available for the native engine")
+
+        stats = _FastqStats(
+            self.native_max_positions,
+            self.histogram_positions,
+            self._sketch_key if self.sketch_reads else None,
+            self.adapters,
+        )
+        try:
+            with self._phase("tool"), open_stream() as stream:
+                for block in _iter_fastq_blocks(stream, self.native_chunk_bytes):
+                    stats.add_block(*block)
+        except (ValueError, EOFError, OSError) as exc:
+            return fail(f"Parsing error: {exc}")
+        except Exception as exc:  # last-resort catch -> mark file failed
+            return fail(f"Unexpected error: {exc}")
+        finally:
+            # In-process engine: only the process-wide high-water mark is available
+            self._record_peak_rss(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+        with self._phase("parse"):
+            return self._result_from_stats(fname, size_bytes(), stats.summary())
+
+    def _build_result(
+        self, fname: str, size_bytes: int, data_content: str, summary_content: str
+    ) -> Dict[str, Any]:
+        """Turn FastQC report contents into a per-file result dict; never raises."""
+
+        def fail(reason: str) -> Dict[str, Any]:
+            return _failed_file_result(fname, size_bytes, reason)
+
         try:
             summary_data = self._parse_summary_data(summary_content)
             basic_stats = self._parse_fastqc_data_content(data_content)
         except Exception as exc:
             return fail(f"Parsing error: {exc}")
 
-        merged = {**basic_stats, **summary_data}
+        return self._result_from_stats(fname, size_bytes, {**basic_stats, **summary_data})
+
+    def _result_from_stats(
+        self, fname: str, size_bytes: int, merged: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Apply the pass/warn/fail rules to merged statistics and module statuses."""
+
+        def fail(reason: str) -> Dict[str, Any]:
+            return _failed_file_result(fname, size_bytes, reason)
 
         required_basic = ["total_sequences", "sequence_length", "gc_content"]
         for key in required_basic:
@@ -101,22 +2181,40 @@ class FastqAnalyzer(StarAnalyzer):
             return fail("Zero sequences reported")
 
         failing_modules = [k for k, v in merged.items() if v == "FAIL"]
+        small_sample_modules: List[str] = []
+        if (
+            self.sample_reads
+            and self.sample_reads <= merged["total_sequences"] < self.sample_min_reads
+        ):
+            # A truncated sample too small for FastQC's thresholds: downgrade to warnings
+            small_sample_modules, failing_modules = failing_modules, []
         if failing_modules:
-            return fail("FAIL modules: " + ", ".join(failing_modules))
+            result = fail("FAIL modules: " + ", ".join(failing_modules))
+            # The file was read completely, so it still counts towards the distributions
+            result.update(
+                {k: merged[k] for k in _FILE_DETAIL_KEYS + _NODE_LEVEL_KEYS if k in merged}
+            )
+            return result
 
         warning_modules = [k for k, v in merged.items() if v == "WARN"]
-        reason = "OK" if not warning_modules else "; ".join([f"WARN: {m}" for m in warning_modules])
+        warning_reasons = [f"WARN: {m} (small sample)" for m in small_sample_modules]
+        warning_reasons += [f"WARN: {m}" for m in warning_modules]
+        reason = "; ".join(warning_reasons) if warning_reasons else "OK"
 
-        return {
+        result = {
             "file": fname,
             "size_bytes": size_bytes,
             "pass": True,
-            "warnings": bool(warning_modules),
+            "warnings": bool(warning_reasons),
             "reason": reason,
             "total_sequences": merged["total_sequences"],
             "sequence_length": merged["sequence_length"],
             "gc_content": merged["gc_content"],
         }
+        result.update({k: merged[k] for k in _FILE_DETAIL_KEYS if k in merged})
+        # Moved into the node-level aggregates by analysis_method
+        result.update({k: merged[k] for k in _NODE_LEVEL_KEYS if k in merged})
+        return result
 
     def _parse_summary_data(self, summary_content: str) -> Dict[str, str]:
         """Parse FastQC summary.txt into a {module: status} dict.
@@ -144,15 +2242,31 @@ class FastqAnalyzer(StarAnalyzer):
         Raises if a critical numeric field is malformed.
         """
         stats: Dict[str, Any] = {}
+        # Data rows of the module tables feeding the histograms
+        tables: Dict[str, List[List[str]]] = {
+            "per_base_sequence_quality": [],
+            "sequence_length_distribution": [],
+            "per_sequence_gc_content": [],
+            "adapter_content": [],
+        }
+        rows: List[List[str]] | None = None
         for raw in data_content.split("\n"):
             line = raw.strip()
             if not line:
                 continue
-            if line.startswith(">>") and line.endswith("<<"):
-                parts = line[2:-2].split("\t")
-                if len(parts) >= 2:
-                    module = parts[0].strip().lower().replace(" ", "_")
-                    stats[module] = parts[1].strip()
+            if line.startswith(">>"):
+                # Module header (">>Name<TAB>status") or ">>END_MODULE"
+                rows = tables.get(line[2:].split("\t")[0].strip().lower().replace(" ", "_"))
+                if line.endswith("<<"):
+                    parts = line[2:-2].split("\t")
+                    if len(parts) >= 2:
+                        module = parts[0].strip().lower().replace(" ", "_")
+                        stats[module] = parts[1].strip()
+                continue
+            if rows is not None:
+                # Of the column headers only Adapter Content's (adapter names) is needed
+                if not line.startswith("#") or line.startswith("#Position"):
+                    rows.append(line.split("\t"))
                 continue
             if line.startswith("Total Sequences"):
                 stats["total_sequences"] = int(line.split("\t")[1])
@@ -168,8 +2282,282 @@ class FastqAnalyzer(StarAnalyzer):
             if line.startswith("%GC"):
                 stats["gc_content"] = float(line.split("\t")[1])
                 continue
+        if self.histogram_positions:
+            stats["histograms"] = _histograms_from_fastqc(
+                tables["per_base_sequence_quality"],
+                tables["sequence_length_distribution"],
+                tables["per_sequence_gc_content"],
+                self.histogram_positions,
+            )
+        if self.adapters:
+            stats["adapter_curves"] = _adapter_curves_from_fastqc(tables["adapter_content"])
         return stats
 
+    def _process_fastq_batch(
+        self, entries: List[Tuple[int, str, str, int]]
+    ) -> Dict[int, Dict[str, Any]]:
+        """Run a single FastQC invocation over several staged files; never raises.
+
+        ``entries`` holds (index, fname, path, size_bytes) tuples. Returns results keyed by
+        index for every file whose report could be read. Files missing from the returned
+        dict (FastQC error, timeout, unreadable report) must be retried on their own, so a
+        bad file never fails the rest of its batch.
+        """
+        results: Dict[int, Dict[str, Any]] = {}
+        threads = self.batch_threads or max(1, (os.cpu_count() or 1) // self.max_workers)
+        threads = min(threads, len(entries))
+        rounds = -(-len(entries) // threads)
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                try:
+                    self._run_fastqc(
+                        [path for _, _, path, _ in entries],
+                        temp_dir,
+                        self.timeout_seconds * rounds,
+                        threads=threads,
+                    )
+                except subprocess.TimeoutExpired:
+                    pass  # Keep the reports of files that finished in time
+
+                for idx, fname, path, size_bytes in entries:
+                    zip_path = os.path.join(temp_dir, _fastqc_zip_name(path))
+                    if not os.path.exists(zip_path):
+                        continue
+                    with self._phase("parse"):
+                        try:
+                            data_content, summary_content = self._read_fastqc_zip(zip_path)
+                        except Exception:
+                            continue  # Truncated report of a killed run -> retried individually
+                        results[idx] = self._build_result(
+                            fname, size_bytes, data_content, summary_content
+                        )
+        except Exception:
+            pass  # Everything not yet collected is retried individually
+        return results
+
+    def _stage_fastq(self, fname: str, content: Any) -> Tuple[str, int, str | None]:
+        """Write an object body to a temp file FastQC can read.
+
+        The body is copied in chunks of ``staging_chunk_bytes``. Returns (path, bytes written,
+        SHA-256 of the body if the result cache is enabled).
+        """
+        # Keep the extension so FastQC recognizes the (compressed) format
+        if fname.endswith((".fastq.gz", ".fq.gz")):
+            file_extension = ".fastq.gz"
+        else:
+            file_extension = ".fastq"
+
+        reader = _BodyReader(
+            content, self.staging_chunk_bytes, hash_content=self.cache is not None
+        )
+        with tempfile.NamedTemporaryFile(
+            mode="wb",
+            delete=False,
+            suffix=file_extension,
+        ) as tmp_file:
+            try:
+                for chunk in reader.chunks():
+                    tmp_file.write(chunk)
+                tmp_file.flush()
+            except BaseException:
+                os.unlink(tmp_file.name)
+                raise
+            content_hash = reader.sha256.hexdigest() if reader.sha256 is not None else None
+            return tmp_file.name, reader.bytes_read, content_hash
+
+    def _qc_object(self, fname: str, content: Any) -> Dict[str, Any]:
+        """Stage one object body, run QC on it and remove the staged copy; never raises."""
+        if not self.instrument:
+            return self._qc_single(fname, content)
+        timings = FileTimings(_TIMING_PHASES)
+        with self._timings_scope(timings):
+            result = self._qc_single(fname, content)
+        result["timing"] = timings.as_dict(result.get("sampled_bytes", result["size_bytes"]))
+        return result
+
+    def _qc_single(self, fname: str, content: Any) -> Dict[str, Any]:
+        if self.sample_reads:
+            return self._process_fastq_sample(fname, content)
+        if self.staging == "stream":
+            return self._process_fastq_stream(fname, content)
+        try:
+            with self._phase("staging"):
+                temp_file_path, written_size, content_hash = self._stage_fastq(fname, content)
+        except Exception as exc:
+            return _failed_file_result(fname, 0, f"Staging error: {exc}")
+        try:
+            return self._process_fastq_file(fname, temp_file_path, written_size, content_hash)
+        finally:
+            os.unlink(temp_file_path)
+
+    def _qc_batch(self, items: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+        """Stage several object bodies and QC them with one FastQC invocation; never raises."""
+        if (
+            len(items) == 1
+            or self.engine == "native"
+            or self.staging == "stream"
+            or self.sample_reads
+        ):
+            return [self._qc_object(fname, content) for fname, content in items]
+
+        results: List[Dict[str, Any] | None] = [None] * len(items)
+        staged: List[Tuple[int, str, str, int]] = []
+        hashes: Dict[int, str | None] = {}
+        timings = [FileTimings(_TIMING_PHASES) if self.instrument else None for _ in items]
+        try:
+            for idx, (fname, content) in enumerate(items):
+                try:
+                    with self._timings_scope(timings[idx]), self._phase("staging"):
+                        path, written_size, hashes[idx] = self._stage_fastq(fname, content)
+                except Exception as exc:
+                    results[idx] = _failed_file_result(fname, 0, f"Staging error: {exc}")
+                    continue
+                staged.append((idx, fname, path, written_size))
+                results[idx] = self._cached_result(hashes[idx], fname)
+
+            runnable = [entry for entry in staged if entry[3] > 0 and results[entry[0]] is None]
+            if self.gzip_precheck:
+                # Check the whole batch concurrently; corrupt files never reach FastQC
+                def check(entry: Tuple[int, str, str, int]) -> str | None:
+                    with self._timings_scope(timings[entry[0]]):
+                        return self._check_gzip(entry[2])
+
+                workers = max(1, min(len(runnable), os.cpu_count() or 1))
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    reasons = list(pool.map(check, runnable))
+                for (idx, fname, _, written_size), reason in zip(runnable, reasons):
+                    if reason is not None:
+                        results[idx] = _failed_file_result(fname, written_size, reason)
+                        self._store_result(hashes[idx], results[idx])  # type: ignore[arg-type]
+                runnable = [entry for entry in runnable if results[entry[0]] is None]
+
+            if len(runnable) > 1:
+                batch_timings = FileTimings(_TIMING_PHASES) if self.instrument else None
+                with self._timings_scope(batch_timings):
+                    batch_results = self._process_fastq_batch(runnable)
+                batch_bytes = sum(entry[3] for entry in runnable)
+                paths = {entry[0]: entry[2] for entry in runnable}
+                for idx, fr in batch_results.items():
+                    results[idx] = fr
+                    with self._timings_scope(timings[idx]):
+                        self._attach_sketch(fr, paths[idx])
+                    self._store_result(hashes[idx], fr)
+                if batch_timings is not None:
+                    # One FastQC run served the whole batch; attribute it by file size
+                    for idx, _, _, written_size in runnable:
+                        share = written_size / batch_bytes
+                        timings[idx].add_share(batch_timings, share)  # type: ignore[union-attr]
+
+            # Empty files and files the batch could not account for are handled one by one
+            for idx, fname, path, written_size in staged:
+                if results[idx] is None:
+                    with self._timings_scope(timings[idx]):
+                        results[idx] = self._process_fastq_file(
+                            fname, path, written_size, gzip_checked=self.gzip_precheck
+                        )
+                    self._store_result(hashes[idx], results[idx])  # type: ignore[arg-type]
+        finally:
+            for _, _, path, _ in staged:
+                os.unlink(path)
+
+        for fr, file_timings in zip(results, timings):
+            if file_timings is not None:
+                fr["timing"] = file_timings.as_dict(fr["size_bytes"])  # type: ignore[index]
+        return results  # type: ignore[return-value]
+
+    def _candidates(self, data: List[Any]) -> Iterator[Tuple[str, Any]]:
+        """Yield (name, body) for every FASTQ object in ``data``.
+
+        Dict entries hold loaded bodies. Other entries are lazy sources of (key, body) or
+        (key, body, size) entries, read ahead by a ``Prefetcher`` unless ``prefetch_depth``
+        is 0.
+        """
+        for objects in data:
+            if isinstance(objects, dict):
+                pairs: Iterable[Tuple[str, Any]] = objects.items()
+            else:
+                pairs = (
+                    (key, body)
+                    for key, body in object_pairs(objects)
+                    if key.endswith(FASTQ_EXTENSIONS)
+                )
+                if self.prefetch_depth > 0:
+                    pairs = Prefetcher(
+                        pairs, self.prefetch_depth, self.prefetch_bytes, self.staging_chunk_bytes
+                    )
+            for fname, content in pairs:
+                if fname.endswith(FASTQ_EXTENSIONS):
+                    yield fname, content
+
+    @staticmethod
+    def _staging_bytes(content: Any) -> int:
+        """Budget a body takes while it is staged and QC'd.
+
+        A body of unknown size takes the whole budget, so its batch runs alone.
+        """
+        size = body_size(content)
+        return sys.maxsize if size is None else size  # Clamped to the budget
+
+    def _run_pool(self, candidates: Iterable[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+        """QC all candidate objects on a bounded worker pool.
+
+        Candidates are grouped into batches of ``batch_size`` files per FastQC invocation and
+        taken one batch at a time, as the workers and the staging budget allow, so a lazy
+        object source is never held in memory as a whole. Results are returned in the order
+        of ``candidates`` regardless of completion order.
+        """
+        items = iter(candidates)
+        results: List[Dict[str, Any] | None] = []
+        names: List[str] = []
+
+        def batches():  # type: ignore[no-untyped-def]
+            while True:
+                batch = list(itertools.islice(items, self.batch_size))
+                if not batch:
+                    return
+                start = len(results)
+                results.extend([None] * len(batch))
+                names.extend(fname for fname, _ in batch)
+                yield list(range(start, start + len(batch))), batch
+
+        def work(indices: List[int], batch: List[Tuple[str, Any]]) -> None:
+            try:
+                batch_results = self._qc_batch(batch)
+            except Exception as exc:  # last-resort catch -> mark files failed
+                batch_results = [
+                    _failed_file_result(fname, 0, f"Unexpected error: {exc}")
+                    for fname, _ in batch
+                ]
+            for idx, fr in zip(indices, batch_results):
+                results[idx] = fr
+
+        if self.max_workers == 1:
+            for indices, batch in batches():
+                work(indices, batch)
+        else:
+            budget = ByteBudget(self.memory_budget_bytes)
+
+            def budgeted_work(
+                indices: List[int], batch: List[Tuple[str, Any]], reserved: int
+            ) -> None:
+                try:
+                    work(indices, batch)
+                finally:
+                    budget.release(reserved)
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                for indices, batch in batches():
+                    # Admission control: wait until this batch fits into the staging budget
+                    reserved = budget.acquire(
+                        sum(self._staging_bytes(content) for _, content in batch)
+                    )
+                    pool.submit(budgeted_work, indices, batch, reserved)
+
+        return [
+            fr if fr is not None else _failed_file_result(fname, 0, "Unexpected error: no result")
+            for fr, fname in zip(results, names)
+        ]
+
     def analysis_method(
         self,
         data: List[Dict[str, Any]],
@@ -189,55 +2577,54 @@ class FastqAnalyzer(StarAnalyzer):
                 "node_id": node_id,
             }
 
-        file_results: List[Dict[str, Any]] = []
-        valid_file_count = 0
-
-        for objects in data:
-            for fname, content in objects.items():
-                if not fname.endswith((".fastq", ".fq", ".fastq.gz", ".fq.gz")):
-                    continue
-
-                # Create temporary file with appropriate extension for FastQC to recognize format
-                file_extension = ""
-                if fname.endswith(".fastq.gz") or fname.endswith(".fq.gz"):
-                    file_extension = ".fastq.gz"
-                elif fname.endswith(".fastq") or fname.endswith(".fq"):
-                    file_extension = ".fastq"
-
-                with tempfile.NamedTemporaryFile(
-                    mode="wb",
-                    delete=False,
-                    suffix=file_extension,
-                ) as tmp_file:
-                    temp_file_path = tmp_file.name
-
-                    if isinstance(content, str):
-                        tmp_file.write(content.encode("utf-8"))
-                    else:
-                        tmp_file.write(content)
-
-                    tmp_file.flush()
-                    written_size = tmp_file.tell()
-
-                fr = self._process_fastq_file(fname, temp_file_path, written_size)
-                file_results.append(fr)
-
-                if fr["pass"]:
-                    valid_file_count += 1
-
-                os.unlink(temp_file_path)
+        if self.cache is not None:
+            self.cache.hits = self.cache.misses = 0
+        sketch_key = _load_sketch_key(self.sketch_key_path)
+        self._sketch_key = sketch_key if sketch_key is not None else bytes(16)
+        start = time.perf_counter()
+        file_results = self._run_pool(self._candidates(data))
+        wall_time_s = time.perf_counter() - start
+        file_histograms = [fr.pop("histograms") for fr in file_results if "histograms" in fr]
+        file_sketches = [fr.pop("sketch") for fr in file_results if "sketch" in fr]
+        valid_file_count = sum(1 for fr in file_results if fr["pass"])
 
         node_pass = valid_file_count == len(file_results) and valid_file_count > 0
         node_warnings_present = any(fr["warnings"] for fr in file_results)
 
-        return {
+        node_result = {
             "node_pass": node_pass,
             "warnings_present": node_warnings_present,
             "valid_file_count": valid_file_count,
             "invalid_file_count": 0 if node_pass else (len(file_results) - valid_file_count),
             "files": file_results,
             "node_id": node_id,
+            "engine": self.engine,
         }
+        if self.engine == "native":
+            # The verdicts cover fewer modules than a FastQC report
+            adapters = ("adapter_content",) if self.adapters else ()
+            node_result["modules"] = list(_NATIVE_MODULES + adapters)
+        if self.histogram_positions:
+            node_result["histograms"] = _merge_histograms(
+                [_empty_histograms(self.histogram_positions)] + file_histograms
+            )
+        if self.sketch_reads:
+            try:
+                sketch = _merge_sketches(file_sketches)
+            except (ValueError, KeyError, zlib.error):
+                sketch = None  # e.g. a cache entry written with another sketch layout
+            if sketch is not None:
+                # Unkeyed hashes could be matched against guessed sequences by the
+                # aggregator, so without a key only the node's own summary leaves the node
+                keyed = sketch_key is not None
+                if keyed:
+                    node_result["sketch"] = sketch
+                node_result["complexity"] = _ReadSketch.from_payload(sketch).summary(keyed)
+        if self.cache is not None:
+            node_result["cache"] = {"hits": self.cache.hits, "misses": self.cache.misses}
+        if self.instrument:
+            node_result["wall_time_s"] = round(wall_time_s, 4)
+        return node_result
 
 
 class FastqAggregator(StarAggregator):
@@ -245,8 +2632,11 @@ class FastqAggregator(StarAggregator):
 
     def __init__(self, flame):  # type: ignore[no-untyped-def]
         super().__init__(flame)
+        self.output_format = FASTQ_OUTPUT_FORMAT
 
-    def aggregation_method(self, analysis_results: List[Dict[str, Any]]) -> str:  # noqa: D401
+    def aggregation_method(  # noqa: D401
+        self, analysis_results: List[Dict[str, Any]]
+    ) -> str | bytes:
         overall_pass = all(r["node_pass"] for r in analysis_results)
         overall_total = sum(r["valid_file_count"] for r in analysis_results)
         failed_nodes = [r["node_id"] for r in analysis_results if not r["node_pass"]]
@@ -260,6 +2650,31 @@ class FastqAggregator(StarAggregator):
             "nodes": analysis_results,
         }
 
+        node_histograms = [r["histograms"] for r in analysis_results if r.get("histograms")]
+        if node_histograms:
+            result["histograms"] = _merge_histograms(node_histograms)
+            result["histograms"]["mean_quality"] = [
+                round(total / count, 2) if count else None
+                for total, count in zip(
+                    result["histograms"]["quality_sums"], result["histograms"]["quality_counts"]
+                )
+            ]
+
+        node_sketches = [r["sketch"] for r in analysis_results if r.get("sketch")]
+        try:
+            sketch = _merge_sketches(node_sketches)
+        except (ValueError, KeyError, zlib.error):
+            sketch = None
+        if sketch is not None:
+            # Cohort-wide estimate; the merged sketch itself is not needed downstream
+            result["complexity"] = _ReadSketch.from_payload(sketch).summary()
+
+        throughput = [throughput_summary(r, _TIMING_PHASES) for r in analysis_results]
+        if any(throughput):
+            result["throughput"] = [t for t in throughput if t is not None]
+
+        if self.output_format == "columnar":
+            return encode_columnar(result)
         return json.dumps(result)
 
     def has_converged(self, result, last_result, num_iterations):  # type: ignore[no-untyped-def]
@@ -275,7 +2690,7 @@ def main():
         data_type="s3",
         query=FASTQ_S3_KEYS,
         simple_analysis=True,
-        output_type="str",
+        output_type="bytes" if FASTQ_OUTPUT_FORMAT == "columnar" else "str",
     )
 
 
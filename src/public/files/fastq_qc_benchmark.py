@@ -0,0 +1,334 @@
+"""Local throughput benchmark for ``fastq_qc.py``.
+
+Generates a reproducible synthetic FASTQ dataset and runs ``FastqAnalyzer.analysis_method``
+and ``FastqAggregator.aggregation_method`` on it through a local stand-in for the ``flame``
+object, once per execution mode. Files/s, reads/s, MB/s and peak memory are reported for
+every mode, so that regressions and the gains of new execution modes can be tracked.
+
+Place this script next to ``fastq_qc.py``, ``qc_common.py`` and ``qc_benchmark.py`` (the
+harness shared with the VCF benchmark) and run, for example::
+
+    python fastq_qc_benchmark.py --files 32 --reads 20000 --compression gzip --json results.json
+
+The FLAME SDK is not needed; if ``flame.star`` cannot be imported a minimal shim is used.
+Modes needing FastQC (on PATH) or NumPy are skipped when those are not available. The
+``native-lazy`` mode streams the files from a lazy object source that includes one object
+larger than the prefetch budget, and checks that read-ahead keeps to that budget.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import os
+import random
+import shutil
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+__author__ = "Jules Kreuer, jules.kreuer@uni-tuebingen.de"
+__version__ = "0.1.0"
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from qc_benchmark import (  # noqa: E402
+    add_run_arguments,
+    bgzf_compress,
+    install_flame_shim,
+    print_table,
+    run_isolated,
+    run_nodes,
+    summarize,
+    timing_columns,
+    verdict,
+    write_report,
+)
+
+install_flame_shim()
+
+import fastq_qc  # noqa: E402
+
+# Execution modes: analyzer attribute overrides applied on top of the fastq_qc.py defaults.
+# "source" is not an attribute: "lazy" hands the objects over as a lazy source of open files
+# with their sizes (see ``_lazy_source``) instead of loading them first.
+MODES: Dict[str, Dict[str, Any]] = {
+    "fastqc": {},
+    "fastqc-batch": {"batch_size": 8},
+    "fastqc-stream": {"staging": "stream"},
+    "native": {"engine": "native"},
+    "native-stream": {"engine": "native", "staging": "stream"},
+    "native-sample": {"engine": "native", "sample_reads": 10000},
+    "native-lazy": {
+        "engine": "native",
+        "staging": "stream",
+        "prefetch_bytes": 8 * 1024**2,
+        "max_workers": 1,
+        "source": "lazy",
+    },
+}
+
+# Lazy-source trials include one object this many times larger than the prefetch budget.
+# They first run without read-ahead, then as configured, and fail if read-ahead raises the
+# peak memory by more than the budget plus this allowance (e.g. by reading that object whole).
+# With one worker only waiting bodies, not ones being QC'd, add to the peak.
+LAZY_OVERSIZE_FACTOR = 4
+LAZY_MEMORY_SLACK_BYTES = 16 * 1024**2
+
+# Name of the oversized object of lazy-source trials
+_OVERSIZED_NAME = "oversized.fastq"
+
+# File size distributions: how the total read count is split across the files.
+DISTRIBUTIONS = ("uniform", "lognormal", "skewed")
+
+# File compressions: plain text, single-member gzip, or BGZF (blocked gzip as written by bgzip).
+COMPRESSIONS = ("none", "gzip", "bgzf")
+
+_QUALITY_CHARS = "#+5?@ABCDEFGHI"
+
+
+def _reads_per_file(n_files: int, mean_reads: int, distribution: str, seed: int) -> List[int]:
+    """Split ``n_files * mean_reads`` reads across the files according to ``distribution``."""
+    rng = random.Random(seed)
+    if distribution == "uniform":
+        weights = [1.0] * n_files
+    elif distribution == "lognormal":
+        weights = [rng.lognormvariate(0.0, 1.0) for _ in range(n_files)]
+    elif distribution == "skewed":
+        # A few large files and many small ones, as in mixed sequencing runs
+        weights = [10.0 if i % 10 == 0 else 1.0 for i in range(n_files)]
+    else:
+        raise ValueError(f"Unknown distribution: {distribution}")
+    total = n_files * mean_reads
+    scale = total / sum(weights)
+    return [max(1, int(round(w * scale))) for w in weights]
+
+
+def _fastq_bytes(n_reads: int, read_length: int, rng: random.Random, prefix: str) -> bytes:
+    """Build ``n_reads`` FASTQ records with random bases, rare Ns and mixed qualities."""
+    bases = "ACGT" * 24 + "NN"
+    chunks = []
+    for i in range(n_reads):
+        seq = "".join(rng.choices(bases, k=read_length))
+        qual = "".join(rng.choices(_QUALITY_CHARS, k=read_length))
+        chunks.append(f"@{prefix}.{i} synthetic\n{seq}\n+\n{qual}\n")
+    return "".join(chunks).encode("ascii")
+
+
+def generate_dataset(
+    directory: str,
+    n_files: int,
+    mean_reads: int,
+    read_length: int,
+    compression: str,
+    distribution: str,
+    seed: int,
+) -> Dict[str, Any]:
+    """Write a synthetic FASTQ dataset to ``directory`` and return its manifest.
+
+    ``compression`` is one of ``COMPRESSIONS``.
+    """
+    os.makedirs(directory, exist_ok=True)
+    counts = _reads_per_file(n_files, mean_reads, distribution, seed)
+    suffix = ".fastq" if compression == "none" else ".fastq.gz"
+    files = []
+    for idx, n_reads in enumerate(counts):
+        name = f"sample_{idx:04d}{suffix}"
+        rng = random.Random(f"{seed}:{idx}")
+        body = _fastq_bytes(n_reads, read_length, rng, f"s{idx}")
+        if compression == "gzip":
+            body = gzip.compress(body, compresslevel=6, mtime=0)
+        elif compression == "bgzf":
+            body = bgzf_compress(body)[0]
+        with open(os.path.join(directory, name), "wb") as fh:
+            fh.write(body)
+        files.append({"name": name, "reads": n_reads, "size_bytes": len(body)})
+    return {
+        "files": files,
+        "read_length": read_length,
+        "compression": compression,
+        "distribution": distribution,
+        "seed": seed,
+        "total_reads": sum(counts),
+        "total_bytes": sum(f["size_bytes"] for f in files),
+    }
+
+
+def _write_oversized(directory: str, n_bytes: int, read_length: int, seed: int) -> int:
+    """Write the oversized FASTQ of lazy-source trials block by block; returns its size."""
+    path = os.path.join(directory, _OVERSIZED_NAME)
+    rng = random.Random(f"{seed}:oversized")
+    written = 0
+    with open(path, "wb") as fh:
+        while written < n_bytes:
+            block = _fastq_bytes(10_000, read_length, rng, f"o{written}")
+            fh.write(block)
+            written += len(block)
+    return written
+
+
+def _lazy_source(directory: str, names: List[str]):  # type: ignore[no-untyped-def]
+    """Lazy object source: (key, open file, size) per object, opened only when requested."""
+    for name in names:
+        path = os.path.join(directory, name)
+        yield name, open(path, "rb"), os.path.getsize(path)
+
+
+def _mode_unavailable(overrides: Dict[str, Any]) -> str | None:
+    """Return why a mode cannot run here, or None if it can."""
+    engine = overrides.get("engine", fastq_qc.FASTQ_ENGINE)
+    if engine == "native" or overrides.get("sample_reads"):
+        if fastq_qc.np is None:
+            return "NumPy not available"
+    if engine == "fastqc" and shutil.which("fastqc") is None:
+        return "FastQC executable not found"
+    return None
+
+
+def _run_trial(
+    directory: str,
+    manifest: Dict[str, Any],
+    overrides: Dict[str, Any],
+    n_nodes: int,
+) -> Dict[str, Any]:
+    """Load the dataset, run all nodes and the aggregator once; executed in a fresh process.
+
+    Lazy-source trials (``"source": "lazy"``) load nothing up front; each node streams its
+    files from a ``_lazy_source``, the first node also the oversized object. A first, untimed
+    pass without read-ahead sets the reference peak memory.
+    """
+    overrides = dict(overrides)
+    lazy = overrides.pop("source", None) == "lazy"
+    names: List[List[str]] = [[] for _ in range(n_nodes)]
+    for idx, entry in enumerate(manifest["files"]):
+        names[idx % n_nodes].append(entry["name"])
+    objects: List[Any]
+    if lazy:
+        names[0].insert(len(names[0]) // 2, _OVERSIZED_NAME)
+        run_nodes(
+            fastq_qc.FastqAnalyzer, fastq_qc.FastqAggregator,
+            [_lazy_source(directory, node_names) for node_names in names],
+            {**overrides, "prefetch_depth": 0},
+        )
+        objects = [_lazy_source(directory, node_names) for node_names in names]
+    else:
+        objects = []
+        for node_names in names:
+            node_objects = {}
+            for name in node_names:
+                with open(os.path.join(directory, name), "rb") as fh:
+                    node_objects[name] = fh.read()
+            objects.append(node_objects)
+
+    run = run_nodes(fastq_qc.FastqAnalyzer, fastq_qc.FastqAggregator, objects, overrides)
+    files = [fr for node in run.pop("node_results") for fr in node["files"]]
+    aggregated = run.pop("aggregated")
+    memory_bound_kb = None
+    if lazy:
+        # Read-ahead holds the budget at most on top of the reference pass
+        budget = overrides.get("prefetch_bytes", fastq_qc.FASTQ_PREFETCH_BYTES) or 0
+        memory_bound_kb = (budget + LAZY_MEMORY_SLACK_BYTES) // 1024
+    return {
+        **run,
+        "rss_growth_kb": run["peak_rss_kb"] - run["dataset_rss_kb"],
+        "memory_bound_kb": memory_bound_kb,
+        "overall_pass": aggregated["overall_pass"],
+        "failed_files": sum(1 for fr in files if not fr["pass"]),
+    }
+
+
+def _summarize(
+    trials: List[Dict[str, Any]], manifest: Dict[str, Any], overrides: Dict[str, Any]
+) -> Dict[str, Any]:
+    return {
+        **summarize(
+            trials, overrides, len(manifest["files"]), manifest["total_bytes"],
+            {"reads": manifest["total_reads"]},
+        ),
+        "rss_growth_kb": max(t["rss_growth_kb"] for t in trials),
+        "memory_bound_kb": trials[-1]["memory_bound_kb"],
+    }
+
+
+def run_benchmark(
+    directory: str,
+    manifest: Dict[str, Any],
+    modes: Dict[str, Dict[str, Any]],
+    repeats: int,
+    n_nodes: int,
+) -> Dict[str, Any]:
+    """Run every mode ``repeats`` times, each trial in its own process for clean peak memory."""
+    results: Dict[str, Any] = {}
+    for name, overrides in modes.items():
+        reason = _mode_unavailable(overrides)
+        if reason is not None:
+            results[name] = {"overrides": overrides, "skipped": reason}
+            continue
+        if overrides.get("source") == "lazy":
+            budget = overrides.get("prefetch_bytes", fastq_qc.FASTQ_PREFETCH_BYTES)
+            if not budget:
+                results[name] = {"overrides": overrides, "skipped": "no prefetch budget"}
+                continue
+            _write_oversized(
+                directory, budget * LAZY_OVERSIZE_FACTOR, manifest["read_length"],
+                manifest["seed"],
+            )
+        trials = [
+            run_isolated(_run_trial, directory, manifest, overrides, n_nodes)
+            for _ in range(repeats)
+        ]
+        results[name] = _summarize(trials, manifest, overrides)
+    return results
+
+
+def _problems(res: Dict[str, Any]) -> List[str]:
+    problems = []
+    if not res["overall_pass"]:
+        problems.append(f"{res['failed_files']} failed")
+    if res["memory_bound_kb"] is not None and res["rss_growth_kb"] > res["memory_bound_kb"]:
+        problems.append(
+            f"memory grew {res['rss_growth_kb'] // 1024} MiB, "
+            f"bound {res['memory_bound_kb'] // 1024} MiB"
+        )
+    return problems
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=16, help="number of FASTQ files")
+    parser.add_argument("--reads", type=int, default=10000, help="mean reads per file")
+    parser.add_argument("--read-length", type=int, default=150, help="bases per read")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none",
+                        help="file compression (bgzf as written by bgzip)")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform",
+                        help="how reads are spread across files")
+    add_run_arguments(parser, MODES)
+    args = parser.parse_args(argv)
+
+    common = dict(args.overrides)
+    modes = {name: {**MODES[name], **common} for name in args.modes}
+
+    with tempfile.TemporaryDirectory(prefix="fastq_bench_") as tmp_dir:
+        directory = args.data_dir or tmp_dir
+        manifest = generate_dataset(
+            directory, args.files, args.reads, args.read_length, args.compression,
+            args.distribution, args.seed,
+        )
+        print(
+            f"Dataset: {len(manifest['files'])} files, {manifest['total_reads']} reads, "
+            f"{manifest['total_bytes'] / 1e6:.1f} MB ({args.compression}, "
+            f"{args.distribution})"
+        )
+        results = run_benchmark(directory, manifest, modes, max(1, args.repeats), args.nodes)
+
+    print_table(results, [*timing_columns("reads"), ("ok", lambda res: verdict(_problems(res)))])
+    if args.json_path:
+        versions = {
+            "fastq_qc_version": fastq_qc.__version__,
+            "numpy": getattr(fastq_qc.np, "__version__", None),
+        }
+        write_report(args.json_path, versions, args.nodes, manifest, results)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,257 @@
+"""Shared harness of ``fastq_qc_benchmark.py`` and ``vcf_qc_benchmark.py``.
+
+Runs the analyzer of a QC script on the objects of every node and its aggregator on the node
+results through a local stand-in for the ``flame`` object, each trial in a fresh process,
+and summarizes, prints and reports the timings and peak memory of every execution mode.
+The benchmarks only generate their datasets and define their modes.
+
+Place this file next to the benchmark scripts, ``qc_common.py`` and the QC scripts. Only the
+Python standard library is required.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import struct
+import sys
+import time
+import types
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+from qc_common import BGZF_EOF
+
+__author__ = "Jules Kreuer, jules.kreuer@uni-tuebingen.de"
+__version__ = "0.1.0"
+
+# BGZF input bytes per block, as used by bgzip
+BGZF_BLOCK = 0xFF00
+
+# A column of the results table: title and the formatter of a mode's summary
+Column = Tuple[str, Callable[[Dict[str, Any]], str]]
+
+
+def install_flame_shim() -> None:
+    """Register a minimal ``flame.star`` module unless the FLAME SDK is installed."""
+    try:
+        import flame.star  # noqa: F401
+        return
+    except ImportError:
+        pass
+
+    class StarAnalyzer:
+        def __init__(self, flame):  # type: ignore[no-untyped-def]
+            self.flame = flame
+
+    class StarAggregator(StarAnalyzer):
+        pass
+
+    class StarModel:
+        def __init__(self, **kwargs):  # type: ignore[no-untyped-def]
+            raise RuntimeError("StarModel is not available in the local benchmark")
+
+    flame = types.ModuleType("flame")
+    star = types.ModuleType("flame.star")
+    star.StarAnalyzer = StarAnalyzer  # type: ignore[attr-defined]
+    star.StarAggregator = StarAggregator  # type: ignore[attr-defined]
+    star.StarModel = StarModel  # type: ignore[attr-defined]
+    flame.star = star  # type: ignore[attr-defined]
+    sys.modules["flame"] = flame
+    sys.modules["flame.star"] = star
+
+
+class LocalFlame:
+    """Stand-in for the FLAME core SDK object handed to analyzers and aggregators."""
+
+    def __init__(self, node_id: str):
+        self.node_id = node_id
+
+    def get_id(self) -> str:
+        return self.node_id
+
+    def flame_log(self, msg: str, *args: Any, **kwargs: Any) -> None:
+        pass
+
+
+def bgzf_compress(data: bytes, level: int = 6) -> Tuple[bytes, List[int]]:
+    """Compress ``data`` into BGZF blocks like ``bgzip``.
+
+    Returns the compressed bytes and the compressed offset of every block, plus the offset of
+    the end-of-file block, for building virtual offsets.
+    """
+    blocks = []
+    offsets = [0]
+    for start in range(0, len(data), BGZF_BLOCK):
+        chunk = data[start : start + BGZF_BLOCK]
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        deflated = compressor.compress(chunk) + compressor.flush()
+        header = struct.pack("<4BI2BH2BHH", 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2,
+                             len(deflated) + 25)
+        blocks.append(header + deflated + struct.pack("<II", zlib.crc32(chunk), len(chunk)))
+        offsets.append(offsets[-1] + len(blocks[-1]))
+    blocks.append(BGZF_EOF)
+    return b"".join(blocks), offsets
+
+
+def run_nodes(
+    analyzer_class: Any, aggregator_class: Any, objects: List[Any], overrides: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Run the analyzer on every node's objects and the aggregator on the results, once.
+
+    ``objects`` holds the data object of each node (a dict of bodies or a lazy source), already
+    loaded; analyzer attributes are set from ``overrides``. Returns the node results, the
+    decoded aggregate, the wall times and the peak memory before and after the run.
+    """
+    dataset_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    node_results = []
+    start = time.perf_counter()
+    for node_idx, node_objects in enumerate(objects):
+        analyzer = analyzer_class(LocalFlame(f"node-{node_idx}"))
+        for attr, value in overrides.items():
+            setattr(analyzer, attr, value)
+        node_results.append(analyzer.analysis_method([node_objects], None))
+    analysis_s = time.perf_counter() - start
+    aggregator = aggregator_class(LocalFlame("aggregator"))
+    aggregated = json.loads(aggregator.aggregation_method(node_results))
+    total_s = time.perf_counter() - start
+    return {
+        "node_results": node_results,
+        "aggregated": aggregated,
+        "analysis_s": analysis_s,
+        "total_s": total_s,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "dataset_rss_kb": dataset_rss_kb,
+        "peak_child_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }
+
+
+def run_isolated(func: Callable[..., Any], *args: Any) -> Any:
+    """Run ``func(*args)`` in a fresh process, for a clean peak memory.
+
+    The process is not daemonic, so the QC code can start its own worker processes.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(func, *args).result()
+
+
+def summarize(
+    trials: List[Dict[str, Any]],
+    overrides: Dict[str, Any],
+    n_files: int,
+    total_bytes: int,
+    counts: Dict[str, int],
+) -> Dict[str, Any]:
+    """Median timings and peak memory of a mode's trials.
+
+    ``counts`` maps names to dataset totals (e.g. ``{"reads": ...}``); each gets a
+    ``<name>_per_s`` rate.
+    """
+    total_s = statistics.median(t["total_s"] for t in trials)
+    return {
+        "overrides": overrides,
+        "repeats": len(trials),
+        "total_s": round(total_s, 4),
+        "min_total_s": round(min(t["total_s"] for t in trials), 4),
+        "analysis_s": round(statistics.median(t["analysis_s"] for t in trials), 4),
+        "files_per_s": round(n_files / total_s, 3) if total_s > 0 else None,
+        **{
+            f"{name}_per_s": round(total / total_s, 1) if total_s > 0 else None
+            for name, total in counts.items()
+        },
+        "mb_per_s": round(total_bytes / total_s / 1e6, 3) if total_s > 0 else None,
+        "peak_rss_kb": max(t["peak_rss_kb"] for t in trials),
+        "dataset_rss_kb": max(t["dataset_rss_kb"] for t in trials),
+        "peak_child_rss_kb": max(t["peak_child_rss_kb"] for t in trials),
+        "overall_pass": all(t["overall_pass"] for t in trials),
+        "failed_files": max(t["failed_files"] for t in trials),
+    }
+
+
+def timing_columns(count: str) -> List[Column]:
+    """Table columns of the ``summarize`` fields, with the rate of ``count`` per second."""
+    return [
+        ("total_s", lambda res: f"{res['total_s']:.3f}"),
+        ("files/s", lambda res: f"{res['files_per_s']:.1f}"),
+        (f"{count}/s", lambda res: f"{res[f'{count}_per_s']:.0f}"),
+        ("MB/s", lambda res: f"{res['mb_per_s']:.2f}"),
+        ("peak MiB", lambda res: f"{res['peak_rss_kb'] / 1024:.0f}"),
+        ("child MiB", lambda res: f"{res['peak_child_rss_kb'] / 1024:.0f}"),
+    ]
+
+
+def verdict(problems: List[str]) -> str:
+    """Text of the "ok" column for a mode's list of problems."""
+    return "yes" if not problems else f"no ({', '.join(problems)})"
+
+
+def print_table(results: Dict[str, Any], columns: List[Column]) -> None:
+    """Print one row per mode; skipped modes show why instead of their measurements."""
+    header = ("mode", *(title for title, _ in columns))
+    rows = [header]
+    for name, res in results.items():
+        if "skipped" in res:
+            rows.append((name, f"skipped: {res['skipped']}", *[""] * (len(columns) - 1)))
+            continue
+        rows.append((name, *(fmt(res) for _, fmt in columns)))
+    # Skip messages span the columns to their right and do not widen the first data column
+    measured = [row for row in rows if row[2]]
+    widths = [max(len(row[i]) for row in measured) for i in range(len(header))]
+    for row in rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+
+def _parse_override(text: str) -> tuple:
+    attr, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected ATTR=VALUE, got {text!r}")
+    try:
+        return attr, json.loads(value)
+    except json.JSONDecodeError:
+        return attr, value
+
+
+def add_run_arguments(parser: argparse.ArgumentParser, modes: Dict[str, Any]) -> None:
+    """Add the options shared by the benchmarks, after their dataset options."""
+    parser.add_argument("--seed", type=int, default=0, help="seed of the data generator")
+    parser.add_argument("--nodes", type=int, default=1, help="nodes the files are spread over")
+    parser.add_argument("--repeats", type=int, default=3, help="trials per mode (median)")
+    parser.add_argument("--modes", nargs="+", choices=sorted(modes), default=list(modes),
+                        help="execution modes to run")
+    parser.add_argument("--set", dest="overrides", action="append", type=_parse_override,
+                        default=[], metavar="ATTR=VALUE",
+                        help="analyzer attribute override applied to all modes, e.g. "
+                             "max_workers=4 (values are parsed as JSON)")
+    parser.add_argument("--data-dir", help="keep the generated dataset in this directory")
+    parser.add_argument("--json", dest="json_path", help="write the report to this file")
+
+
+def write_report(
+    path: str,
+    versions: Dict[str, Any],
+    n_nodes: int,
+    manifest: Dict[str, Any],
+    results: Dict[str, Any],
+    **extra: Any,
+) -> None:
+    """Write the JSON report: environment, dataset summary and the results of every mode."""
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        **versions,
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "nodes": n_nodes,
+        "dataset": {k: v for k, v in manifest.items() if k != "files"},
+        "file_count": len(manifest["files"]),
+        **extra,
+        "modes": results,
+    }
+    with open(path, "w") as fh:
+        json.dump(report, fh, indent=2)
@@ -0,0 +1,76 @@
+"""Decoder for the "columnar" output format of ``fastq_qc.py`` and ``vcf_qc.py``.
+
+With ``FASTQ_OUTPUT_FORMAT``/``VCF_OUTPUT_FORMAT = "columnar"`` the aggregators return compact
+bytes instead of a JSON string. ``decode_columnar_result`` turns them back into the same
+result dict that the "json" format contains. Plain JSON input is accepted as well, so
+downstream tooling can read both formats::
+
+    python qc_columnar_decode.py result.bin > result.json
+
+Only the Python standard library is required.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import zlib
+from typing import Any, Dict
+
+__author__ = "Jules Kreuer, jules.kreuer@uni-tuebingen.de"
+__version__ = "0.1.0"
+
+# Leading bytes of the "columnar" output format (format name and version)
+_COLUMNAR_MAGIC = b"QCCOL\x00\x01\x00"
+
+
+def decode_columnar_result(payload: bytes | str) -> Dict[str, Any]:
+    """Decode an aggregated QC result in "columnar" (or plain JSON) format.
+
+    Raises:
+        ValueError: If the payload is neither format or uses an unsupported version.
+    """
+    if isinstance(payload, str):
+        return json.loads(payload)
+    if not payload.startswith(_COLUMNAR_MAGIC):
+        return json.loads(payload.decode("utf-8"))
+
+    try:
+        document = json.loads(zlib.decompress(payload[len(_COLUMNAR_MAGIC) :]))
+    except zlib.error as exc:
+        raise ValueError(f"Corrupt columnar result: {exc}") from None
+    if document.get("format") != "qc-columnar" or document.get("version") != 1:
+        raise ValueError("Unsupported columnar result version")
+
+    reasons = document["reasons"]
+    result = document["result"]
+    for node in result["nodes"]:
+        table = node["files"]
+        columns = table["columns"]
+        missing = {key: set(rows) for key, rows in table.get("missing", {}).items()}
+        files = []
+        for row in range(table["rows"]):
+            fr = {}
+            for key, values in columns.items():
+                if row in missing.get(key, ()):
+                    continue
+                fr[key] = reasons[values[row]] if key == "reason" else values[row]
+            files.append(fr)
+        node["files"] = files
+    return result
+
+
+def main() -> None:
+    if len(sys.argv) > 2:
+        sys.exit(f"usage: {sys.argv[0]} [RESULT_FILE]")
+    if len(sys.argv) == 2:
+        with open(sys.argv[1], "rb") as fh:
+            payload = fh.read()
+    else:
+        payload = sys.stdin.buffer.read()
+    json.dump(decode_columnar_result(payload), sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
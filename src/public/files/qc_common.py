@@ -0,0 +1,460 @@
+"""Shared infrastructure of ``fastq_qc.py`` and ``vcf_qc.py``.
+
+Admission control for object bodies held in memory, read-ahead of lazy object sources,
+BGZF block parsing, per-file instrumentation and the "columnar" output encoder. Upload this file together with
+the QC script; it is imported from the same directory.
+
+Only the Python standard library is required.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import gzip
+import itertools
+import json
+import queue
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+__author__ = "Jules Kreuer, jules.kreuer@uni-tuebingen.de"
+__version__ = "0.1.0"
+
+# Leading bytes of the "columnar" output format (format name and version)
+COLUMNAR_MAGIC = b"QCCOL\x00\x01\x00"
+
+# Empty BGZF block that ends every complete BGZF file
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+class ByteBudget:
+    """Blocking counter that bounds the number of bytes held by in-flight workers.
+
+    Requests larger than the limit are clamped to it, so an oversized file waits until
+    it can run alone instead of blocking forever.
+    """
+
+    def __init__(self, limit: int | None):
+        self._limit = limit
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, n_bytes: int) -> int:
+        """Block until ``n_bytes`` fit into the budget; returns the amount to release later."""
+        if self._limit is None:
+            return 0
+        n_bytes = min(max(n_bytes, 0), self._limit)
+        with self._cond:
+            self._cond.wait_for(lambda: self._in_use + n_bytes <= self._limit)
+            self._in_use += n_bytes
+        return n_bytes
+
+    def fits(self, n_bytes: int) -> bool:
+        """Whether ``n_bytes`` can be acquired without being clamped to the limit."""
+        return self._limit is None or n_bytes <= self._limit
+
+    def release(self, n_bytes: int) -> None:
+        if self._limit is None or n_bytes == 0:
+            return
+        with self._cond:
+            self._in_use -= n_bytes
+            self._cond.notify_all()
+
+
+def is_loaded(body: Any) -> bool:
+    """Whether an object body is already held in memory (``bytes``-like or ``str``)."""
+    return isinstance(body, (bytes, bytearray, memoryview, str))
+
+
+def body_size(body: Any) -> int | None:
+    """Size of an object body if known before reading it; None otherwise.
+
+    Loaded bodies report their length, streamed ones a ``size`` or ``content_length``
+    attribute (as set by ``StreamBody`` or common object store clients).
+    """
+    if is_loaded(body):
+        return len(body)
+    size = getattr(body, "size", None)
+    if not isinstance(size, int):
+        size = getattr(body, "content_length", None)
+    return size if isinstance(size, int) else None
+
+
+def _split_chunk(chunk: Any, chunk_bytes: int) -> Iterator[Any]:
+    if isinstance(chunk, str):
+        chunk = chunk.encode("utf-8")
+    if len(chunk) <= chunk_bytes:
+        yield chunk
+        return
+    view = memoryview(chunk).cast("B")
+    for start in range(0, len(view), chunk_bytes):
+        yield view[start : start + chunk_bytes]
+
+
+def iter_chunks(body: Any, chunk_bytes: int) -> Iterator[Any]:
+    """Yield an object body as ``bytes``-like chunks of at most ``chunk_bytes``.
+
+    ``bytes`` values are sliced through a ``memoryview`` and ``str`` values are encoded
+    slice by slice, so no second full copy of the body is built. File-like bodies are read
+    ``chunk_bytes`` at a time and closed at the end; larger chunks of iterables are split.
+    """
+    if isinstance(body, str):
+        for start in range(0, len(body), chunk_bytes):
+            yield body[start : start + chunk_bytes].encode("utf-8")
+    elif isinstance(body, (bytes, bytearray, memoryview)):
+        view = memoryview(body).cast("B")
+        for start in range(0, len(view), chunk_bytes):
+            yield view[start : start + chunk_bytes]
+    elif hasattr(body, "read"):
+        try:
+            while True:
+                chunk = body.read(chunk_bytes)
+                if not chunk:
+                    return
+                yield from _split_chunk(chunk, chunk_bytes)
+        finally:
+            close = getattr(body, "close", None)
+            if close is not None:
+                close()
+    else:
+        for chunk in body:
+            if chunk:
+                yield from _split_chunk(chunk, chunk_bytes)
+
+
+def read_body(body: Any, chunk_bytes: int) -> Any:
+    """Read a streamed object body (file-like or iterable of chunks) into memory.
+
+    ``bytes`` and ``str`` bodies are returned as they are.
+    """
+    if isinstance(body, (bytes, str)):
+        return body
+    if isinstance(body, (bytearray, memoryview)):
+        return bytes(body)
+    return b"".join(iter_chunks(body, chunk_bytes))
+
+
+class StreamBody:
+    """Read-only file-like view of a streamed object body that has not been read into memory.
+
+    ``size`` is the declared size in bytes, or None if unknown. Chunks already taken from the
+    body (``head``) are returned before the rest of it.
+    """
+
+    def __init__(
+        self,
+        body: Any,
+        size: int | None = None,
+        head: List[Any] | None = None,
+        chunk_bytes: int = 1024**2,
+    ):
+        self.size = size
+        self._body = body
+        self._chunks = itertools.chain(head or [], iter_chunks(body, chunk_bytes))
+        self._pending = memoryview(b"")
+
+    def read(self, n_bytes: int = -1) -> bytes:
+        if n_bytes is None or n_bytes < 0:
+            rest = b"".join(itertools.chain([self._pending], self._chunks))
+            self._pending = memoryview(b"")
+            return rest
+        while not len(self._pending):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return b""
+            self._pending = memoryview(chunk).cast("B")
+        data = bytes(self._pending[:n_bytes])
+        self._pending = self._pending[n_bytes:]
+        return data
+
+    def close(self) -> None:
+        self._chunks = iter(())
+        self._pending = memoryview(b"")
+        close = getattr(self._body, "close", None)
+        if close is not None:
+            close()
+
+
+class _FailedBody:
+    """Stand-in for an object body whose read-ahead failed; reading it raises that error."""
+
+    size = 0
+
+    def __init__(self, error: Exception):
+        self._error = error
+
+    def read(self, n_bytes: int = -1) -> bytes:
+        raise self._error
+
+    def close(self) -> None:
+        pass
+
+
+def object_pairs(entries: Iterable[Tuple[Any, ...]]) -> Iterator[Tuple[str, Any]]:
+    """Normalize the entries of a lazy object source to (key, body) pairs.
+
+    Entries are (key, body) or (key, body, size); a declared size of a streamed body is kept
+    on a ``StreamBody`` so that it can be budgeted before the body is read.
+    """
+    for entry in entries:
+        key, body = entry[0], entry[1]
+        if len(entry) > 2 and entry[2] is not None and not is_loaded(body):
+            body = StreamBody(body, int(entry[2]))
+        yield key, body
+
+
+class Prefetcher:
+    """Iterate (key, body) pairs of a lazy object source, reading bodies ahead in a thread.
+
+    Up to ``depth`` bodies wait for the consumer, and their sizes are reserved against
+    ``max_bytes`` before they are read. Bodies of unknown size or larger than ``max_bytes``
+    are not read ahead: they are handed on unread, for the consumer to stream. A body that
+    cannot be read is handed on as one that raises the read error when the consumer reads
+    it; errors of the source itself are raised in the consumer.
+    """
+
+    def __init__(
+        self, pairs: Iterable[Tuple[str, Any]], depth: int, max_bytes: int | None, chunk_bytes: int
+    ):
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, depth))
+        self._budget = ByteBudget(max_bytes)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._fetch, args=(pairs, chunk_bytes), daemon=True)
+        self._thread.start()
+
+    def _put(self, item: Tuple[Any, Any, int]) -> bool:
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _load(body: Any, size: int, chunk_bytes: int) -> Any:
+        """Read a body of declared ``size``; one longer than declared stays a stream."""
+        chunks = iter_chunks(body, chunk_bytes)
+        head: List[bytes] = []
+        loaded = 0
+        for chunk in chunks:
+            head.append(bytes(chunk))
+            loaded += len(chunk)
+            if loaded > size:
+                # Only the declared size was reserved; the rest is streamed by the consumer
+                return StreamBody(chunks, None, head, chunk_bytes)
+        return b"".join(head)
+
+    def _fetch(self, pairs: Iterable[Tuple[str, Any]], chunk_bytes: int) -> None:
+        try:
+            for key, body in pairs:
+                size = body_size(body)
+                reserved = 0
+                try:
+                    if is_loaded(body):
+                        content = read_body(body, chunk_bytes)
+                        reserved = self._budget.acquire(len(content))
+                    elif size is None or not self._budget.fits(size):
+                        content = body
+                    else:
+                        # Reserved before reading, so waiting bodies never exceed the budget
+                        reserved = self._budget.acquire(size)
+                        content = self._load(body, size, chunk_bytes)
+                except Exception as exc:
+                    # Raised when the consumer reads the body, so only this object fails
+                    self._budget.release(reserved)
+                    content, reserved = _FailedBody(exc), 0
+                if not self._put((key, content, reserved)):
+                    return
+        except BaseException as exc:
+            self._put((None, exc, 0))
+            return
+        self._put((None, None, 0))
+
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        try:
+            while True:
+                key, content, reserved = self._queue.get()
+                self._budget.release(reserved)
+                if key is None:
+                    if content is not None:
+                        raise content
+                    return
+                yield key, content
+        finally:
+            # Stops the fetch thread, also when the consumer gives up early
+            self._closed.set()
+            while True:
+                try:
+                    _, _, reserved = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._budget.release(reserved)
+
+
+def bgzf_block_header(buf: Any, offset: int = 0) -> Tuple[int, int] | None:
+    """Return ``(header_size, block_size)`` if a BGZF block starts at ``offset``, else None.
+
+    ``buf`` must hold the fixed gzip header and the complete extra field of the block.
+    """
+    if bytes(buf[offset : offset + 4]) != b"\x1f\x8b\x08\x04" or offset + 12 > len(buf):
+        return None
+    (xlen,) = struct.unpack_from("<H", buf, offset + 10)
+    header_size = 12 + xlen
+    if offset + header_size > len(buf):
+        return None
+    pos = offset + 12
+    while pos + 4 <= offset + header_size:
+        (slen,) = struct.unpack_from("<H", buf, pos + 2)
+        if bytes(buf[pos : pos + 2]) == b"BC" and slen == 2:
+            return header_size, struct.unpack_from("<H", buf, pos + 4)[0] + 1
+        pos += 4 + slen
+    return None
+
+
+def bgzf_blocks(buf: Any) -> List[Tuple[int, int, int]] | None:
+    """``(offset, header_size, block_size)`` of every block of a BGZF file.
+
+    None if ``buf`` is not BGZF throughout or its last block is truncated.
+    """
+    blocks = []
+    offset = 0
+    while offset < len(buf):
+        sizes = bgzf_block_header(buf, offset)
+        if sizes is None or offset + sizes[1] > len(buf):
+            return None
+        blocks.append((offset, *sizes))
+        offset += sizes[1]
+    return blocks
+
+
+def inflate_bgzf_block(block: Any, header_size: int) -> bytes:
+    """Inflate one BGZF block and check it against its CRC32 and size trailer.
+
+    Raises:
+        gzip.BadGzipFile: If the block is corrupt.
+    """
+    try:
+        data = zlib.decompress(memoryview(block)[header_size:-8], -15)
+    except zlib.error as exc:
+        raise gzip.BadGzipFile(f"invalid deflate data in BGZF block ({exc})") from None
+    crc, isize = struct.unpack_from("<II", block, len(block) - 8)
+    if isize != len(data):
+        raise gzip.BadGzipFile("ISIZE mismatch in BGZF block")
+    if crc != zlib.crc32(data):
+        raise gzip.BadGzipFile("CRC32 mismatch in BGZF block")
+    return data
+
+
+class FileTimings:
+    """Phase wall times and peak memory collected for one file when instrumentation is on."""
+
+    def __init__(self, phases: Tuple[str, ...]):
+        self.phases = phases
+        self.seconds: Dict[str, float] = {phase: 0.0 for phase in phases}
+        self.peak_rss_kb = 0
+
+    @contextlib.contextmanager
+    def phase(self, name: str):  # type: ignore[no-untyped-def]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+    def add_share(self, other: "FileTimings", share: float) -> None:
+        """Attribute ``share`` of another (batch-wide) measurement to this file."""
+        for name in self.phases:
+            self.seconds[name] += other.seconds[name] * share
+        self.peak_rss_kb = max(self.peak_rss_kb, other.peak_rss_kb)
+
+    def as_dict(self, size_bytes: int) -> Dict[str, Any]:
+        total = sum(self.seconds.values())
+        timing: Dict[str, Any] = {f"{name}_s": round(self.seconds[name], 4) for name in self.phases}
+        timing["total_s"] = round(total, 4)
+        timing["bytes_per_s"] = round(size_bytes / total) if total > 0 else 0
+        timing["peak_rss_kb"] = self.peak_rss_kb
+        return timing
+
+
+def encode_columnar(result: Dict[str, Any]) -> bytes:
+    """Encode an aggregated result for ``output_type="bytes"``.
+
+    The per-file dicts of every node become one array per key, reason strings are stored
+    once in a shared table and referenced by index, and the document is zlib-compressed
+    behind ``COLUMNAR_MAGIC``. ``qc_columnar_decode.py`` restores the plain result.
+    """
+    reasons: Dict[str, int] = {}
+    nodes = []
+    for node in result.get("nodes", []):
+        files = node.get("files", [])
+        keys: List[str] = []
+        for fr in files:
+            keys.extend(key for key in fr if key not in keys)
+        columns: Dict[str, List[Any]] = {}
+        missing: Dict[str, List[int]] = {}
+        for key in keys:
+            values = []
+            for row, fr in enumerate(files):
+                if key not in fr:
+                    missing.setdefault(key, []).append(row)
+                    values.append(None)
+                elif key == "reason":
+                    values.append(reasons.setdefault(fr[key], len(reasons)))
+                else:
+                    values.append(fr[key])
+            columns[key] = values
+        table: Dict[str, Any] = {"rows": len(files), "columns": columns}
+        if missing:
+            table["missing"] = missing
+        nodes.append({**node, "files": table})
+
+    document = {
+        "format": "qc-columnar",
+        "version": 1,
+        "reasons": list(reasons),
+        "result": {**result, "nodes": nodes},
+    }
+    encoded = json.dumps(document, separators=(",", ":")).encode("utf-8")
+    return COLUMNAR_MAGIC + zlib.compress(encoded, 9)
+
+
+def throughput_summary(
+    node_result: Dict[str, Any], phases: Tuple[str, ...], counts: Dict[str, str] | None = None
+) -> Dict[str, Any] | None:
+    """Roll instrumented per-file timings of one node result up into a throughput summary.
+
+    ``counts`` maps summary names to per-file count keys (e.g. ``{"variants":
+    "variant_count"}``); each gets a total and a per-second rate. Files with
+    ``sampled_bytes`` count with the bytes read rather than their object size.
+    """
+    timed = [fr for fr in node_result.get("files", []) if "timing" in fr]
+    if not timed:
+        return None
+    counts = counts or {}
+    total_bytes = sum(fr.get("sampled_bytes", fr["size_bytes"]) for fr in timed)
+    totals = {name: sum(fr[key] for fr in timed) for name, key in counts.items()}
+    busy_s = sum(fr["timing"]["total_s"] for fr in timed)
+    # Files are processed concurrently, so rates are based on the node's wall time
+    wall_s = node_result.get("wall_time_s") or busy_s
+    return {
+        "node_id": node_result.get("node_id"),
+        "files": len(timed),
+        "bytes": total_bytes,
+        **totals,
+        "wall_time_s": wall_s,
+        "busy_time_s": round(busy_s, 4),
+        "files_per_s": round(len(timed) / wall_s, 4) if wall_s else 0.0,
+        "bytes_per_s": round(total_bytes / wall_s) if wall_s else 0,
+        **{
+            f"{name}_per_s": round(total / wall_s) if wall_s else 0
+            for name, total in totals.items()
+        },
+        "phase_s": {
+            name: round(sum(fr["timing"][f"{name}_s"] for fr in timed), 4) for name in phases
+        },
+        "max_peak_rss_kb": max(fr["timing"]["peak_rss_kb"] for fr in timed),
+    }
@@ -10,34 +10,1275 @@ sensitive information.
 
 from __future__ import annotations
 
+import contextlib
+import gzip
+import hashlib
 import json
+import mmap
+import multiprocessing
+import os
+import re
+import resource
+import struct
+import sys
 import tempfile
-from typing import Any, Dict, List
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
 
 from flame.star import StarModel, StarAnalyzer, StarAggregator
 
-import pysam
+from qc_common import (
+    BGZF_EOF,
+    ByteBudget,
+    FileTimings,
+    Prefetcher,
+    bgzf_block_header,
+    bgzf_blocks,
+    body_size,
+    encode_columnar,
+    inflate_bgzf_block,
+    is_loaded,
+    iter_chunks,
+    object_pairs,
+    read_body,
+    throughput_summary,
+)
+
+try:
+    import pysam
+except ImportError:  # pragma: no cover - the columnar scanner works without it
+    pysam = None  # type: ignore[assignment]
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - only required by the columnar scanner
+    np = None  # type: ignore[assignment]
 
 __author__ = "Jules Kreuer, jules.kreuer@uni-tuebingen.de"
-__version__ = "0.1.1"
+__version__ = "0.2.0"
 
 # Set of S3 object keys to analyze; None means all objects in the configured bucket/prefix.
 # The same keys are used on all node.
 VCF_S3_KEYS: List[str] | None = None
 
+# Number of VCF files staged and checked concurrently; None uses one worker per CPU core.
+VCF_MAX_WORKERS: int | None = None
+
+# Upper bound (bytes) on the combined size of VCF files staged at the same time.
+# A single file larger than the budget, or a streamed one of unknown size, is still processed,
+# but on its own. None disables the cap.
+VCF_MEMORY_BUDGET_BYTES: int | None = 8 * 1024**3
+
+# Objects read ahead from lazy object sources (``data`` entries that are iterables of
+# (key, body) or (key, body, size) entries instead of dicts) while earlier ones are checked; 0
+# streams every body into its staged copy when it is needed. Overlaps the network fetch with
+# the scans.
+VCF_PREFETCH_DEPTH: int = 2
+
+# Upper bound (bytes) on prefetched bodies waiting to be checked. Sizes are reserved before a
+# body is read; objects of unknown or larger size are streamed into staging instead of read
+# ahead. None disables the cap.
+VCF_PREFETCH_BYTES: int | None = 1024**3
+
+# How object bodies reach pysam: "memory" copies them into an anonymous in-memory file
+# (Linux memfd), "file" writes them to a temporary file on disk. "memory" falls back to
+# "file" where in-memory files are not available. The memfd copy lives in RAM (not on disk)
+# next to the loaded body, so each loaded file counts twice against VCF_MEMORY_BUDGET_BYTES
+# (streamed bodies are only held in the memfd and count once).
+VCF_STAGING: str = "memory"
+
+# Record scanner: "pysam" parses every record with pysam, "columnar" only extracts the CHROM
+# and POS columns from large blocks of decompressed bytes with NumPy and does not parse FORMAT
+# values. "auto" uses the columnar scanner for uncompressed VCF without samples and when pysam
+# is not installed, and pysam otherwise.
+VCF_SCAN_STRATEGY: str = "auto"
+
+# Read size of the columnar scanner.
+VCF_SCAN_CHUNK_BYTES: int = 16 * 1024**2
+
+# Per-sample genotype metrics (call rate, het/hom-alt ratio, Ti/Tv). Genotypes are read by the
+# columnar scanner in fixed-size (variants x samples) int8 chunks, so files are always scanned
+# record by record. Requires NumPy. Sample names never leave the node.
+VCF_SAMPLE_METRICS: bool = False
+
+# Site summaries as fixed-size count arrays: INFO AF spectrum, per-megabase variant density per
+# contig and variant type counts. Nodes send only the counts, which the aggregator sums.
+# Requires NumPy and always scans every record with the columnar scanner.
+VCF_SITE_SUMMARIES: bool = False
+
+# Node-local reference FASTA (uncompressed, with its samtools ``.fai`` index next to it) to
+# check every record's REF allele against; None disables the check. Requires NumPy and always
+# scans every record with the columnar scanner.
+VCF_REFERENCE_FASTA: str | None = None
+
+# Largest fraction of checked records whose REF allele may differ from the reference before
+# a file fails with "Reference mismatch", the sign of a VCF called against another build.
+VCF_REF_MAX_MISMATCH_RATE: float = 0.01
+
+# Take the index-only fast path for ``.vcf.gz`` files whose tabix (``.tbi``) or CSI (``.csi``)
+# index is among the objects: variant counts and sort order then come from the index instead
+# of a scan over all records. Files without a usable index are always scanned in full.
+VCF_USE_INDEX: bool = True
+
+# Processes scanning one large BGZF-compressed VCF in parallel, each over a byte range of its
+# blocks; None uses one process per CPU core, 1 always scans in a single pass. Only files of
+# at least VCF_PARALLEL_MIN_BYTES are split.
+VCF_SCAN_PROCESSES: int | None = None
+VCF_PARALLEL_MIN_BYTES: int = 256 * 1024**2
+
+# Path of a node-local JSON manifest of previously checked objects; None disables it. Objects
+# whose key, size and content hash (and paired index) match an entry reuse its stored result
+# instead of being scanned again. Entries are replaced when the check settings change, and
+# dropped when their key is not part of a run.
+VCF_MANIFEST_PATH: str | None = None
+
+# Add per-file phase timings, throughput and peak memory ("timing") to the results. The
+# aggregator rolls them up into per-node throughput summaries.
+VCF_INSTRUMENT: bool = False
+
+# Aggregated output format: "json" returns the result as a JSON string, "columnar" as compact
+# compressed bytes (per-node file columns, shared reason table) for output_type="bytes".
+# Decode the latter with qc_columnar_decode.py.
+VCF_OUTPUT_FORMAT: str = "json"
+
+# Failure reasons caused by the environment rather than the file content; never kept in the
+# manifest
+_TRANSIENT_REASONS = ("No VCF scanner available", "Reference unavailable")
+
+# Read size for streamed object bodies of lazy object sources
+_FETCH_CHUNK_BYTES = 4 * 1024**2
+
+# Phases of the per-file timings (VCF_INSTRUMENT)
+_TIMING_PHASES = ("staging", "tool", "parse")
+
+# Object key suffixes of the index files paired with ``<key>.vcf.gz``
+_INDEX_SUFFIXES = (".tbi", ".csi")
+
+# Bin number of the tabix pseudo-bin holding a reference's offsets and record counts
+_TBI_PSEUDO_BIN = 37450
+
+# Byte ranges per scan process, so that ranges with slower records do not stall the pool
+_RANGES_PER_PROCESS = 4
+
+# Fixed columns the ``#CHROM`` header line has to start with
+_FIXED_COLUMNS = (b"#CHROM", b"POS", b"ID", b"REF", b"ALT", b"QUAL", b"FILTER", b"INFO")
+
+# ID of a ``##contig=<...>`` header line
+_CONTIG_ID = re.compile(rb"^##contig=<(?:.*,)?ID=([^,>]+)")
+
+# Contig index of records whose contig is not declared in the header
+_UNKNOWN_CONTIG = 10**9
+
+# Largest POS htslib accepts
+_MAX_POS = (1 << 62) - 1
+
+
+# Version of the scanners' pass/fail rules. Bump it whenever they change so that manifest
+# entries written under older rules are not reused.
+_RESULT_RULES_VERSION = "3"
+
+# Genotypes (variants x samples) decoded at once by the sample metrics; bounds their memory
+_GENOTYPE_CHUNK_CELLS = 1 << 22
+
+# Leading REF bases compared with the reference; longer (deletion) alleles are truncated
+_REF_COMPARE_BASES = 32
+
+# Bin edges of the allele frequency spectrum (INFO AF of the first ALT allele); fine for rare
+# variants. Shared by all nodes, so their counts can be summed.
+_AF_EDGES = (0.0, 0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+# Width (bp) of the variant density bins
+_DENSITY_BIN_BP = 1_000_000
+
+# Variant classes by REF and first ALT allele
+_VARIANT_TYPES = ("snv", "mnv", "insertion", "deletion", "symbolic", "no_alt")
+
+# Per-sample genotype counters, summed over files with the same samples
+_SAMPLE_COUNTERS = ("called", "het", "hom_alt", "transitions", "transversions")
+
+if np is not None:
+    # Code of a genotype field's first byte after the allele(s): ':' or end of field
+    _FIELD_END = np.zeros(256, dtype=bool)
+    _FIELD_END[list(b":\t\n\r")] = True
+    _ALLELE = np.zeros(256, dtype=bool)
+    _ALLELE[list(b"0123456789.")] = True
+    # Transitions are A<->G and C<->T; both bases are upper-cased first
+    _TRANSITIONS = {(ord(a), ord(b)) for a, b in ("AG", "GA", "CT", "TC")}
+
+
+def _genotype_code(field: bytes) -> int:
+    """Classify one genotype field: -1 missing, 0 hom-ref, 1 het, 2 hom-alt."""
+    alleles = re.split(rb"[/|]", field.split(b":", 1)[0])
+    if any(a in (b"", b".") for a in alleles):
+        return -1
+    if all(a == b"0" for a in alleles):
+        return 0
+    return 2 if len(set(alleles)) == 1 else 1
+
+
+class _GenotypeStats:
+    """Per-sample genotype counters fed with blocks of VCF record lines.
+
+    Genotypes are decoded into (variants x samples) int8 matrices of at most
+    ``_GENOTYPE_CHUNK_CELLS`` entries and reduced into per-sample counters right away.
+    Records without FORMAT column or whose FORMAT does not start with GT are skipped.
+    """
+
+    def __init__(self, n_samples: int):
+        self.n_samples = n_samples
+        self.variants = 0
+        self.counts = {key: np.zeros(n_samples, dtype=np.int64) for key in _SAMPLE_COUNTERS}
+
+    def add_block(self, buf, tabs, first, ends) -> None:  # type: ignore[no-untyped-def]
+        """Add the records starting at tab index ``first`` and ending at ``ends`` in ``buf``.
+
+        The records' columns have been checked by ``_columnar_scan``.
+        """
+        n_tabs = np.searchsorted(tabs, ends) - first
+        has_format = n_tabs >= 8 + self.n_samples
+        first, ends, n_tabs = first[has_format], ends[has_format], n_tabs[has_format]
+        # Columns after the last sample are ignored, as by pysam
+        extra = n_tabs > 8 + self.n_samples
+        ends = np.where(extra, tabs[np.where(extra, first + 8 + self.n_samples, 0)], ends)
+        last = len(buf) - 1
+        fmt = tabs[first + 7] + 1
+        has_gt = (
+            (buf[fmt] == ord("G"))
+            & (buf[fmt + 1] == ord("T"))
+            & _FIELD_END[buf[np.minimum(fmt + 2, last)]]
+        )
+        first, ends = first[has_gt], ends[has_gt]
+        rows = max(1, _GENOTYPE_CHUNK_CELLS // self.n_samples)
+        for chunk in range(0, len(first), rows):
+            self._add_rows(buf, tabs, first[chunk : chunk + rows], ends[chunk : chunk + rows])
+
+    def _add_rows(self, buf, tabs, first, ends) -> None:  # type: ignore[no-untyped-def]
+        last = len(buf) - 1
+        starts = tabs[first[:, None] + 8 + np.arange(self.n_samples)] + 1
+        c0, c1, c2, c3 = (buf[np.minimum(starts + i, last)] for i in range(4))
+        diploid = ((c1 == ord("/")) | (c1 == ord("|"))) & _ALLELE[c2] & _FIELD_END[c3]
+        haploid = _FIELD_END[c1]
+        a, b = c0, np.where(diploid, c2, c0)
+        genotypes = np.where(a == b, 2, 1).astype(np.int8)
+        genotypes[(a == ord("0")) & (b == ord("0"))] = 0
+        genotypes[(a == ord(".")) | (b == ord("."))] = -1
+        # Multi-digit alleles, polyploid calls and other rare forms are decoded one by one
+        irregular = ~((diploid | haploid) & _ALLELE[c0])
+        for row, col in zip(*np.nonzero(irregular)):
+            start = int(starts[row, col])
+            end = int(tabs[first[row] + 9 + col]) if col + 1 < self.n_samples else ends[row]
+            genotypes[row, col] = _genotype_code(buf[start:end].tobytes().rstrip(b"\r\n"))
+
+        self.variants += len(first)
+        carriers = genotypes >= 1
+        self.counts["called"] += np.count_nonzero(genotypes >= 0, axis=0)
+        self.counts["het"] += np.count_nonzero(genotypes == 1, axis=0)
+        self.counts["hom_alt"] += np.count_nonzero(genotypes == 2, axis=0)
+
+        # Biallelic SNVs: single-base REF and ALT columns
+        ref, alt = tabs[first + 2] + 1, tabs[first + 3] + 1
+        snv = (tabs[first + 3] - ref == 1) & (tabs[first + 4] - alt == 1)
+        ref_base, alt_base = buf[ref] & 0xDF, buf[alt] & 0xDF
+        acgt = np.isin(ref_base, list(b"ACGT")) & np.isin(alt_base, list(b"ACGT"))
+        transition = np.array(
+            [pair in _TRANSITIONS for pair in zip(ref_base.tolist(), alt_base.tolist())],
+            dtype=bool,
+        )
+        snv &= acgt & (ref_base != alt_base)
+        self.counts["transitions"] += np.count_nonzero(carriers[snv & transition], axis=0)
+        self.counts["transversions"] += np.count_nonzero(carriers[snv & ~transition], axis=0)
+
+    def summary(self, samples: List[str]) -> Dict[str, Any]:
+        """Counters for the file result; ``samples`` is dropped again in analysis_method."""
+        return {
+            "samples": samples,
+            "variants": self.variants,
+            **{key: values.tolist() for key, values in self.counts.items()},
+        }
+
+
+class _Reference:
+    """Memory-mapped reference FASTA and its ``.fai`` index, shared by all files of a run."""
+
+    def __init__(self, path: str):
+        """Open the FASTA at ``path`` and its index at ``path + ".fai"``.
+
+        Raises:
+            OSError, ValueError: If the FASTA or its index cannot be read.
+        """
+        self.contigs: Dict[str, Tuple[int, int, int, int]] = {}
+        with open(path + ".fai", "r", encoding="utf-8") as fh:
+            for line in fh:
+                name, length, offset, line_bases, line_width = line.rstrip("\n").split("\t")[:5]
+                self.contigs[name] = (int(length), int(offset), int(line_bases), int(line_width))
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self._file.close()
+            raise
+        self.sequence = np.frombuffer(self._mmap, dtype=np.uint8)
+
+    def close(self) -> None:
+        self.sequence = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass  # A view is still alive; the mapping goes away with it
+        self._file.close()
+
+
+class _RefCheck:
+    """REF alleles of one file compared with a ``_Reference``, fed with blocks of records.
+
+    The reference bytes of a block are gathered in file offset order, so a sorted VCF walks
+    the mapped FASTA front to back instead of jumping to a random page per record. Records
+    with REF bases other than ACGT are not checked; records on contigs missing from the
+    reference are counted separately.
+    """
+
+    def __init__(self, reference: _Reference):
+        self.reference = reference
+        self.contigs: Dict[str, List[int]] = {}  # Name -> [checked, mismatches]
+        self.missing_contig_records = 0
+
+    def add_block(  # type: ignore[no-untyped-def]
+        self, buf, tabs, first, ends, names, inverse, positions
+    ) -> None:
+        """Add records; ``names``/``inverse`` are their distinct CHROM values and indexes.
+
+        Raises:
+            ValueError: If a record lacks the REF or ALT column.
+        """
+        if first[-1] + 3 >= tabs.size or np.any(tabs[first + 3] >= ends):
+            raise ValueError("Record without REF/ALT columns")
+        decoded = [name.decode("utf-8") for name in names]
+        info = np.array(
+            [self.reference.contigs.get(name, (-1, 0, 1, 1)) for name in decoded], dtype=np.int64
+        )[inverse]
+        length, offset, line_bases, line_width = (info[:, i : i + 1] for i in range(4))
+        known = length[:, 0] >= 0
+
+        ref_start = tabs[first + 2] + 1
+        ref_length = tabs[first + 3] - ref_start
+        width = int(min(max(int(ref_length.max()), 1), _REF_COMPARE_BASES))
+        bases = np.arange(width)
+        compared = bases < ref_length[:, None]
+        alleles = buf[np.minimum(ref_start[:, None] + bases, len(buf) - 1)] & 0xDF
+        acgt = np.isin(alleles, list(b"ACGT")) | ~compared
+        checked = known & (ref_length > 0) & acgt.all(axis=1)
+
+        sequence = self.reference.sequence
+        pos0 = positions[:, None] - 1 + bases
+        file_offsets = (
+            offset + (pos0 // np.maximum(line_bases, 1)) * line_width
+            + pos0 % np.maximum(line_bases, 1)
+        )
+        in_range = (pos0 >= 0) & (pos0 < length) & (file_offsets < sequence.size)
+        fetch = compared & in_range & checked[:, None]
+        cells = file_offsets[fetch]
+        order = np.argsort(cells, kind="stable")
+        fetched = np.empty(cells.size, dtype=np.uint8)
+        fetched[order] = sequence[cells[order]]
+        differs = compared & ~in_range
+        differs[fetch] = (fetched & 0xDF) != alleles[fetch]
+        mismatched = checked & differs.any(axis=1)
+
+        n_names = len(decoded)
+        checked_counts = np.bincount(inverse[checked], minlength=n_names)
+        mismatch_counts = np.bincount(inverse[mismatched], minlength=n_names)
+        self.missing_contig_records += int(np.count_nonzero(~known))
+        for idx, name in enumerate(decoded):
+            if checked_counts[idx]:
+                counts = self.contigs.setdefault(name, [0, 0])
+                counts[0] += int(checked_counts[idx])
+                counts[1] += int(mismatch_counts[idx])
+
+    def summary(self) -> Dict[str, Any]:
+        """Checked records and mismatches per file and per contig."""
+        checked = sum(c for c, _ in self.contigs.values())
+        mismatches = sum(m for _, m in self.contigs.values())
+        return {
+            "checked": checked,
+            "mismatches": mismatches,
+            "mismatch_rate": round(mismatches / checked, 6) if checked else None,
+            "missing_contig_records": self.missing_contig_records,
+            "contigs": {
+                name: {"checked": c, "mismatches": m, "mismatch_rate": round(m / c, 6)}
+                for name, (c, m) in self.contigs.items()
+            },
+        }
+
+
+class _SiteStats:
+    """Fixed-size site count arrays of one file, fed with blocks of records.
+
+    Array sizes depend only on ``_AF_EDGES``, ``_VARIANT_TYPES`` and the contig lengths, never on
+    the number of variants.
+    """
+
+    def __init__(self) -> None:
+        self.af_bins = np.zeros(len(_AF_EDGES) - 1, dtype=np.int64)
+        self.af_missing = 0
+        self.variant_types = np.zeros(len(_VARIANT_TYPES), dtype=np.int64)
+        self.multiallelic = 0
+        self.density: Dict[str, Any] = {}
+
+    def add_block(  # type: ignore[no-untyped-def]
+        self, buf, tabs, first, ends, names, inverse, positions
+    ) -> None:
+        """Add records; ``names``/``inverse`` are their distinct CHROM values and indexes.
+
+        Raises:
+            ValueError: If a record lacks the INFO column.
+        """
+        if first[-1] + 6 >= tabs.size or np.any(tabs[first + 6] >= ends):
+            raise ValueError("Record without INFO column")
+        self._add_density(names, inverse, positions)
+        self._add_types(buf, tabs, first)
+        self._add_allele_frequencies(buf, tabs, first, ends)
+
+    def _add_density(self, names, inverse, positions) -> None:  # type: ignore[no-untyped-def]
+        bins = np.maximum(positions - 1, 0) // _DENSITY_BIN_BP
+        for idx, name in enumerate(names):
+            counts = np.bincount(bins[inverse == idx])
+            name = name.decode("utf-8")
+            total = self.density.get(name)
+            if total is None or total.size < counts.size:
+                grown = np.zeros(counts.size, dtype=np.int64)
+                if total is not None:
+                    grown[: total.size] = total
+                total = self.density[name] = grown
+            total[: counts.size] += counts
+
+    def _add_types(self, buf, tabs, first) -> None:  # type: ignore[no-untyped-def]
+        ref_length = tabs[first + 3] - tabs[first + 2] - 1
+        alt_start, alt_end = tabs[first + 3] + 1, tabs[first + 4]
+        commas = np.append(np.flatnonzero(buf == ord(",")), len(buf))
+        comma = commas[np.searchsorted(commas, alt_start)]
+        multiallelic = comma < alt_end
+        first_alt_end = np.minimum(comma, alt_end)
+        alt_length = first_alt_end - alt_start
+        head, tail = buf[alt_start], buf[np.maximum(first_alt_end - 1, alt_start)]
+        # Symbolic alleles (<DEL>), breakends (G]17:1], .A), spanning deletions (*)
+        symbolic = np.isin(head, list(b"<[]*.")) | np.isin(tail, list(b"[]."))
+        no_alt = (alt_length == 1) & (head == ord("."))
+        kind = np.select(
+            [no_alt, symbolic, alt_length > ref_length, alt_length < ref_length, ref_length > 1],
+            [5, 4, 2, 3, 1],
+            default=0,
+        )
+        self.variant_types += np.bincount(kind, minlength=len(_VARIANT_TYPES))
+        self.multiallelic += int(np.count_nonzero(multiallelic))
+
+    def _add_allele_frequencies(  # type: ignore[no-untyped-def]
+        self, buf, tabs, first, ends
+    ) -> None:
+        info_start = tabs[first + 6] + 1
+        following = tabs[np.minimum(first + 7, tabs.size - 1)]
+        info_end = np.where((first + 7 < tabs.size) & (following < ends), following, ends)
+
+        # "AF=" at the start of INFO or after a ';', first occurrence per record
+        hits = np.flatnonzero((buf[:-2] == ord("A")) & (buf[1:-1] == ord("F")) & (buf[2:] == 61))
+        record = np.searchsorted(info_start, hits, side="right") - 1
+        valid = record >= 0
+        hits, record = hits[valid], record[valid]
+        valid = (hits < info_end[record]) & (
+            (hits == info_start[record]) | (buf[np.maximum(hits - 1, 0)] == ord(";"))
+        )
+        hits, record = hits[valid], record[valid]
+        record, unique_idx = np.unique(record, return_index=True)
+        values = hits[unique_idx] + 3
+
+        width = 24
+        offsets = np.arange(width)
+        raw = buf[np.minimum(values[:, None] + offsets, len(buf) - 1)]
+        stop = np.isin(raw, list(b",;\t\n\r")) | (values[:, None] + offsets >= len(buf))
+        value_length = np.where(stop.any(axis=1), stop.argmax(axis=1), width)
+        raw = np.where(offsets < value_length[:, None], raw, 0).astype(np.uint8)
+        texts = np.ascontiguousarray(raw).view(f"S{width}").ravel()
+        try:
+            af = texts.astype(np.float64)
+        except ValueError:
+            af = np.array([_parse_float(text) for text in texts.tolist()], dtype=np.float64)
+        known = (af >= 0.0) & (af <= 1.0)  # Also drops NaN
+        n_bins = len(_AF_EDGES) - 1
+        bins = np.clip(np.searchsorted(_AF_EDGES, af[known], side="right") - 1, 0, n_bins - 1)
+        self.af_bins += np.bincount(bins, minlength=n_bins)
+        self.af_missing += first.size - int(np.count_nonzero(known))
+
+    def summary(self) -> Dict[str, Any]:
+        """Plain-list counts for the file result."""
+        return {
+            "af_bins": self.af_bins.tolist(),
+            "af_missing": self.af_missing,
+            "variant_types": self.variant_types.tolist(),
+            "multiallelic": self.multiallelic,
+            "density": {name: counts.tolist() for name, counts in self.density.items()},
+        }
+
+
+def _parse_float(text: bytes) -> float:
+    try:
+        return float(text)
+    except ValueError:
+        return float("nan")
+
+
+def _merge_site_summaries(summaries: List[Dict[str, Any]]) -> Dict[str, Any] | None:
+    """Sum site summaries of files or nodes; density arrays are padded to the longest one.
+
+    The result has the same layout as its inputs, so node sums can be summed again.
+    """
+    if not summaries:
+        return None
+    density: Dict[str, Any] = {}
+    for summary in summaries:
+        for name, counts in summary["density"].items():
+            counts = np.asarray(counts, dtype=np.int64)
+            total = density.get(name)
+            if total is None or total.size < counts.size:
+                grown = np.zeros(counts.size, dtype=np.int64)
+                if total is not None:
+                    grown[: total.size] = total
+                total = density[name] = grown
+            total[: counts.size] += counts
+    return {
+        "af_bins": np.sum([s["af_bins"] for s in summaries], axis=0).tolist(),
+        "af_missing": sum(s["af_missing"] for s in summaries),
+        "variant_types": np.sum([s["variant_types"] for s in summaries], axis=0).tolist(),
+        "multiallelic": sum(s["multiallelic"] for s in summaries),
+        "density": {name: counts.tolist() for name, counts in density.items()},
+    }
+
+
+def _merge_sample_metrics(metrics: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sum per-file sample counters over files with the same set of samples.
+
+    Samples are put into a common (sorted) order first and their names are dropped, so the
+    node result only holds anonymous per-sample arrays.
+    """
+    groups: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    for entry in metrics:
+        order = sorted(range(len(entry["samples"])), key=lambda i: entry["samples"][i])
+        key = tuple(entry["samples"][i] for i in order)
+        group = groups.setdefault(
+            key,
+            {
+                "samples": len(key),
+                "files": 0,
+                "variants": 0,
+                **{name: [0] * len(key) for name in _SAMPLE_COUNTERS},
+            },
+        )
+        group["files"] += 1
+        group["variants"] += entry["variants"]
+        for name in _SAMPLE_COUNTERS:
+            values = entry[name]
+            group[name] = [total + values[i] for total, i in zip(group[name], order)]
+    return list(groups.values())
+
+
+def _sample_rates(groups: List[Dict[str, Any]]) -> Dict[str, Any] | None:
+    """Per-sample call rate, het/hom-alt ratio and Ti/Tv over all sample groups of all nodes.
+
+    Ratios with a zero denominator are reported as None.
+    """
+    rates: Dict[str, List[float | None]] = {"call_rate": [], "het_hom_ratio": [], "titv": []}
+    for group in groups:
+        for idx in range(group["samples"]):
+            called, het, hom_alt = (group[k][idx] for k in ("called", "het", "hom_alt"))
+            ti, tv = group["transitions"][idx], group["transversions"][idx]
+            variants = group["variants"]
+            rates["call_rate"].append(round(called / variants, 4) if variants else None)
+            rates["het_hom_ratio"].append(round(het / hom_alt, 4) if hom_alt else None)
+            rates["titv"].append(round(ti / tv, 4) if tv else None)
+    if not rates["call_rate"]:
+        return None
+    medians = {}
+    for name, values in rates.items():
+        known = sorted(v for v in values if v is not None)
+        medians[name] = known[len(known) // 2] if known else None
+    return {"samples": len(rates["call_rate"]), **rates, "median": medians}
+
+
+class _TextHeader:
+    """The parts of a VCF header used by the checks, read without pysam."""
+
+    def __init__(self, version: str | None, contigs: List[str], samples: List[str]):
+        self.version = version
+        self.contigs = contigs
+        self.samples = samples
+
+
+def _open_vcf_text(path: str):  # type: ignore[no-untyped-def]
+    """Open a plain or BGZF compressed VCF as a decompressed binary stream.
+
+    Like htslib, gzip input is only accepted as complete BGZF: the first block must carry
+    the BGZF extra field and the file must end with the BGZF EOF block.
+
+    Raises:
+        ValueError: If the file is gzip but not complete BGZF.
+    """
+    with open(path, "rb") as fh:
+        magic = fh.read(18)
+        if not magic.startswith(b"\x1f\x8b"):
+            return open(path, "rb")
+        if bgzf_block_header(magic) is None:
+            raise ValueError("Not BGZF")
+        fh.seek(-len(BGZF_EOF), os.SEEK_END)
+        if fh.read() != BGZF_EOF:
+            raise ValueError("Missing BGZF EOF block")
+    return gzip.open(path, "rb")
+
+
+def _read_text_header(stream: Any) -> _TextHeader:
+    """Read the header lines of a VCF stream, leaving it at the first record.
+
+    The header is accepted as pysam accepts it: the first line declares a ``VCF`` file
+    format, and the ``#CHROM`` line holds the eight fixed columns, optionally followed by
+    FORMAT and at least one sample, all named and unique.
+
+    Raises:
+        ValueError: If the header is malformed or does not end with a ``#CHROM`` line.
+    """
+    version = None
+    contigs: Dict[str, None] = {}
+    line = stream.readline()
+    if not line.startswith(b"##fileformat=VCF"):
+        raise ValueError("Missing ##fileformat line")
+    while True:
+        if line.startswith(b"#CHROM"):
+            columns = line.rstrip(b"\r\n").split(b"\t")
+            break
+        if not line.startswith(b"##"):
+            raise ValueError("Missing #CHROM header line")
+        if line.startswith(b"##fileformat="):
+            version = line[13:].strip().decode("utf-8")
+        match = _CONTIG_ID.match(line)
+        if match:
+            contigs[match.group(1).decode("utf-8")] = None
+        line = stream.readline()
+    samples = columns[9:]
+    if tuple(columns[:8]) != _FIXED_COLUMNS or (
+        len(columns) > 8
+        and (columns[8] != b"FORMAT" or not samples or not all(samples))
+    ):
+        raise ValueError("Malformed #CHROM header line")
+    if len(set(samples)) < len(samples):
+        raise ValueError("Duplicate sample names")
+    return _TextHeader(version, list(contigs), [s.decode("utf-8") for s in samples])
+
+
+def _valid_prefix(valid: Any) -> int:
+    """Number of leading True values of a boolean array."""
+    return int(valid.size if valid.all() else np.argmin(valid))
+
+
+def _columnar_scan(
+    stream: Any,
+    contig_order: Dict[str, int],
+    chunk_bytes: int,
+    genotypes: _GenotypeStats | None = None,
+    ref_check: _RefCheck | None = None,
+    sites: _SiteStats | None = None,
+    n_samples: int = 0,
+) -> Tuple[int, bool]:
+    """Count the records of a VCF stream and check their sort order, block by block.
+
+    Only CHROM and POS are extracted: newline and tab offsets are located with NumPy, the
+    CHROM names of a block are mapped to contig indexes once per distinct name, and POS
+    digits are converted in one vectorized step. Sort order is checked on whole blocks.
+    With ``genotypes`` the sample columns of every block are added to it as well, with
+    ``ref_check`` the REF alleles and with ``sites`` the site counts.
+
+    Records are accepted and rejected as pysam does: every line (blank ones included) needs
+    the eight fixed columns, CHROM must not end with a space, and POS is empty (read as 0)
+    or an optionally "+"-signed number up to htslib's limit. Other columns may be empty.
+    With ``n_samples`` a record either ends after INFO or has FORMAT and a non-empty column
+    for every sample; further columns are ignored. FORMAT values are not parsed.
+
+    Raises:
+        _RecordError: If a record is malformed; carries the count and sort order of the
+            records before it.
+    """
+    variant_count = 0
+    is_sorted = True
+    prev_key: Tuple[int, int] | None = None
+    carry = b""
+    while True:
+        chunk = stream.read(chunk_bytes)
+        data = carry + chunk
+        if not chunk:
+            if not data:
+                break
+            data += b"\n"
+        buf = np.frombuffer(data, dtype=np.uint8)
+        newlines = np.flatnonzero(buf == 10)
+        if newlines.size == 0:
+            carry = data
+            continue
+        carry = data[newlines[-1] + 1 :]
+        starts = np.concatenate(([0], newlines[:-1] + 1))
+        ends = newlines
+
+        # Records up to the first malformed one are still counted, as pysam does
+        tabs = np.flatnonzero(buf == 9)
+        first = np.searchsorted(tabs, starts)
+        n_tabs = np.searchsorted(tabs, ends) - first
+        complete = n_tabs >= 7
+        if n_samples:
+            # A field is empty if its tab is followed by another tab or the line end
+            last = len(buf) - 1
+            after = buf[np.minimum(tabs + 1, last)]
+            empty = (after == 9) | (after == 10)
+            empty |= (after == 13) & (buf[np.minimum(tabs + 2, last)] == 10)
+            empty_before = np.concatenate(([0], np.cumsum(empty)))
+            sample_tabs = np.minimum(first + 8, tabs.size)
+            empty_samples = (
+                empty_before[np.minimum(sample_tabs + n_samples, tabs.size)]
+                - empty_before[sample_tabs]
+            )
+            complete &= (n_tabs == 7) | ((n_tabs >= 8 + n_samples) & (empty_samples == 0))
+        valid = _valid_prefix(complete)
+        malformed = valid < starts.size
+        starts, ends, first = starts[:valid], ends[:valid], first[:valid]
+        tab1, tab2 = tabs[first], tabs[first + 1]
+
+        # POS: right-aligned digit matrix (at most 20 wide, longer fields are rejected)
+        signed = (tab2 > tab1 + 1) & (buf[tab1 + 1] == ord("+"))
+        digit_counts = tab2 - tab1 - 1 - signed
+        digits_width = int(np.clip(digit_counts.max(initial=0), 1, 20))
+        offsets = np.arange(digits_width)
+        digits = buf[tab2[:, None] - digits_width + offsets].astype(np.int64) - ord("0")
+        digits[offsets < digits_width - digit_counts[:, None]] = 0
+        powers = 10 ** np.arange(digits_width - 1, -1, -1, dtype=np.uint64)
+        positions = digits.astype(np.uint64) @ powers
+        valid = _valid_prefix(
+            (digit_counts <= 19)
+            & np.all((digits >= 0) & (digits <= 9), axis=1)
+            & (positions <= _MAX_POS)
+            & ~((tab1 > starts) & (buf[tab1 - 1] == ord(" ")))
+        )
+        malformed = malformed or valid < starts.size
+        starts, ends, first, tab1 = starts[:valid], ends[:valid], first[:valid], tab1[:valid]
+        positions = positions[:valid].astype(np.int64)
+        if starts.size == 0:
+            if malformed:
+                raise _RecordError(variant_count, is_sorted)
+            continue
+
+        # CHROM: fixed-width byte strings, looked up once per distinct name
+        name_lengths = tab1 - starts
+        width = max(int(name_lengths.max()), 1)
+        offsets = np.arange(width)
+        gathered = buf[np.minimum(starts[:, None] + offsets, len(buf) - 1)]
+        names = np.where(offsets < name_lengths[:, None], gathered, 0)
+        distinct, inverse = np.unique(
+            np.ascontiguousarray(names, dtype=np.uint8).view(f"S{width}").ravel(),
+            return_inverse=True,
+        )
+        lookup = np.array(
+            [contig_order.get(n.decode("utf-8"), _UNKNOWN_CONTIG) for n in distinct],
+            dtype=np.int64,
+        )
+        contig_idx = lookup[inverse.ravel()]
+
+        contig_step = np.diff(contig_idx)
+        if np.any((contig_step < 0) | ((contig_step == 0) & (np.diff(positions) < 0))):
+            is_sorted = False
+        if prev_key is not None and (int(contig_idx[0]), int(positions[0])) < prev_key:
+            is_sorted = False
+        prev_key = (int(contig_idx[-1]), int(positions[-1]))
+        variant_count += int(starts.size)
+        if genotypes is not None:
+            genotypes.add_block(buf, tabs, first, ends)
+        if ref_check is not None:
+            ref_check.add_block(buf, tabs, first, ends, distinct, inverse.ravel(), positions)
+        if sites is not None:
+            sites.add_block(buf, tabs, first, ends, distinct, inverse.ravel(), positions)
+        if malformed:
+            raise _RecordError(variant_count, is_sorted)
+    return variant_count, is_sorted
+
+
+def _read_index_counts(
+    index_content: bytes, header_contigs: List[str], size_bytes: int
+) -> Tuple[List[str], int] | None:
+    """Read contigs (in file order) and the record count from a tabix or CSI index.
+
+    Every reference with records must carry the pseudo-bin with its record count, and no
+    offset may point past the end of the VCF (a stale index); otherwise None is returned.
+    CSI indexes without a name table refer to the header contigs by position.
+
+    Raises:
+        struct.error, ValueError, OSError: If the index is malformed.
+    """
+    data = gzip.decompress(index_content)
+    offset = 0
+
+    def read(fmt: str) -> Tuple[Any, ...]:
+        nonlocal offset
+        values = struct.unpack_from(fmt, data, offset)
+        offset += struct.calcsize(fmt)
+        return values
+
+    def read_names(l_nm: int) -> List[str]:
+        nonlocal offset
+        names = data[offset : offset + l_nm].split(b"\0")[:-1]
+        offset += l_nm
+        return [name.decode("utf-8") for name in names]
+
+    magic = data[:4]
+    offset = 4
+    if magic == b"TBI\1":
+        n_ref, _fmt, _col_seq, _col_beg, _col_end, _meta, _skip, l_nm = read("<8i")
+        names = read_names(l_nm)
+        pseudo_bin, has_loffset = _TBI_PSEUDO_BIN, False
+    elif magic == b"CSI\1":
+        _min_shift, depth, l_aux = read("<3i")
+        aux_end = offset + l_aux
+        names = []
+        if l_aux >= 28:
+            l_nm = read("<7i")[6]
+            names = read_names(l_nm)
+        offset = aux_end
+        (n_ref,) = read("<i")
+        pseudo_bin, has_loffset = ((1 << ((depth + 1) * 3)) - 1) // 7 + 1, True
+    else:
+        raise ValueError("Not a tabix or CSI index")
+    if not names:
+        names = header_contigs[:n_ref]
+    if len(names) != n_ref:
+        raise ValueError("Index reference names do not match")
+
+    # (first virtual offset, name, record count) of every reference with records
+    refs: List[Tuple[int, str, int]] = []
+    for tid in range(n_ref):
+        (n_bin,) = read("<i")
+        counts = None
+        for _ in range(n_bin):
+            (bin_no,) = read("<I")
+            if has_loffset:
+                offset += 8
+            (n_chunk,) = read("<i")
+            chunks = read(f"<{2 * n_chunk}Q")
+            if bin_no == pseudo_bin and n_chunk == 2:
+                counts = chunks
+        if not has_loffset:
+            (n_intv,) = read("<i")
+            offset += 8 * n_intv
+        if n_bin == 0:
+            continue
+        if counts is None:
+            return None  # Index written without record counts
+        ref_beg, ref_end, n_mapped, _n_unmapped = counts
+        if (ref_end >> 16) > size_bytes:
+            return None  # Index belongs to another (longer) version of the file
+        refs.append((ref_beg, names[tid], n_mapped))
+
+    refs.sort()
+    return [name for _, name, _ in refs], sum(n_mapped for _, _, n_mapped in refs)
+
+
+def _record_start(buf: Any, blocks: List[Tuple[int, int, int]], idx: int) -> int | None:
+    """Virtual offset of the first line starting in or after block ``idx``; None if none."""
+
+    def inflate(block: Tuple[int, int, int]) -> bytes:
+        offset, header_size, block_size = block
+        return inflate_bgzf_block(buf[offset : offset + block_size], header_size)
+
+    if inflate(blocks[idx - 1]).endswith(b"\n"):
+        return blocks[idx][0] << 16
+    for j in range(idx, len(blocks)):
+        data = inflate(blocks[j])
+        newline = data.find(b"\n")
+        if newline < 0:
+            continue
+        if newline + 1 < len(data):
+            return (blocks[j][0] << 16) | (newline + 1)
+        return blocks[j + 1][0] << 16 if j + 1 < len(blocks) else None
+    return None
+
+
+def _scan_ranges(path: str, first_record: int, n_ranges: int) -> List[Tuple[int, Any, Any]] | None:
+    """Split the records of a BGZF file into about ``n_ranges`` contiguous ranges.
+
+    Each range is ``(start, end, end_alias)`` in virtual offsets; the last one has no end.
+    A line starting at the beginning of a block can also be reported as the end of the
+    previous block, so the alias form of ``end`` is passed along. None if the file is not
+    BGZF.
+    """
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        blocks = bgzf_blocks(buf)
+        if blocks is None:
+            return None
+        size = len(buf)
+        starts = [first_record]
+        ends = []
+        idx = 0
+        for part in range(1, n_ranges):
+            target = size * part // n_ranges
+            while idx < len(blocks) and blocks[idx][0] < target:
+                idx += 1
+            if idx == 0 or idx >= len(blocks):
+                continue
+            start = _record_start(buf, blocks, idx)
+            if start is None or start <= starts[-1]:
+                continue
+            alias = None
+            if start & 0xFFFF == 0:
+                prev = next(b for b in reversed(blocks) if b[0] < start >> 16)
+                (isize,) = struct.unpack_from("<I", buf, prev[0] + prev[2] - 4)
+                alias = (prev[0] << 16) | isize
+            starts.append(start)
+            ends.append((start, alias))
+    ends.append((None, None))
+    return [(start, end, alias) for start, (end, alias) in zip(starts, ends)]
+
+
+class _RecordError(ValueError):
+    """A record could not be read; carries the count and sort order of the records before it."""
+
+    def __init__(self, variant_count: int, is_sorted: bool):
+        super().__init__("Malformed record")
+        self.variant_count = variant_count
+        self.is_sorted = is_sorted
+
+
+def _init_scan_worker() -> None:
+    """Initializer of the parallel scan processes."""
+    # htslib would otherwise log its missing-index notice each time a range opens the file
+    pysam.set_verbosity(0)
+
+
+def _scan_vcf_range(
+    path: str, start: int, end: int | None, end_alias: int | None
+) -> Dict[str, Any]:
+    """Count the records of one byte range of a BGZF VCF and check their local sort order.
+
+    Runs in a worker process. Returns the count, the local verdict and the first and last
+    (contig index, position) keys for the checks across range boundaries. A record that
+    cannot be read ends the range with ``error`` set; the count covers the records before
+    it. Errors opening or seeking the file are raised.
+    """
+    error = False
+    with pysam.VariantFile(path, "r") as vf:
+        contig_order = {c: i for i, c in enumerate(vf.header.contigs)}
+        vf.seek(start)
+        is_sorted = True
+        first_key = prev_key = None
+        variant_count = 0
+        while True:
+            if end is not None:
+                pos = vf.tell()
+                if pos >= end or pos == end_alias:
+                    break
+            try:
+                rec = next(vf, None)
+            except Exception:
+                error = True
+                break
+            if rec is None:
+                break
+            key = (contig_order.get(rec.chrom, _UNKNOWN_CONTIG), rec.pos)
+            if prev_key is not None and key < prev_key:
+                is_sorted = False
+            if first_key is None:
+                first_key = key
+            prev_key = key
+            variant_count += 1
+    return {
+        "variant_count": variant_count,
+        "is_sorted": is_sorted,
+        "first_key": first_key,
+        "last_key": prev_key,
+        "error": error,
+    }
+
+
+def _failed_file_result(fname: str, size_bytes: int, reason: str) -> Dict[str, Any]:
+    """Result of a file that could not be checked at all."""
+    return {
+        "file": fname,
+        "size_bytes": size_bytes,
+        "pass": False,
+        "warnings": False,
+        "reason": f"FATAL: {reason}",
+        "contig_count": 0,
+        "sample_count": 0,
+        "variant_count": 0,
+        "scan": "none",
+    }
+
+
+def _write_body(fh: Any, content: Any, sha256: Any = None) -> int:
+    """Copy a loaded or streamed object body to ``fh``; returns the number of bytes written."""
+    size = 0
+    for chunk in iter_chunks(content, _FETCH_CHUNK_BYTES):
+        fh.write(chunk)
+        size += len(chunk)
+        if sha256 is not None:
+            sha256.update(chunk)
+    return size
+
+
+def _content_digest(content: Any) -> str:
+    """SHA-256 of an object body (bytes or str)."""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+class _Manifest:
+    """Node-local record of checked objects and their results, stored as one JSON file.
+
+    Entries are keyed by object key and hold the body size, the SHA-256 of the body and of its
+    paired index, a fingerprint of the check settings and the file result. The size is
+    compared first, so changed objects of a different size are not hashed at all. Only the
+    keys looked up in this run are saved, so entries of deleted objects do not accumulate.
+    """
+
+    def __init__(self, path: str, settings: str):
+        self.path = path
+        self.settings = settings
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._seen: Set[str] = set()
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                entries = json.load(fh)
+            if isinstance(entries, dict):
+                self.entries = entries
+        except (OSError, ValueError):
+            pass  # No or unreadable manifest: every object is scanned
+
+    def lookup(
+        self,
+        fname: str,
+        size: int,
+        index_content: bytes | None,
+        content: Any = None,
+        sha256: str | None = None,
+    ) -> Tuple[Dict[str, Any] | None, Dict[str, Any]]:
+        """Return the stored result of an unchanged object (or None) and its current entry.
+
+        The body hash is either given (``sha256``, for streamed bodies hashed while staged)
+        or computed from the loaded ``content`` once size and settings match.
+        """
+        with self._lock:
+            self._seen.add(fname)
+        entry: Dict[str, Any] = {
+            "size": size,
+            "settings": self.settings,
+            "index_sha256": _content_digest(index_content) if index_content is not None else None,
+        }
+        if sha256 is not None:
+            entry["sha256"] = sha256
+        stored = self.entries.get(fname)
+        if not isinstance(stored, dict) or any(stored.get(k) != v for k, v in entry.items()):
+            return None, entry
+        if "sha256" not in entry:
+            entry["sha256"] = _content_digest(content)
+        if stored.get("sha256") != entry["sha256"]:
+            return None, entry
+        return dict(stored["result"], file=fname), entry
+
+    def record(
+        self, fname: str, entry: Dict[str, Any], fr: Dict[str, Any], content: Any = None
+    ) -> None:
+        """Store the result of a scanned object, unless it failed for environmental reasons."""
+        if any(reason in fr["reason"] for reason in _TRANSIENT_REASONS):
+            with self._lock:
+                self.entries.pop(fname, None)
+            return
+        if "sha256" not in entry:
+            entry["sha256"] = _content_digest(content)
+        entry["result"] = {k: v for k, v in fr.items() if k not in ("file", "timing")}
+        with self._lock:
+            self.entries[fname] = entry
+
+    def save(self) -> None:
+        """Write the entries of this run's keys atomically.
+
+        A failed write only costs rescans on the next run.
+        """
+        with self._lock:
+            entries = {k: v for k, v in self.entries.items() if k in self._seen}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(entries, fh)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
 
 class VCFAnalyzer(StarAnalyzer):
     """Analyzer that performs QC across all VCF files in a provided folder dataset.
 
     Expected data layout provided to ``analysis_method`` for S3 data_type:
         data[0] -> dict mapping each queried object key to its object body (bytes/str).
+    Entries may also be lazy object sources: iterables of (key, body) pairs, or of
+    (key, body, size) with the object size from the bucket listing, whose bodies are bytes,
+    str, file-like streams or iterables of chunks (see ``VCF_PREFETCH_DEPTH``).
     """
 
     def __init__(self, flame):  # type: ignore[no-untyped-def]
         super().__init__(flame)
+        self.max_workers = max(1, VCF_MAX_WORKERS or os.cpu_count() or 1)
+        self.memory_budget_bytes = VCF_MEMORY_BUDGET_BYTES
+        self.staging = VCF_STAGING
+        self.scan_strategy = VCF_SCAN_STRATEGY
+        self.scan_chunk_bytes = VCF_SCAN_CHUNK_BYTES
+        self.sample_metrics = VCF_SAMPLE_METRICS and np is not None
+        self.site_summaries = VCF_SITE_SUMMARIES and np is not None
+        self.instrument = VCF_INSTRUMENT
+        self.use_index = VCF_USE_INDEX
+        self.scan_processes = max(1, VCF_SCAN_PROCESSES or os.cpu_count() or 1)
+        self.parallel_min_bytes = VCF_PARALLEL_MIN_BYTES
+        self.manifest_path = VCF_MANIFEST_PATH
+        self.prefetch_depth = VCF_PREFETCH_DEPTH
+        self.prefetch_bytes = VCF_PREFETCH_BYTES
+        self.reference_fasta = VCF_REFERENCE_FASTA
+        self.ref_max_mismatch_rate = VCF_REF_MAX_MISMATCH_RATE
+        self._reference: _Reference | None = None
+        self._scan_pool: ProcessPoolExecutor | None = None
+        self._scan_pool_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _phase(self, name: str):  # type: ignore[no-untyped-def]
+        """Context manager timing one phase of the file currently processed by this thread."""
+        timings = getattr(self._local, "timings", None)
+        return timings.phase(name) if timings is not None else contextlib.nullcontext()
+
+    def _indexed_scan(
+        self, index_content: bytes, contig_order: Dict[str, int], size_bytes: int
+    ) -> Tuple[int, bool] | None:
+        """Variant count and sort order from an index; None if the index cannot answer.
+
+        The index proves that records are sorted by position within each contig and that
+        every contig forms one block, so only the contig order has to be compared with the
+        header. Contigs missing from the header need the full scan.
+        """
+        try:
+            indexed = _read_index_counts(index_content, list(contig_order), size_bytes)
+        except Exception:
+            return None
+        if indexed is None:
+            return None
+        file_contigs, variant_count = indexed
+        if any(c not in contig_order for c in file_contigs):
+            return None
+        order = [contig_order[c] for c in file_contigs]
+        return variant_count, order == sorted(order)
+
+    def _parallel_scan(self, path: str, first_record: int) -> Tuple[int, bool] | None:
+        """Variant count and sort order from scanning byte ranges in worker processes.
+
+        Returns None if the file is not BGZF or the scan fails for any other reason than a
+        record (pool, process or I/O errors), so that the caller scans it in a single pass.
+
+        Raises:
+            _RecordError: If a range reports a record that cannot be read. The count and sort
+                order cover the records before it, as in a single pass.
+        """
+        futures: List[Any] = []
+        try:
+            ranges = _scan_ranges(path, first_record, self.scan_processes * _RANGES_PER_PROCESS)
+            if ranges is None or len(ranges) < 2:
+                return None
+            # Shared by all files checked concurrently
+            with self._scan_pool_lock:
+                if self._scan_pool is None:
+                    self._scan_pool = ProcessPoolExecutor(
+                        max_workers=self.scan_processes,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_scan_worker,
+                    )
+                pool = self._scan_pool
+            futures = [pool.submit(_scan_vcf_range, path, *r) for r in ranges]
+            parts = [future.result() for future in futures]
+        except Exception as exc:
+            for future in futures:
+                future.cancel()
+            if isinstance(exc, BrokenProcessPool):
+                with self._scan_pool_lock:
+                    if self._scan_pool is pool:
+                        self._scan_pool = None
+            return None
+
+        failed = next((idx for idx, part in enumerate(parts) if part["error"]), None)
+        if failed is not None:
+            parts = parts[: failed + 1]
+        is_sorted = all(part["is_sorted"] for part in parts)
+        # Records must also stay in order across range boundaries
+        keys = [(p["first_key"], p["last_key"]) for p in parts if p["variant_count"]]
+        for (_, last_key), (first_key, _) in zip(keys, keys[1:]):
+            if first_key < last_key:
+                is_sorted = False
+        variant_count = sum(part["variant_count"] for part in parts)
+        if failed is not None:
+            raise _RecordError(variant_count, is_sorted)
+        return variant_count, is_sorted
+
+    def _manifest_settings(self) -> str:
+        """Fingerprint of the settings that change file results; part of every manifest entry."""
+        # Which scanner reads a file depends on the installed libraries
+        libraries = f"{int(pysam is not None)}{int(np is not None)}"
+        reference = None
+        if self.reference_fasta is not None:
+            try:
+                st = os.stat(self.reference_fasta)
+                reference = f"{self.reference_fasta}:{st.st_size}:{st.st_mtime_ns}"
+            except OSError:
+                reference = self.reference_fasta
+            reference += f":{self.ref_max_mismatch_rate}"
+        return (
+            f"{__version__}|{_RESULT_RULES_VERSION}|{self.scan_strategy}|{libraries}"
+            f"|{int(self.use_index)}"
+            f"|{int(self.sample_metrics)}|{int(self.site_summaries)}|{reference}"
+        )
+
+    def _record_scanner(self, path: str) -> str | None:
+        """Pick the record scanner for a file; None if no suitable one is installed."""
+        if self.sample_metrics or self.site_summaries or self.reference_fasta is not None:
+            # The only scanner reading genotypes, alleles and INFO
+            return "columnar" if np is not None else None
+        available = [
+            name
+            for name, module in (("columnar", np), ("pysam", pysam))
+            if module is not None
+        ]
+        if self.scan_strategy != "auto":
+            return self.scan_strategy if self.scan_strategy in available else None
+        with open(path, "rb") as fh:
+            compressed = fh.read(2) == b"\x1f\x8b"
+            has_samples = False
+            if not compressed:
+                fh.seek(0)
+                try:
+                    has_samples = bool(_read_text_header(fh).samples)
+                except ValueError:
+                    pass  # Rejected alike by both scanners
+        # Only pysam parses the FORMAT values of the samples
+        columnar = not compressed and not has_samples
+        preferred = ["columnar", "pysam"] if columnar else ["pysam", "columnar"]
+        return next((name for name in preferred if name in available), None)
+
+    def _process_vcf_file(
+        self, fname: str, path: str, size_bytes: int, index_content: bytes | None = None
+    ) -> Dict[str, Any]:
+        """Process a single VCF file and return its QC results.
 
-    def _process_vcf_file(self, fname: str, path: str, size_bytes: int) -> Dict[str, Any]:
-        """Process a single VCF file and return its QC results."""
+        With ``index_content`` (the paired tabix/CSI index) records are only scanned if
+        the index cannot provide the variant count and sort order.
+        """
 
         fatal_reasons = []
         warning_reasons = []
@@ -45,30 +1286,107 @@ class VCFAnalyzer(StarAnalyzer):
         is_sorted = True
         prev_key = None
         variant_count = 0
+        scan = "records"
         contigs = []
         samples = []
         header = None
+        sample_metrics = None
+        site_summary = None
+        ref_summary = None
 
+        scanner = self._record_scanner(path) if size_bytes else None
         if size_bytes == 0:
             fatal_reasons.append("Empty file")
 
+        elif scanner is None:
+            fatal_reasons.append(f"No VCF scanner available for strategy {self.scan_strategy}")
+
+        elif scanner == "columnar":
+            try:
+                with self._phase("parse"):
+                    stream = _open_vcf_text(path)
+                with stream:
+                    with self._phase("parse"):
+                        header = _read_text_header(stream)
+                        contigs = list(header.contigs)
+                        samples = list(header.samples)
+                        contig_order = {c: i for i, c in enumerate(contigs)}
+
+                    with self._phase("tool"):
+                        scanned = None
+                        genotypes = None
+                        ref_check = None
+                        sites = _SiteStats() if self.site_summaries else None
+                        if self.sample_metrics and samples:
+                            genotypes = _GenotypeStats(len(samples))
+                        if self._reference is not None:
+                            ref_check = _RefCheck(self._reference)
+                        record_level = (genotypes, ref_check, sites)
+                        if index_content is not None and record_level == (None, None, None):
+                            scanned = self._indexed_scan(index_content, contig_order, size_bytes)
+                        scan = "index" if scanned is not None else "columnar"
+                        if scanned is None:
+                            scanned = _columnar_scan(
+                                stream,
+                                contig_order,
+                                self.scan_chunk_bytes,
+                                *record_level,
+                                n_samples=len(samples),
+                            )
+                        variant_count, is_sorted = scanned
+                        if genotypes is not None:
+                            sample_metrics = genotypes.summary(samples)
+                        if sites is not None:
+                            site_summary = sites.summary()
+                        if ref_check is not None:
+                            ref_summary = ref_check.summary()
+
+            except Exception as e:
+                if isinstance(e, _RecordError):
+                    # The records before the malformed one, as the pysam scanner counts them
+                    variant_count, is_sorted = e.variant_count, e.is_sorted
+                # Same generic message as for pysam, so that no file content can leak
+                fatal_reasons.append("OpenError:ValueError:invalid header")
+
         else:
             try:
-                with pysam.VariantFile(path, "r") as vf:  # type: ignore[name-defined]
-                    header = vf.header
-                    contigs = list(header.contigs)
-                    samples = list(header.samples)
-                    contig_order = {c: i for i, c in enumerate(contigs)}
-
-                    for rec in vf:  # type: ignore[assignment]
-                        c_idx = contig_order.get(rec.chrom, 10**9)
-                        key = (c_idx, rec.pos)
-                        if prev_key is not None and key < prev_key:
-                            is_sorted = False
-                        prev_key = key
-                        variant_count += 1
+                with self._phase("parse"):
+                    vf = pysam.VariantFile(path, "r")  # type: ignore[name-defined]
+                with vf:
+                    with self._phase("parse"):
+                        header = vf.header
+                        contigs = list(header.contigs)
+                        samples = list(header.samples)
+                        contig_order = {c: i for i, c in enumerate(contigs)}
+
+                    with self._phase("tool"):
+                        scanned = None
+                        if index_content is not None:
+                            scanned = self._indexed_scan(index_content, contig_order, size_bytes)
+                            scan = "index" if scanned is not None else scan
+                        if (
+                            scanned is None
+                            and self.scan_processes > 1
+                            and size_bytes >= self.parallel_min_bytes
+                            and vf.compression == "BGZF"
+                        ):
+                            scanned = self._parallel_scan(path, vf.tell())
+                            scan = "parallel" if scanned is not None else scan
+                        if scanned is not None:
+                            variant_count, is_sorted = scanned
+                        else:
+                            for rec in vf:  # type: ignore[assignment]
+                                c_idx = contig_order.get(rec.chrom, _UNKNOWN_CONTIG)
+                                key = (c_idx, rec.pos)
+                                if prev_key is not None and key < prev_key:
+                                    is_sorted = False
+                                prev_key = key
+                                variant_count += 1
 
             except Exception as e:
+                if isinstance(e, _RecordError):
+                    # From the parallel scan: the records before the malformed one
+                    variant_count, is_sorted, scan = e.variant_count, e.is_sorted, "parallel"
                 # We do not want to leak potential private information that may be included in the error.
                 # Therefore, we catch all exceptions and report a generic error message.
                 fatal_reasons.append("OpenError:ValueError:invalid header")
@@ -78,12 +1396,19 @@ class VCFAnalyzer(StarAnalyzer):
             fatal_reasons.append("No fileformat")
         if variant_count == 0:
             fatal_reasons.append("Zero variants")
+        if self.reference_fasta is not None and self._reference is None:
+            fatal_reasons.append("Reference unavailable")
+        if ref_summary is not None:
+            if (ref_summary["mismatch_rate"] or 0) > self.ref_max_mismatch_rate:
+                fatal_reasons.append("Reference mismatch")
 
         # Warning conditions:
         if not contigs:
             warning_reasons.append("No contigs")
         if not is_sorted:
             warning_reasons.append("Unsorted")
+        if ref_summary is not None and ref_summary["missing_contig_records"]:
+            warning_reasons.append("Contigs missing from reference")
 
         passed = not fatal_reasons
         warnings_flag = bool(warning_reasons)
@@ -102,10 +1427,217 @@ class VCFAnalyzer(StarAnalyzer):
             "contig_count": len(contigs),
             "sample_count": len(samples),
             "variant_count": variant_count,
+            "scan": scan,
         }
+        if sample_metrics is not None and passed:
+            # Moved into the node-level sample groups (without names) by analysis_method
+            fr["sample_metrics"] = sample_metrics
+        if site_summary is not None and passed:
+            # Summed into the node's site summary by analysis_method
+            fr["site_summary"] = site_summary
+        if ref_summary is not None:
+            fr["ref_check"] = ref_summary
 
         return fr
 
+    @contextlib.contextmanager
+    def _staged(self, content: Any, hashed: bool = False):  # type: ignore[no-untyped-def]
+        """Make an object body available under a path; yields (path, size in bytes, SHA-256).
+
+        With "memory" staging the body is copied into an anonymous in-memory file that
+        pysam (and the parallel scan processes) open via ``/proc/<pid>/fd``. Otherwise, or
+        if that is not possible here, a temporary file is used. Either is removed on exit.
+        Streamed bodies are copied chunk by chunk. The SHA-256 of the body is only computed
+        with ``hashed``, and None otherwise.
+        """
+        sha256 = hashlib.sha256() if hashed else None
+        fd = None
+        if self.staging == "memory" and hasattr(os, "memfd_create"):
+            try:
+                fd = os.memfd_create("vcf-qc", os.MFD_CLOEXEC)
+            except OSError:
+                fd = None
+        if fd is not None:
+            try:
+                with self._phase("staging"), open(fd, "wb", closefd=False) as fh:
+                    size = _write_body(fh, content, sha256)
+                digest = sha256.hexdigest() if sha256 is not None else None
+                yield f"/proc/{os.getpid()}/fd/{fd}", size, digest
+            finally:
+                os.close(fd)
+            return
+
+        with tempfile.NamedTemporaryFile(mode="wb") as tmp_file:
+            with self._phase("staging"):
+                size = _write_body(tmp_file, content, sha256)
+
+                # Ensure data is flushed to disk so that size lookups/opening via a new
+                # file descriptor (pysam.VariantFile) see the written bytes.
+                tmp_file.flush()
+            yield tmp_file.name, size, sha256.hexdigest() if sha256 is not None else None
+
+    def _staging_bytes(self, content: Any) -> int:
+        """Memory held while ``content`` is staged and checked.
+
+        A loaded body stays referenced until its check ends, and a memfd copy is a second
+        copy in RAM, so "memory" staging counts it twice. Streamed bodies only exist as the
+        staged copy; one of unknown size takes the whole budget.
+        """
+        size = body_size(content)
+        if size is None:
+            return sys.maxsize  # Clamped to the budget: the file is checked alone
+        memfd = self.staging == "memory" and hasattr(os, "memfd_create")
+        return size * (2 if memfd and is_loaded(content) else 1)
+
+    def _qc_object(
+        self,
+        fname: str,
+        content: Any,
+        index_content: bytes | None,
+        manifest: _Manifest | None = None,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Stage one object body and check it; the staged copy is removed after. Never raises.
+
+        Objects ``manifest`` knows as unchanged reuse their stored result: loaded bodies are
+        looked up before staging, streamed ones once they are staged and hashed. A body that
+        cannot be read fails with ``Staging error``. Returns the result and whether it was
+        reused.
+        """
+        entry: Dict[str, Any] = {}
+        if manifest is not None and is_loaded(content):
+            stored, entry = manifest.lookup(fname, len(content), index_content, content=content)
+            if stored is not None:
+                return stored, True
+
+        timings = FileTimings(_TIMING_PHASES) if self.instrument else None
+        self._local.timings = timings
+        try:
+            hashed = manifest is not None and not is_loaded(content)
+            with contextlib.ExitStack() as stack:
+                try:
+                    path, written_size, sha256 = stack.enter_context(self._staged(content, hashed))
+                except Exception:
+                    # E.g. a streamed body whose connection dropped; like parse errors, the
+                    # error text is not reported
+                    size_bytes = body_size(content) or 0
+                    return _failed_file_result(fname, size_bytes, "Staging error"), False
+                if hashed:
+                    stored, entry = manifest.lookup(  # type: ignore[union-attr]
+                        fname, written_size, index_content, sha256=sha256
+                    )
+                    if stored is not None:
+                        return stored, True
+                fr = self._process_vcf_file(fname, path, written_size, index_content)
+        finally:
+            self._local.timings = None
+        if timings is not None:
+            # pysam runs in-process: only the process-wide high-water mark is available
+            timings.peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            fr["timing"] = timings.as_dict(written_size)
+        if manifest is not None:
+            manifest.record(fname, entry, fr, content)
+        return fr, False
+
+    def _candidates(self, data: List[Any]) -> Iterator[Tuple[str, Any, bytes | None]]:
+        """Yield (name, body, paired index body or None) for every VCF object in ``data``.
+
+        Dict entries hold loaded bodies; their indexes are looked up by name. Other entries are
+        lazy sources of (key, body) or (key, body, size) entries, read ahead by a
+        ``Prefetcher`` unless ``prefetch_depth`` is 0, in which case the bodies are passed on
+        unread. There an index is paired with its VCF when it directly follows it, as in a
+        sorted bucket listing; index bodies are always read into memory.
+        """
+        indexes: Dict[str, bytes] = {}
+        if self.use_index:
+            indexes = {
+                fname: content
+                for objects in data
+                if isinstance(objects, dict)
+                for fname, content in objects.items()
+                if fname.endswith(_INDEX_SUFFIXES) and isinstance(content, bytes)
+            }
+
+        suffixes = (".vcf", ".vcf.gz") + (_INDEX_SUFFIXES if self.use_index else ())
+        for objects in data:
+            if isinstance(objects, dict):
+                for fname, content in objects.items():
+                    if not fname.endswith((".vcf", ".vcf.gz")):
+                        continue
+                    index_content = None
+                    if fname.endswith(".vcf.gz"):
+                        index_content = next(
+                            (indexes[fname + s] for s in _INDEX_SUFFIXES if fname + s in indexes),
+                            None,
+                        )
+                    yield fname, content, index_content
+                continue
+
+            pairs: Iterable[Tuple[str, Any]] = (
+                (key, body) for key, body in object_pairs(objects) if key.endswith(suffixes)
+            )
+            if self.prefetch_depth > 0:
+                pairs = Prefetcher(
+                    pairs, self.prefetch_depth, self.prefetch_bytes, _FETCH_CHUNK_BYTES
+                )
+            held: Tuple[str, Any, bytes | None] | None = None  # .vcf.gz awaiting its index
+            for fname, content in pairs:
+                if held is not None:
+                    if fname in (held[0] + s for s in _INDEX_SUFFIXES):
+                        if held[2] is None or fname.endswith(_INDEX_SUFFIXES[0]):
+                            # Prefer .tbi, as above
+                            try:
+                                index_content = read_body(content, _FETCH_CHUNK_BYTES)
+                            except Exception:
+                                continue  # Unreadable: the records are scanned instead
+                            held = (held[0], held[1], index_content)
+                        continue
+                    yield held
+                    held = None
+                if fname.endswith(".vcf.gz"):
+                    held = (fname, content, None)
+                elif fname.endswith(".vcf"):
+                    yield fname, content, None
+            if held is not None:
+                yield held
+
+    def _run_pool(
+        self,
+        candidates: Iterable[Tuple[str, Any, bytes | None]],
+        manifest: _Manifest | None = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Check all candidate objects on a bounded worker pool.
+
+        Candidates are taken one at a time, as the workers and the staging budget allow, so a
+        lazy object source is never held in memory as a whole. Objects ``manifest`` knows as
+        unchanged reuse their stored result; the manifest lookup (and its hashing) runs on
+        the workers. Returns the results in the order of ``candidates`` regardless of
+        completion order, and the number of reused results.
+        """
+        budget = ByteBudget(self.memory_budget_bytes)
+
+        def check(
+            candidate: Tuple[str, Any, bytes | None], reserved: int
+        ) -> Tuple[Dict[str, Any], bool]:
+            try:
+                return self._qc_object(*candidate, manifest)
+            except Exception:  # last-resort catch -> mark file failed, without the error text
+                return _failed_file_result(candidate[0], 0, "Unexpected error"), False
+            finally:
+                budget.release(reserved)
+
+        results: List[Tuple[Dict[str, Any], bool] | Future] = []
+        pool = ThreadPoolExecutor(max_workers=self.max_workers) if self.max_workers > 1 else None
+        with pool if pool is not None else contextlib.nullcontext():
+            for candidate in candidates:
+                if pool is None:
+                    results.append(check(candidate, 0))
+                    continue
+                # Admission control: wait until this file fits into the staging budget
+                reserved = budget.acquire(self._staging_bytes(candidate[1]))
+                results.append(pool.submit(check, candidate, reserved))
+        outcomes = [r.result() if isinstance(r, Future) else r for r in results]
+        return [fr for fr, _ in outcomes], sum(reused for _, reused in outcomes)
+
     def analysis_method(
         self,
         data: List[Dict[str, Any]],
@@ -124,34 +1656,37 @@ class VCFAnalyzer(StarAnalyzer):
                 "node_id": node_id,
             }
 
-        file_results: List[Dict[str, Any]] = []
-        valid_file_count = 0
-        for objects in data:
-            for fname, content in objects.items():
-                if not fname.endswith((".vcf", ".vcf.gz")):
-                    continue
-
-                with tempfile.NamedTemporaryFile(mode="wb") as tmp_file:
-                    if isinstance(content, str):
-                        tmp_file.write(content.encode("utf-8"))
-                    else:
-                        tmp_file.write(content)
-
-                    # Ensure data is flushed to disk so that size lookups/opening via a new
-                    # file descriptor (pysam.VariantFile) see the written bytes.
-                    tmp_file.flush()
-                    written_size = tmp_file.tell()
-                    fr = self._process_vcf_file(fname, tmp_file.name, written_size)
-                    file_results.append(fr)
+        start = time.perf_counter()
+        manifest = None
+        if self.manifest_path is not None:
+            manifest = _Manifest(self.manifest_path, self._manifest_settings())
 
-                    if fr["pass"]:
-                        valid_file_count += 1
+        try:
+            if self.reference_fasta is not None and np is not None:
+                try:
+                    self._reference = _Reference(self.reference_fasta)
+                except (OSError, ValueError):
+                    self._reference = None  # Every file fails with "Reference unavailable"
+            file_results, reused_count = self._run_pool(self._candidates(data), manifest)
+        finally:
+            if self._reference is not None:
+                self._reference.close()
+                self._reference = None
+            if self._scan_pool is not None:
+                self._scan_pool.shutdown()
+                self._scan_pool = None
+        if manifest is not None:
+            manifest.save()
+        wall_time_s = time.perf_counter() - start
+        file_metrics = [fr.pop("sample_metrics") for fr in file_results if "sample_metrics" in fr]
+        file_sites = [fr.pop("site_summary") for fr in file_results if "site_summary" in fr]
 
+        valid_file_count = sum(1 for fr in file_results if fr["pass"])
         invalid_file_count = len(file_results) - valid_file_count
         node_pass = invalid_file_count == 0 and valid_file_count > 0
         node_warnings_present = any(fr.get("warnings") for fr in file_results)
 
-        return {
+        node_result = {
             "node_pass": node_pass,
             "warnings_present": node_warnings_present,
             "valid_file_count": valid_file_count,
@@ -159,6 +1694,16 @@ class VCFAnalyzer(StarAnalyzer):
             "files": file_results,
             "node_id": node_id,
         }
+        if self.sample_metrics:
+            node_result["sample_metrics"] = _merge_sample_metrics(file_metrics)
+        if self.site_summaries:
+            node_result["site_summary"] = _merge_site_summaries(file_sites)
+        if manifest is not None:
+            rescanned = len(file_results) - reused_count
+            node_result["manifest"] = {"reused": reused_count, "rescanned": rescanned}
+        if self.instrument:
+            node_result["wall_time_s"] = round(wall_time_s, 4)
+        return node_result
 
 
 class VCFAggregator(StarAggregator):
@@ -166,8 +1711,11 @@ class VCFAggregator(StarAggregator):
 
     def __init__(self, flame):  # type: ignore[no-untyped-def]
         super().__init__(flame)
+        self.output_format = VCF_OUTPUT_FORMAT
 
-    def aggregation_method(self, analysis_results: List[Dict[str, Any]]) -> str:  # noqa: D401
+    def aggregation_method(  # noqa: D401
+        self, analysis_results: List[Dict[str, Any]]
+    ) -> str | bytes:
         overall_pass = all(r["node_pass"] for r in analysis_results)
         overall_total = sum(r["valid_file_count"] for r in analysis_results)
         warnings_present = any(r.get("warnings_present") for r in analysis_results)
@@ -181,6 +1729,31 @@ class VCFAggregator(StarAggregator):
             "nodes": analysis_results,
         }
 
+        sample_groups = [g for r in analysis_results for g in r.get("sample_metrics", [])]
+        sample_qc = _sample_rates(sample_groups)
+        if sample_qc is not None:
+            result["sample_qc"] = sample_qc
+
+        site_summary = _merge_site_summaries(
+            [r["site_summary"] for r in analysis_results if r.get("site_summary")]
+        )
+        if site_summary is not None:
+            result["site_summary"] = {
+                **site_summary,
+                "af_edges": list(_AF_EDGES),
+                "variant_types": dict(zip(_VARIANT_TYPES, site_summary["variant_types"])),
+                "density_bin_bp": _DENSITY_BIN_BP,
+            }
+
+        throughput = [
+            throughput_summary(r, _TIMING_PHASES, {"variants": "variant_count"})
+            for r in analysis_results
+        ]
+        if any(throughput):
+            result["throughput"] = [t for t in throughput if t is not None]
+
+        if self.output_format == "columnar":
+            return encode_columnar(result)
         return json.dumps(result)
 
     def has_converged(self, result, last_result, num_iterations):  # type: ignore[no-untyped-def]
@@ -196,7 +1769,7 @@ def main():
         data_type="s3",
         query=VCF_S3_KEYS,
         simple_analysis=True,
-        output_type="str",
+        output_type="bytes" if VCF_OUTPUT_FORMAT == "columnar" else "str",
     )
 
 
@@ -0,0 +1,518 @@
+"""Local throughput benchmark for ``vcf_qc.py``.
+
+Generates a reproducible synthetic VCF dataset and runs ``VCFAnalyzer.analysis_method`` and
+``VCFAggregator.aggregation_method`` on it through a local stand-in for the ``flame`` object,
+once per scan mode. Files/s, variants/s, MB/s and peak memory are reported for every mode,
+so that nodes can be sized and the gains of faster scan modes can be checked on whole-genome
+and exome shaped data.
+
+Place this script next to ``vcf_qc.py``, ``qc_common.py`` and ``qc_benchmark.py`` (the
+harness shared with the FASTQ benchmark) and run, for example::
+
+    python vcf_qc_benchmark.py --files 8 --contigs 24 --density 500 --samples 100 \\
+        --compression bgzf --json results.json
+
+The FLAME SDK is not needed; if ``flame.star`` cannot be imported a minimal shim is used.
+Modes needing pysam or NumPy are skipped when those are not available. With
+``--compression bgzf`` a tabix index (``.tbi``) is written for every sorted file.
+
+Every mode's per-file verdicts (pass, reason, variant count) are compared with those of a
+single-pass pysam baseline; a mode that differs on any file is not ok. ``--malformed`` adds
+a fixed set of malformed files, on which the scanners most easily disagree.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import os
+import random
+import struct
+import sys
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+__author__ = "Jules Kreuer, jules.kreuer@uni-tuebingen.de"
+__version__ = "0.1.0"
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from qc_benchmark import (  # noqa: E402
+    BGZF_BLOCK,
+    add_run_arguments,
+    bgzf_compress,
+    install_flame_shim,
+    print_table,
+    run_isolated,
+    run_nodes,
+    summarize,
+    timing_columns,
+    verdict,
+    write_report,
+)
+
+install_flame_shim()
+
+import vcf_qc  # noqa: E402
+
+# Scan modes: analyzer attribute overrides applied on top of the vcf_qc.py defaults.
+MODES: Dict[str, Dict[str, Any]] = {
+    "pysam": {"scan_strategy": "pysam", "use_index": False},
+    "pysam-parallel": {
+        "scan_strategy": "pysam",
+        "use_index": False,
+        "scan_processes": 4,
+        "parallel_min_bytes": 0,
+    },
+    "columnar": {"scan_strategy": "columnar", "use_index": False},
+    "index": {"use_index": True},
+    "sample-metrics": {"sample_metrics": True},
+    "site-summaries": {"site_summaries": True},
+}
+
+# Variant position layouts: "wgs" spreads variants over whole contigs, "exome" clusters them
+# in short target regions covering about 2% of each contig.
+SHAPES = ("wgs", "exome")
+
+# File compressions: plain text or BGZF (blocked gzip as written by bgzip). Plain gzip is
+# rejected by htslib and is one of the malformed inputs instead (see ``_malformed_files``).
+COMPRESSIONS = ("none", "bgzf")
+
+# Genotype rows are drawn from a pool per allele frequency class instead of per sample, which
+# keeps generating wide cohorts fast without changing what the scanners have to parse.
+_GENOTYPE_POOL = 16
+_ALLELE_FREQUENCIES = (0.001, 0.01, 0.05, 0.2, 0.5)
+
+
+def _virtual_offset(block_offsets: List[int], position: int) -> int:
+    """BGZF virtual offset of uncompressed byte ``position``."""
+    block, within = divmod(position, BGZF_BLOCK)
+    return (block_offsets[block] << 16) | within
+
+
+def _tabix_index(
+    contigs: List[Tuple[str, int, int, int, int]], block_offsets: List[int]
+) -> bytes:
+    """Build a tabix index for a sorted BGZF VCF.
+
+    ``contigs`` holds (name, first byte, end byte, record count, last position) for every
+    contig with records, in file order. Each contig gets one chunk in bin 0, the pseudo-bin
+    with its record count and a linear index pointing at its first record, which is what
+    ``tabix`` queries and the ``vcf_qc.py`` index fast path need.
+    """
+    names = b"".join(name.encode("utf-8") + b"\0" for name, *_ in contigs)
+    # Format VCF (2), sequence/begin/end columns 1/2/0, meta character '#', no skipped lines
+    parts = [b"TBI\1", struct.pack("<8i", len(contigs), 2, 1, 2, 0, ord("#"), 0, len(names))]
+    parts.append(names)
+    for _, first, end, n_records, last_pos in contigs:
+        beg_offset = _virtual_offset(block_offsets, first)
+        end_offset = _virtual_offset(block_offsets, end)
+        parts.append(struct.pack("<i", 2))
+        parts.append(struct.pack("<Ii2Q", 0, 1, beg_offset, end_offset))
+        parts.append(struct.pack("<Ii4Q", 37450, 2, beg_offset, end_offset, n_records, 0))
+        n_intv = ((last_pos - 1) >> 14) + 1
+        parts.append(struct.pack(f"<i{n_intv}Q", n_intv, *[beg_offset] * n_intv))
+    parts.append(struct.pack("<Q", 0))  # Records without coordinates
+    return bgzf_compress(b"".join(parts))[0]
+
+
+def _positions(rng: random.Random, n_variants: int, length: int, shape: str) -> List[int]:
+    """Draw ``n_variants`` sorted, distinct variant positions on a contig of ``length``."""
+    if shape == "wgs":
+        return sorted(rng.sample(range(1, length + 1), min(n_variants, length)))
+    # Exome: targets of 200 bp every 10 kb
+    targets = [start for start in range(1, length - 200, 10_000)]
+    positions = {rng.choice(targets) + rng.randrange(200) for _ in range(n_variants)}
+    return sorted(positions)
+
+
+def _genotype_pool(rng: random.Random, n_samples: int) -> List[List[str]]:
+    """Tab-joined genotype rows per allele frequency class (see ``_GENOTYPE_POOL``)."""
+    pool = []
+    for af in _ALLELE_FREQUENCIES:
+        weights = [(1 - af) ** 2 * 0.98, 2 * af * (1 - af) * 0.98, af * af * 0.98, 0.02]
+        pool.append([
+            "\t".join(rng.choices(("0/0", "0/1", "1/1", "./."), weights, k=n_samples))
+            for _ in range(_GENOTYPE_POOL)
+        ])
+    return pool
+
+
+def _vcf_file(
+    rng: random.Random,
+    contigs: List[Tuple[str, int]],
+    density: float,
+    n_samples: int,
+    shape: str,
+    unsorted: bool,
+) -> Tuple[bytes, List[Tuple[str, int, int, int, int]], int]:
+    """Build one VCF; returns its text, the per-contig layout for the index and the count."""
+    samples = [f"SAMPLE{i:05d}" for i in range(n_samples)]
+    header = ["##fileformat=VCFv4.2"]
+    header += [f"##contig=<ID={name},length={length}>" for name, length in contigs]
+    header.append('##INFO=<ID=AF,Number=A,Type=Float,Description="Allele Frequency">')
+    columns = ["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO"]
+    if samples:
+        header.append('##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">')
+        columns += ["FORMAT", *samples]
+    header.append("\t".join(columns))
+    pool = _genotype_pool(rng, n_samples) if samples else None
+
+    records: List[Tuple[str, List[str], int]] = []
+    for name, length in contigs:
+        lines = []
+        positions = _positions(rng, max(1, int(density * length / 1e6)), length, shape)
+        for pos in positions:
+            ref = rng.choice("ACGT")
+            alt = rng.choice([base for base in "ACGT" if base != ref])
+            if rng.random() < 0.1:
+                alt = ref + "".join(rng.choices("ACGT", k=rng.randint(1, 6)))  # Insertion
+            af_class = rng.randrange(len(_ALLELE_FREQUENCIES))
+            fields = [name, str(pos), ".", ref, alt, "50", "PASS",
+                      f"AF={_ALLELE_FREQUENCIES[af_class]}"]
+            if pool is not None:
+                fields += ["GT", rng.choice(pool[af_class])]
+            lines.append("\t".join(fields))
+        records.append((name, lines, positions[-1]))
+    if unsorted:
+        # A few records moved out of order, as left behind by a broken merge
+        flat = [line for _, lines, _ in records for line in lines]
+        for _ in range(3):
+            i, j = rng.randrange(len(flat)), rng.randrange(len(flat))
+            flat[i], flat[j] = flat[j], flat[i]
+        records = [("", flat, 0)]
+
+    chunks = ["\n".join(header) + "\n"]
+    offset = len(chunks[0].encode("utf-8"))
+    layout = []
+    for name, lines, last_pos in records:
+        text = "".join(line + "\n" for line in lines)
+        size = len(text.encode("utf-8"))
+        layout.append((name, offset, offset + size, len(lines), last_pos))
+        chunks.append(text)
+        offset += size
+    n_variants = sum(len(lines) for _, lines, _ in records)
+    return "".join(chunks).encode("utf-8"), layout, n_variants
+
+
+def _malformed_files() -> Dict[str, bytes]:
+    """Small VCFs with malformed records or compression, keyed by file name.
+
+    They hold the inputs on which the columnar scanner has to reach pysam's verdicts: short
+    records, blank lines, empty columns, invalid POS values, malformed headers, records
+    without a column per sample, and gzip that is not complete BGZF.
+    """
+    header = (
+        b"##fileformat=VCFv4.2\n##contig=<ID=chr1,length=1000>\n"
+        b"#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+    )
+    records = [b"chr1\t%d\t.\tA\tC\t50\tPASS\t." % pos for pos in (10, 20, 30)]
+
+    def with_record(record: bytes) -> bytes:
+        return header + b"\n".join([records[0], record, *records[1:]]) + b"\n"
+
+    valid = header + b"".join(record + b"\n" for record in records)
+    fileformat, contig, columns = header.splitlines(keepends=True)
+    meta, fixed = fileformat + contig, columns.rstrip(b"\n")
+    body = b"".join(record + b"\n" for record in records)
+    genotypes = [record + b"\tGT\t0/1\t1/1" for record in records]
+
+    def with_genotypes(record: bytes) -> bytes:
+        lines = [genotypes[0], record, *genotypes[1:]]
+        return meta + fixed + b"\tFORMAT\tS1\tS2\n" + b"\n".join(lines) + b"\n"
+
+    bgzf = bgzf_compress(valid)[0]
+    bodies = {
+        "short_record.vcf": with_record(b"chr1\t15\t.\tA"),
+        "seven_columns.vcf": with_record(b"chr1\t15\t.\tA\tC\t50\tPASS"),
+        "blank_line.vcf": with_record(b""),
+        "whitespace_line.vcf": with_record(b" "),
+        "trailing_blank_lines.vcf": valid + b"\n\n",
+        "no_final_newline.vcf": valid[:-1],
+        "empty_chrom.vcf": with_record(b"\t15\t.\tA\tC\t50\tPASS\t."),
+        "empty_pos.vcf": with_record(b"chr1\t\t.\tA\tC\t50\tPASS\t."),
+        "empty_columns.vcf": with_record(b"\t" * 7),
+        "chrom_trailing_space.vcf": with_record(b"chr1 \t15\t.\tA\tC\t50\tPASS\t."),
+        "signed_pos.vcf": with_record(b"chr1\t+15\t.\tA\tC\t50\tPASS\t."),
+        "negative_pos.vcf": with_record(b"chr1\t-5\t.\tA\tC\t50\tPASS\t."),
+        "non_numeric_pos.vcf": with_record(b"chr1\t1x5\t.\tA\tC\t50\tPASS\t."),
+        "large_pos.vcf": with_record(b"chr1\t%d\t.\tA\tC\t50\tPASS\t." % (1 << 62)),
+        "hash_record.vcf": with_record(b"#chr1\t15\t.\tA\tC\t50\tPASS\t."),
+        "fileformat_not_first.vcf": contig + fileformat + columns + body,
+        "truncated_chrom_line.vcf": meta + b"#CHROM\tPOS\tID\n" + body,
+        "format_without_samples.vcf": meta + fixed + b"\tFORMAT\n" + body,
+        "duplicate_samples.vcf": meta + fixed + b"\tFORMAT\tS1\tS1\n" + body,
+        "missing_sample_column.vcf": with_genotypes(records[0] + b"\tGT\t0/1"),
+        "empty_sample_column.vcf": with_genotypes(records[0] + b"\tGT\t\t0/1"),
+        "format_only_record.vcf": with_genotypes(records[0] + b"\tGT"),
+        "plain_gzip.vcf.gz": gzip.compress(valid, mtime=0),
+        "bgzf_without_eof.vcf.gz": bgzf[:-28],
+        "truncated_bgzf.vcf.gz": bgzf[:-40],
+        "bgzf_trailing_junk.vcf.gz": bgzf + b"junk",
+    }
+    return {f"malformed_{name}": body for name, body in bodies.items()}
+
+
+def generate_dataset(
+    directory: str,
+    n_files: int,
+    n_contigs: int,
+    contig_length: int,
+    density: float,
+    n_samples: int,
+    shape: str,
+    unsorted_fraction: float,
+    compression: str,
+    seed: int,
+    malformed: bool = False,
+) -> Dict[str, Any]:
+    """Write a synthetic VCF dataset to ``directory`` and return its manifest.
+
+    ``density`` is the number of variants per Mb, ``compression`` one of ``COMPRESSIONS``.
+    With ``malformed`` the files of ``_malformed_files`` are added; their expected verdicts
+    are pysam's, so their manifest entries have no variant count.
+    """
+    os.makedirs(directory, exist_ok=True)
+    contigs = [(f"chr{i + 1}", contig_length) for i in range(n_contigs)]
+    suffix = ".vcf" if compression == "none" else ".vcf.gz"
+    files = []
+    for idx in range(n_files):
+        name = f"sample_{idx:04d}{suffix}"
+        rng = random.Random(f"{seed}:{idx}")
+        unsorted = idx < round(n_files * unsorted_fraction)
+        body, layout, n_variants = _vcf_file(rng, contigs, density, n_samples, shape, unsorted)
+        index = None
+        if compression == "gzip":
+            body = gzip.compress(body, compresslevel=6, mtime=0)
+        elif compression == "bgzf":
+            body, block_offsets = bgzf_compress(body)
+            if not unsorted:
+                index = _tabix_index(layout, block_offsets)
+        with open(os.path.join(directory, name), "wb") as fh:
+            fh.write(body)
+        entry = {"name": name, "variants": n_variants, "size_bytes": len(body)}
+        if index is not None:
+            with open(os.path.join(directory, name + ".tbi"), "wb") as fh:
+                fh.write(index)
+            entry["index"] = name + ".tbi"
+        files.append(entry)
+    for name, body in (_malformed_files() if malformed else {}).items():
+        with open(os.path.join(directory, name), "wb") as fh:
+            fh.write(body)
+        files.append({"name": name, "variants": None, "size_bytes": len(body)})
+    return {
+        "files": files,
+        "contigs": n_contigs,
+        "contig_length": contig_length,
+        "density": density,
+        "samples": n_samples,
+        "shape": shape,
+        "unsorted_fraction": unsorted_fraction,
+        "compression": compression,
+        "seed": seed,
+        "total_variants": sum(f["variants"] or 0 for f in files),
+        "total_bytes": sum(f["size_bytes"] for f in files),
+    }
+
+
+def _mode_unavailable(overrides: Dict[str, Any], manifest: Dict[str, Any]) -> str | None:
+    """Return why a mode cannot run here, or None if it can."""
+    strategy = overrides.get("scan_strategy", vcf_qc.VCF_SCAN_STRATEGY)
+    if overrides.get("sample_metrics") or overrides.get("site_summaries") or strategy == "columnar":
+        if vcf_qc.np is None:
+            return "NumPy not available"
+    if strategy == "pysam" and vcf_qc.pysam is None:
+        return "pysam not available"
+    if vcf_qc.np is None and vcf_qc.pysam is None:
+        return "neither pysam nor NumPy available"
+    if overrides.get("use_index") and not any("index" in f for f in manifest["files"]):
+        return "no indexed files (needs --compression bgzf)"
+    if overrides.get("sample_metrics") and not manifest["samples"]:
+        return "no samples (needs --samples)"
+    return None
+
+
+def _run_trial(
+    directory: str,
+    manifest: Dict[str, Any],
+    overrides: Dict[str, Any],
+    n_nodes: int,
+) -> Dict[str, Any]:
+    """Load the dataset, run all nodes and the aggregator once; executed in a fresh process."""
+    objects: List[Dict[str, bytes]] = [{} for _ in range(n_nodes)]
+    for idx, entry in enumerate(manifest["files"]):
+        for name in (entry["name"], entry.get("index")):
+            if name is not None:
+                with open(os.path.join(directory, name), "rb") as fh:
+                    objects[idx % n_nodes][name] = fh.read()
+
+    run = run_nodes(vcf_qc.VCFAnalyzer, vcf_qc.VCFAggregator, objects, overrides)
+    files = [fr for node in run.pop("node_results") for fr in node["files"]]
+    aggregated = run.pop("aggregated")
+    expected = {entry["name"]: entry["variants"] for entry in manifest["files"]}
+    scans: Dict[str, int] = {}
+    for fr in files:
+        scans[fr["scan"]] = scans.get(fr["scan"], 0) + 1
+    malformed = {name for name, variants in expected.items() if variants is None}
+    return {
+        **run,
+        "overall_pass": aggregated["overall_pass"],
+        "failed_files": sum(1 for fr in files if not fr["pass"] and fr["file"] not in malformed),
+        "wrong_counts": sum(
+            1
+            for fr in files
+            if fr["pass"] and fr["file"] not in malformed
+            and fr["variant_count"] != expected[fr["file"]]
+        ),
+        "verdicts": {fr["file"]: [fr["pass"], fr["reason"], fr["variant_count"]] for fr in files},
+        "scans": scans,
+    }
+
+
+def _summarize(
+    trials: List[Dict[str, Any]], manifest: Dict[str, Any], overrides: Dict[str, Any]
+) -> Dict[str, Any]:
+    return {
+        **summarize(
+            trials, overrides, len(manifest["files"]), manifest["total_bytes"],
+            {"variants": manifest["total_variants"]},
+        ),
+        "wrong_counts": max(t["wrong_counts"] for t in trials),
+        "malformed_files": sum(1 for entry in manifest["files"] if entry["variants"] is None),
+        "verdicts": trials[-1]["verdicts"],
+        "scans": trials[-1]["scans"],
+    }
+
+
+def _compare_verdicts(results: Dict[str, Any], baseline: Dict[str, Any] | None) -> None:
+    """Replace each mode's per-file verdicts by the files whose verdict differs from pysam's.
+
+    ``verdict_mismatches`` is None when there is no baseline (pysam not installed).
+    """
+    for res in results.values():
+        if "skipped" in res:
+            continue
+        verdicts = res.pop("verdicts")
+        res["verdict_mismatches"] = (
+            sorted(name for name, verdict in verdicts.items() if verdict != baseline.get(name))
+            if baseline is not None
+            else None
+        )
+
+
+def run_benchmark(
+    directory: str,
+    manifest: Dict[str, Any],
+    modes: Dict[str, Dict[str, Any]],
+    repeats: int,
+    n_nodes: int,
+    baseline: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """Run every mode ``repeats`` times, each trial in its own process for clean peak memory.
+
+    ``baseline`` holds the overrides of the pysam single pass whose per-file verdicts every
+    mode must reproduce; a mode with exactly these overrides serves as the baseline itself,
+    otherwise it is run once more.
+    """
+    results: Dict[str, Any] = {}
+    for name, overrides in modes.items():
+        reason = _mode_unavailable(overrides, manifest)
+        if reason is not None:
+            results[name] = {"overrides": overrides, "skipped": reason}
+            continue
+        trials = [
+            run_isolated(_run_trial, directory, manifest, overrides, n_nodes)
+            for _ in range(repeats)
+        ]
+        results[name] = _summarize(trials, manifest, overrides)
+
+    reference = None
+    if baseline is not None and _mode_unavailable(baseline, manifest) is None:
+        reference = next(
+            (
+                res["verdicts"]
+                for res in results.values()
+                if res["overrides"] == baseline and "skipped" not in res
+            ),
+            None,
+        )
+        if reference is None:
+            reference = run_isolated(_run_trial, directory, manifest, baseline, n_nodes)["verdicts"]
+    _compare_verdicts(results, reference)
+    return results
+
+
+def _problems(res: Dict[str, Any]) -> List[str]:
+    problems = []
+    if res["failed_files"]:
+        problems.append(f"{res['failed_files']} failed")
+    if res["wrong_counts"]:
+        problems.append(f"{res['wrong_counts']} wrong counts")
+    if res["verdict_mismatches"]:
+        problems.append(f"{len(res['verdict_mismatches'])} verdicts differ from pysam")
+    # Malformed files fail the aggregated verdict by design
+    if not res["overall_pass"] and not res["malformed_files"] and not problems:
+        problems.append("aggregate failed")
+    return problems
+
+
+def _scans(res: Dict[str, Any]) -> str:
+    return ",".join(f"{scan}:{n}" for scan, n in sorted(res["scans"].items()))
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=8, help="number of VCF files")
+    parser.add_argument("--contigs", type=int, default=4, help="contigs per file")
+    parser.add_argument("--contig-length", type=int, default=10_000_000, help="bases per contig")
+    parser.add_argument("--density", type=float, default=1000.0, help="variants per Mb")
+    parser.add_argument("--samples", type=int, default=10, help="genotype columns per file")
+    parser.add_argument("--shape", choices=SHAPES, default="wgs",
+                        help="variant layout: whole genome or exome targets")
+    parser.add_argument("--unsorted", type=float, default=0.0, metavar="FRACTION",
+                        help="fraction of files with records out of order")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="bgzf",
+                        help="file compression (bgzf as written by bgzip, with tabix index)")
+    parser.add_argument("--malformed", action="store_true",
+                        help="add malformed files, on which every mode has to reach the "
+                             "verdicts of the pysam baseline as well")
+    add_run_arguments(parser, MODES)
+    args = parser.parse_args(argv)
+
+    common = dict(args.overrides)
+    modes = {name: {**MODES[name], **common} for name in args.modes}
+
+    with tempfile.TemporaryDirectory(prefix="vcf_bench_") as tmp_dir:
+        directory = args.data_dir or tmp_dir
+        manifest = generate_dataset(
+            directory, args.files, args.contigs, args.contig_length, args.density,
+            args.samples, args.shape, args.unsorted, args.compression, args.seed,
+            args.malformed,
+        )
+        print(
+            f"Dataset: {len(manifest['files'])} files, {manifest['total_variants']} variants, "
+            f"{args.samples} samples, {manifest['total_bytes'] / 1e6:.1f} MB "
+            f"({args.compression}, {args.shape})"
+        )
+        # Single-pass pysam run whose per-file verdicts every mode has to reproduce
+        baseline = {**MODES["pysam"], **common}
+        results = run_benchmark(
+            directory, manifest, modes, max(1, args.repeats), args.nodes, baseline
+        )
+
+    print_table(results, [
+        *timing_columns("variants"),
+        ("scans", _scans),
+        ("ok", lambda res: verdict(_problems(res))),
+    ])
+    if args.json_path:
+        versions = {
+            "vcf_qc_version": vcf_qc.__version__,
+            "numpy": getattr(vcf_qc.np, "__version__", None),
+            "pysam": getattr(vcf_qc.pysam, "__version__", None),
+        }
+        write_report(args.json_path, versions, args.nodes, manifest, results, baseline=baseline)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,52 @@
+"""Shared setup of the tests of the downloadable QC scripts in ``src/public/files``.
+
+The scripts are made importable; they import ``flame.star``, for which the benchmark
+harness' minimal shim stands in without the FLAME SDK, as in the local benchmarks.
+"""
+
+import io
+import os
+import sys
+from typing import Dict, Iterator, Set, Tuple
+
+import pytest
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "public", "files")
+)
+
+from qc_benchmark import install_flame_shim  # noqa: E402
+
+install_flame_shim()
+
+
+class DroppedBody(io.RawIOBase):
+    """Streamed object body whose connection drops after ``fail_after`` bytes."""
+
+    def __init__(self, data: bytes, fail_after: int):
+        super().__init__()
+        self._data = io.BytesIO(data)
+        self._fail_after = fail_after
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:  # type: ignore[no-untyped-def]
+        left = self._fail_after - self._data.tell()
+        if left <= 0:
+            raise ConnectionError("connection reset by storage.internal:443")
+        return self._data.readinto(memoryview(buffer)[:left])
+
+
+@pytest.fixture
+def lazy_source():  # type: ignore[no-untyped-def]
+    """Build a lazy object source of streamed bodies; ``broken`` keys drop their connection."""
+
+    def build(
+        bodies: Dict[str, bytes], broken: Set[str] = frozenset(), sized: bool = False
+    ) -> Iterator[Tuple]:
+        for key, data in bodies.items():
+            body = DroppedBody(data, 100) if key in broken else io.BytesIO(data)
+            yield (key, body, len(data)) if sized else (key, body)
+
+    return build
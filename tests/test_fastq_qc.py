@@ -0,0 +1,221 @@
+"""Tests of ``fastq_qc.py``."""
+
+import io
+import json
+import random
+import shutil
+import threading
+import time
+
+import pytest
+
+import fastq_qc
+from qc_benchmark import LocalFlame
+from qc_columnar_decode import decode_columnar_result
+
+needs_numpy = pytest.mark.skipif(fastq_qc.np is None, reason="needs NumPy")
+
+
+def _fastq(n_reads: int, length: int = 50, seed: int = 0) -> bytes:
+    """Random reads of high Phred+33 quality, which pass every module."""
+    rng = random.Random(seed)
+    return b"".join(
+        b"@r%d\n%s\n+\n%s\n"
+        % (
+            i,
+            "".join(rng.choices("ACGT", k=length)).encode(),
+            "".join(rng.choices("5?I", k=length)).encode(),
+        )
+        for i in range(n_reads)
+    )
+
+
+FASTQ = _fastq(500)
+
+
+def _low_quality(body: bytes, seed: int = 1) -> bytes:
+    """The reads of ``body`` at quality 20 with one base of 19, a read mean of 19.98."""
+    rng = random.Random(seed)
+    reads = body.split(b"\n")[1::4]
+    low_quality = b""
+    for idx, read in enumerate(reads):
+        quality = bytearray(b"5" * len(read))
+        quality[rng.randrange(len(read))] = ord("4")
+        low_quality += b"@r%d\n%s\n+\n%s\n" % (idx, read, quality)
+    return low_quality
+
+
+def _analyzer(**overrides) -> fastq_qc.FastqAnalyzer:  # type: ignore[no-untyped-def]
+    analyzer = fastq_qc.FastqAnalyzer(LocalFlame("node-0"))
+    for attr, value in overrides.items():
+        setattr(analyzer, attr, value)
+    return analyzer
+
+
+@needs_numpy
+@pytest.mark.parametrize("staging", ["temp", "stream"])
+@pytest.mark.parametrize("sized", [False, True])
+@pytest.mark.parametrize("prefetch_depth", [0, 2])
+def test_unreadable_streamed_body_fails_only_its_file(lazy_source, prefetch_depth, sized, staging):
+    source = lazy_source(
+        {"a.fastq": FASTQ, "b.fastq": FASTQ, "c.fastq": FASTQ}, broken={"b.fastq"}, sized=sized
+    )
+    analyzer = _analyzer(
+        engine="native", prefetch_depth=prefetch_depth, staging=staging, max_workers=2
+    )
+
+    result = analyzer.analysis_method([source], None)
+
+    files = {fr["file"]: fr for fr in result["files"]}
+    assert list(files) == ["a.fastq", "b.fastq", "c.fastq"]
+    assert files["b.fastq"]["pass"] is False
+    assert files["b.fastq"]["reason"].startswith(("Staging error", "Parsing error"))
+    assert files["a.fastq"]["pass"] and files["c.fastq"]["pass"]
+    assert files["a.fastq"]["total_sequences"] == 500
+    assert (result["valid_file_count"], result["invalid_file_count"]) == (2, 1)
+
+
+@needs_numpy
+def test_body_of_unknown_size_is_qced_alone(lazy_source):
+    source = lazy_source({f"{name}.fastq": FASTQ for name in "abcd"})
+    analyzer = _analyzer(
+        engine="native", staging="stream", prefetch_depth=0, max_workers=4, batch_size=1,
+        memory_budget_bytes=10 * len(FASTQ),
+    )
+    qc_batch = analyzer._qc_batch
+    lock = threading.Lock()
+    running = [0]
+    most_running = [0]
+
+    def counting_qc_batch(batch):  # type: ignore[no-untyped-def]
+        with lock:
+            running[0] += 1
+            most_running[0] = max(most_running[0], running[0])
+        time.sleep(0.05)
+        try:
+            return qc_batch(batch)
+        finally:
+            with lock:
+                running[0] -= 1
+
+    analyzer._qc_batch = counting_qc_batch
+
+    result = analyzer.analysis_method([source], None)
+
+    assert result["valid_file_count"] == 4
+    assert most_running[0] == 1
+
+
+@needs_numpy
+def test_native_engine_rounds_down_like_fastqc():
+    # %GC of the reads is 49.972
+    analyzer = _analyzer(engine="native", max_workers=1)
+
+    result = analyzer.analysis_method([{"a.fastq": FASTQ, "b.fastq": _low_quality(FASTQ)}], None)
+
+    a, b = result["files"]
+    assert a["gc_content"] == 49.0
+    assert b["reason"] == "FAIL modules: per_sequence_quality_scores"
+
+
+@needs_numpy
+@pytest.mark.skipif(shutil.which("fastqc") is None, reason="needs the FastQC executable")
+def test_native_engine_reaches_fastqc_verdicts():
+    files = {"a.fastq": FASTQ, "b.fastq": _low_quality(FASTQ), "c.fastq": b""}
+    keys = ("pass", "reason", "total_sequences", "sequence_length", "gc_content")
+
+    verdicts = {
+        engine: [
+            {k: fr[k] for k in keys if k in fr}
+            for fr in _analyzer(engine=engine, max_workers=1).analysis_method([files], None)[
+                "files"
+            ]
+        ]
+        for engine in ("native", "fastqc")
+    }
+
+    assert verdicts["native"] == verdicts["fastqc"]
+    assert [v["pass"] for v in verdicts["native"]] == [True, False, False]
+
+
+@needs_numpy
+@pytest.mark.parametrize("adapters", [None, {"PolyA": "AAAAAAAAAA"}])
+def test_native_node_result_names_engine_and_modules(adapters):
+    analyzer = _analyzer(engine="native", max_workers=1, adapters=adapters)
+
+    result = analyzer.analysis_method([{"a.fastq": FASTQ}], None)
+
+    assert result["engine"] == "native"
+    assert result["modules"] == list(fastq_qc._NATIVE_MODULES) + (
+        ["adapter_content"] if adapters else []
+    )
+    assert "per_tile_sequence_quality" not in result["modules"]
+
+
+@needs_numpy
+@pytest.mark.parametrize("sized", [False, True])
+def test_sample_of_streamed_body_reports_a_size(lazy_source, sized):
+    body = _fastq(20_000)
+    analyzer = _analyzer(
+        engine="native", max_workers=1, sample_reads=100, native_chunk_bytes=1 << 16
+    )
+    source = lazy_source({"a.fastq": body}, sized=sized)
+
+    result = analyzer.analysis_method([source], None)["files"][0]
+
+    assert result["sample_size"] == 100
+    assert result["sampled_bytes"] < len(body)
+    if sized:
+        assert result["size_bytes"] == len(body)
+        assert "size_known" not in result
+    else:
+        assert result["size_bytes"] == result["sampled_bytes"]
+        assert result["size_known"] is False
+
+
+@needs_numpy
+@pytest.mark.parametrize("sample_method", ["head", "reservoir"])
+def test_sample_of_whole_file_matches_full_native_run(sample_method):
+    full = _analyzer(engine="native", max_workers=1)
+    sampled = _analyzer(
+        engine="native", max_workers=1, sample_reads=1000, sample_method=sample_method
+    )
+
+    (expected,) = full.analysis_method([{"a.fastq": FASTQ}], None)["files"]
+    (result,) = sampled.analysis_method([{"a.fastq": FASTQ}], None)["files"]
+
+    assert result["sample_size"] == 500
+    assert {k: result[k] for k in expected} == expected
+    assert result["sequence_length_range"] == [50, 50]
+
+
+@needs_numpy
+def test_reservoir_sample_is_spread_over_the_file_in_file_order():
+    body = _fastq(5000)
+    blocks = fastq_qc._iter_fastq_blocks(io.BytesIO(body), 1 << 14)
+
+    sample, size = fastq_qc._sample_fastq_blocks(blocks, 200, "reservoir", seed=7)
+
+    names = [int(line[2:]) for line in sample.split(b"\n")[0::4] if line]
+    assert size == len(names) == 200
+    assert names == sorted(set(names))
+    assert names[-1] > 4000
+    assert sample.count(b"\n") == 800
+
+
+@needs_numpy
+def test_columnar_output_decodes_to_json_output():
+    files = {"a.fastq": FASTQ, "b.fastq": _low_quality(FASTQ), "c.fastq": b""}
+    node_results = [
+        _analyzer(engine="native", max_workers=1).analysis_method([files], None),
+        _analyzer(engine="native", max_workers=1).analysis_method([{"d.fastq": FASTQ}], None),
+    ]
+    aggregator = fastq_qc.FastqAggregator(LocalFlame("aggregator"))
+
+    aggregator.output_format = "json"
+    expected = json.loads(aggregator.aggregation_method(node_results))
+    aggregator.output_format = "columnar"
+    columnar = aggregator.aggregation_method(node_results)
+
+    assert isinstance(columnar, bytes)
+    assert decode_columnar_result(columnar) == expected
@@ -0,0 +1,112 @@
+"""Tests of ``vcf_qc.py``."""
+
+import json
+
+import pytest
+
+import vcf_qc
+import vcf_qc_benchmark
+from qc_benchmark import LocalFlame
+from qc_columnar_decode import decode_columnar_result
+
+pytestmark = pytest.mark.skipif(
+    vcf_qc.np is None and vcf_qc.pysam is None, reason="needs NumPy or pysam"
+)
+
+HEADER = (
+    b"##fileformat=VCFv4.2\n##contig=<ID=chr1,length=1000>\n"
+    b"#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+)
+VCF = HEADER + b"".join(b"chr1\t%d\t.\tA\tC\t50\tPASS\t.\n" % pos for pos in range(1, 200))
+
+
+def _analyzer(**overrides) -> vcf_qc.VCFAnalyzer:  # type: ignore[no-untyped-def]
+    analyzer = vcf_qc.VCFAnalyzer(LocalFlame("node-0"))
+    for attr, value in overrides.items():
+        setattr(analyzer, attr, value)
+    return analyzer
+
+
+@pytest.mark.parametrize("staging", ["memory", "temp"])
+@pytest.mark.parametrize("sized", [False, True])
+@pytest.mark.parametrize("prefetch_depth", [0, 2])
+def test_unreadable_streamed_body_fails_only_its_file(lazy_source, prefetch_depth, sized, staging):
+    source = lazy_source(
+        {"a.vcf": VCF, "b.vcf": VCF, "c.vcf": VCF}, broken={"b.vcf"}, sized=sized
+    )
+    analyzer = _analyzer(prefetch_depth=prefetch_depth, staging=staging, max_workers=2)
+
+    result = analyzer.analysis_method([source], None)
+
+    files = {fr["file"]: fr for fr in result["files"]}
+    assert list(files) == ["a.vcf", "b.vcf", "c.vcf"]
+    assert files["b.vcf"]["pass"] is False
+    assert files["b.vcf"]["reason"] == "FATAL: Staging error"
+    assert files["b.vcf"]["variant_count"] == 0
+    assert files["a.vcf"]["pass"] and files["c.vcf"]["pass"]
+    assert files["a.vcf"]["variant_count"] == 199
+    assert (result["valid_file_count"], result["invalid_file_count"]) == (2, 1)
+
+
+def _verdicts(files, **overrides):  # type: ignore[no-untyped-def]
+    analyzer = _analyzer(max_workers=1, use_index=False, **overrides)
+    result = analyzer.analysis_method([files], None)
+    return {
+        fr["file"]: (fr["pass"], fr["reason"], fr["variant_count"], fr["sample_count"])
+        for fr in result["files"]
+    }
+
+
+@pytest.mark.skipif(vcf_qc.np is None or vcf_qc.pysam is None, reason="needs NumPy and pysam")
+@pytest.mark.parametrize("scan_chunk_bytes", [64, 1 << 20])
+def test_columnar_scanner_reaches_pysam_verdicts_on_malformed_files(scan_chunk_bytes):
+    files = {"valid.vcf": VCF, **vcf_qc_benchmark._malformed_files()}
+
+    columnar = _verdicts(files, scan_strategy="columnar", scan_chunk_bytes=scan_chunk_bytes)
+
+    assert columnar == _verdicts(files, scan_strategy="pysam")
+    assert columnar["valid.vcf"][0]
+
+
+@pytest.mark.skipif(vcf_qc.np is None or vcf_qc.pysam is None, reason="needs NumPy and pysam")
+def test_auto_leaves_format_values_to_pysam():
+    header = HEADER.replace(b"INFO\n", b"INFO\tFORMAT\tS1\n")
+    records = [
+        b"chr1\t%d\t.\tA\tC\t50\tPASS\t.\tGT\t%s" % row for row in ((1, b"0/1"), (2, b"x/1"))
+    ]
+    files = {"bad_genotype.vcf": header + b"\n".join(records) + b"\n"}
+
+    assert _verdicts(files, scan_strategy="auto") == _verdicts(files, scan_strategy="pysam")
+    assert not _verdicts(files, scan_strategy="auto")["bad_genotype.vcf"][0]
+
+
+def test_columnar_output_decodes_to_json_output():
+    files = {"valid.vcf": VCF, "empty.vcf": b"", "no_header.vcf": VCF[len(HEADER) :]}
+    node_results = [
+        _analyzer(max_workers=1).analysis_method([files], None),
+        _analyzer(max_workers=1).analysis_method([{"other.vcf": VCF}], None),
+    ]
+    aggregator = vcf_qc.VCFAggregator(LocalFlame("aggregator"))
+
+    aggregator.output_format = "json"
+    expected = json.loads(aggregator.aggregation_method(node_results))
+    aggregator.output_format = "columnar"
+    columnar = aggregator.aggregation_method(node_results)
+
+    assert isinstance(columnar, bytes)
+    assert decode_columnar_result(columnar) == expected
+
+
+def test_manifest_keeps_only_the_objects_of_the_last_run(tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    files = {"a.vcf": VCF, "b.vcf": VCF, "c.vcf": b""}
+
+    first = _analyzer(manifest_path=manifest_path).analysis_method([files], None)
+    del files["b.vcf"]
+    second = _analyzer(manifest_path=manifest_path).analysis_method([files], None)
+
+    with open(manifest_path, encoding="utf-8") as fh:
+        assert sorted(json.load(fh)) == ["a.vcf", "c.vcf"]
+    assert first["manifest"] == {"reused": 0, "rescanned": 3}
+    assert second["manifest"] == {"reused": 2, "rescanned": 0}
+    assert [fr["pass"] for fr in second["files"]] == [True, False]